@@ -4,8 +4,26 @@ import re
 import openai
 import logging
 import time
+import threading
 from datetime import datetime
 from resume_parser import compact_resume_text, md5_hash
+from resume_sectionizer import ResumeSectionizer
+from resume_extractor import extract_resume_fields
+from mail_precheck import likely_resume, precheck_mail
+from llm_cache import get_result_cache, prompt_version
+from token_budget import PromptBudget, truncate_tokens
+from screening_cascade import ScreeningCascade
+from speculative_screening import SpeculativeScreening
+from position_matcher import PositionMatcher
+from job_catalog import catalog_fragment
+from embedding_store import get_embedding_store
+from llm_backends import get_backend_pool
+from llm_client import get_llm_client, estimate_request_tokens, retry_delay
+from llm_ledger import get_llm_ledger
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from structured_output import (DETAIL_FIELDS, SCREEN_DETAIL_SCHEMA, SCREEN_SCHEMA, SCREEN_SCORES_SCHEMA, coerce,
+                               identify_and_screen_schema, identify_schema, parse_structured, repair_json,
+                               request_kwargs, response_text)
 
 """
 AI简历筛选模块
@@ -28,17 +46,402 @@ def log_prompt(name: str, prompt: str, messages: list = None):
         log_data['messages'] = messages
     logging.debug(f"AI Prompt: {json.dumps(log_data, ensure_ascii=False, indent=2)}")
 
+# 简历评估prompt的固定部分
+SCREEN_INTRO = """你是一位拥有10年以上招聘经验的资深HR专家，专注于人工智能公司的技术人才评估。作为创业型AI技术公司，我们特别重视以下能力和背景：
+1. 技术创新能力和学习速度
+2. 在快速迭代环境中的适应能力
+3. 对AI技术的理解和热情
+4. 创业精神和主人翁意识
+5. 跨团队协作能力
+6. 优质教育背景（特别是985、211或国际知名高校）"""
+
+EDUCATION_RUBRIC = """【教育背景评估标准】
+按照第一学历和学校评估：
+1. 最高级（15分）：清华、北大、Top30国际名校
+2. 较高级（12分）：其他985高校、Top50国际名校
+3. 中等级（10分）：211高校、知名外国大学
+4. 基本级（5分）：一般本科院校
+5. 其他（0分）：大专及其他院校，本科非统招视为专科
+
+最高学历加分（在第一学历基础上）：
+- 国内外顶尖院校相关专业硕博：+5分
+- 985高校相关专业硕博：+4分
+- 211高校相关专业硕博：+3分
+- 其他院校相关专业硕博：+0分"""
+
+ANALYSIS_EXAMPLE = """  "analysis": {
+    "education_score": 0,
+    "education_detail": "教育背景评价（第一学历、学校层次、专业匹配度等）",
+    "technical_score": 0,
+    "technical_detail": "技术实力评价（技术栈匹配度、项目经验深度、算法能力等）",
+    "innovation_score": 0,
+    "innovation_detail": "创新潜力评价（高水平论文专利、学习能力、技术视野等）",
+    "growth_score": 0,
+    "growth_detail": "成长速度评价（履历提升、自我驱动力、知识更新速度等）",
+    "startup_score": 0,
+    "startup_detail": "创业特质评价（创业经历、主动性、抗压能力等）",
+    "teamwork_score": 0,
+    "teamwork_detail": "团队协作评价（团队领导经历、沟通能力、跨部门协作等）",
+    "risk": "风险提示（教育风险、技术风险、稳定性风险、团队融入风险等）",
+    "questions": "技术深度考察题（考察实际编码和算法能力）,
+    项目难点解决案例（考察问题解决能力）,
+    创新思维案例（考察技术创新能力）,
+    学习能力案例（考察快速掌握新技术的能力）,
+    压力处理案例（考察抗压能力）,
+    对AI创业公司的理解（考察认知匹配度）"
+  }"""
+
+# 两阶段评估第一阶段只输出评分
+SCORES_EXAMPLE = """  "analysis": {
+    "education_score": 0,
+    "technical_score": 0,
+    "innovation_score": 0,
+    "growth_score": 0,
+    "startup_score": 0,
+    "teamwork_score": 0
+  }"""
+
+# 两阶段评估第二阶段补充的评价详情
+DETAIL_EXAMPLE = """{
+  "education_detail": "教育背景评价（第一学历、学校层次、专业匹配度等）",
+  "technical_detail": "技术实力评价（技术栈匹配度、项目经验深度、算法能力等）",
+  "innovation_detail": "创新潜力评价（高水平论文专利、学习能力、技术视野等）",
+  "growth_detail": "成长速度评价（履历提升、自我驱动力、知识更新速度等）",
+  "startup_detail": "创业特质评价（创业经历、主动性、抗压能力等）",
+  "teamwork_detail": "团队协作评价（团队领导经历、沟通能力、跨部门协作等）",
+  "risk": "风险提示（教育风险、技术风险、稳定性风险、团队融入风险等）",
+  "questions": "技术深度考察题（考察实际编码和算法能力）,
+  项目难点解决案例（考察问题解决能力）,
+  创新思维案例（考察技术创新能力）,
+  学习能力案例（考察快速掌握新技术的能力）,
+  压力处理案例（考察抗压能力）,
+  对AI创业公司的理解（考察认知匹配度）"
+}"""
+
+# parsed_info 字段及其在prompt输出示例中的写法
+PARSED_INFO_FIELDS = [
+    ("name", '"候选人姓名"'),
+    ("position", '"应聘职位（必须匹配岗位要求中的职位名称）"'),
+    ("experience", '"工作年限"'),
+    ("latest_company", '"最近就职公司"'),
+    ("first_education", '"第一学历"'),
+    ("first_university", '"第一学历院校"'),
+    ("highest_education", '"最高学历"'),
+    ("highest_university", '"最高学历院校"'),
+    ("marital_status", '"婚姻状况"'),
+    ("age", '0-30'),
+    ("gender", '"性别"'),
+    ("phone", '"联系电话"'),
+    ("email", '"电子邮箱"'),
+    ("wechat", '"微信号"'),
+    ("expected_salary", '"期望薪资"'),
+    ("resume_source", '"简历来源"'),
+]
+
+# 简历评估prompt中的岗位描述字段
+JOB_DETAIL_FIELDS = ["duties", "requirements", "education_req", "exp_req", "perf_goals"]
+
+# 修改简历评估prompt的生成逻辑（模板文字以外的部分）时递增，使已缓存的结果失效
+SCREEN_PROMPT_REVISION = 3
+
+def parsed_info_example(skip_fields=()) -> str:
+    """生成 parsed_info 输出示例，跳过已在本地提取的字段"""
+    return ",\n".join(f'    "{name}": {example}' for name, example in PARSED_INFO_FIELDS
+                      if name not in skip_fields)
+
+def skip_fields_note(skip_fields) -> str:
+    """已在本地提取、无需模型输出的字段说明，附加在每次调用的用户消息末尾"""
+    if not skip_fields:
+        return ""
+    return f"\n\n以下 parsed_info 字段已在本地提取，无需输出: {', '.join(sorted(skip_fields))}"
+
+class JobPrompts:
+    """
+    某一版本岗位信息及据此生成的prompt前缀、Schema、岗位描述块和向量匹配器
+
+    生成后不再修改。岗位目录重载时在旁边生成新的实例，再整体替换 AIScreener.jobs；
+    处理中的调用从头到尾使用同一个实例，不会把新的岗位信息和旧的前缀、Schema混在一起。
+    """
+    def __init__(self, version: str, job_info: dict, position_matcher, identify_prefix: str, identify_schema: dict,
+                 identify_and_screen_prefix: str, identify_and_screen_prefix_tokens: int,
+                 identify_and_screen_schema: dict, position_blocks: dict):
+        self.version = version
+        self.job_info = job_info
+        self.position_matcher = position_matcher
+        self.identify_prefix = identify_prefix
+        self.identify_schema = identify_schema
+        self.identify_and_screen_prefix = identify_and_screen_prefix
+        self.identify_and_screen_prefix_tokens = identify_and_screen_prefix_tokens
+        self.identify_and_screen_schema = identify_and_screen_schema
+        self.position_blocks = position_blocks
+
 class AIScreener:
-    def __init__(self, config, job_info: dict, company_info: str):
+    def __init__(self, config, job_info: dict, company_info: str, job_catalog=None):
+        """
+        Args:
+            config: 配置对象
+            job_info: 岗位信息
+            company_info: 公司信息
+            job_catalog: 岗位目录(JobCatalog)，提供时 job_info 应为其当前岗位，
+                         refresh_job_catalog 按表格修改重载岗位信息并识别岗位别称
+        """
         self.config = config
-        self.job_info = job_info
         self.company_info = company_info
+        self.job_catalog = job_catalog
+        self._jobs_lock = threading.Lock()
         openai.api_key = self.config.OPENAI_API_KEY
-        # Embedding cache可选
-        self.embedding_cache = None
-        if self.config.CACHE_EMBEDDINGS:
-            from utils import EmbeddingCache
-            self.embedding_cache = EmbeddingCache(self.config.embedding_cache_file)
+        openai.api_base = self.config.OPENAI_API_BASE
+        # 简历结构化压缩可选
+        self.sectionizer = ResumeSectionizer(self.config) if self.config.RESUME_SECTIONIZER else None
+        # 进程内共享的LLM结果缓存
+        self.result_cache = get_result_cache(self.config)
+        # 按token在评估标准、岗位描述和简历之间分配prompt预算
+        self.budget = PromptBudget(self.config)
+        # 分级评估：先用小模型评估，合格线附近或结果无效时再用大模型
+        self.cascade = ScreeningCascade(self.config) if self.config.SCREENING_CASCADE else None
+        # 推测评估：很可能是简历的邮件在识别类型的同时按本地猜测的岗位开始评估
+        self.speculation = SpeculativeScreening(self.config) if self.config.SPECULATIVE_SCREENING else None
+        # 结构化输出方式，服务端不支持时退回容错解析
+        self.structured_mode = self.config.LLM_STRUCTURED_OUTPUT
+        # 两阶段评估：deferred 时评估只输出评分，评价详情和面试问题由 deferred_details 为合格候选人补充
+        self.detail_mode = self.config.SCREENING_DETAIL_MODE
+        # 预编译各prompt的固定前缀；岗位相关的前缀、Schema、岗位描述块和向量匹配器见 self.jobs
+        self.compile_prompts()
+        self.jobs = self.compile_jobs(job_info, job_catalog.version if job_catalog else "")
+        # Embedding缓存可选（内存映射的二进制存储，多进程共享）
+        self.embedding_cache = get_embedding_store(self.config) if self.config.CACHE_EMBEDDINGS else None
+
+    @property
+    def job_info(self) -> dict:
+        return self.jobs.job_info
+
+    @property
+    def position_matcher(self):
+        """岗位向量匹配：把握足够时不再调用LLM识别岗位"""
+        return self.jobs.position_matcher
+
+    @property
+    def identify_and_screen_schema(self) -> dict:
+        return self.jobs.identify_and_screen_schema
+
+    # ---------- prompt预编译 ----------
+    #
+    # 各prompt拆为 system 消息（公司背景、评估标准、输出格式等，所有调用逐字节相同）和
+    # user 消息（岗位描述块 + 简历等每次调用不同的内容），使服务端的前缀缓存能够命中。
+
+    def compile_prompts(self):
+        """生成与岗位无关的固定前缀及其token数"""
+        self.screen_prefix = self._build_screen_prefix()
+        self.screen_prefix_tokens = self.budget.count(self.screen_prefix)
+        self.scores_prefix = self._build_screen_prefix(scores_only=True)
+        self.scores_prefix_tokens = self.budget.count(self.scores_prefix)
+        self.detail_prefix = self._build_detail_prefix()
+        self.detail_prefix_tokens = self.budget.count(self.detail_prefix)
+
+    def compile_jobs(self, job_info: dict, version: str = "") -> JobPrompts:
+        """按岗位信息生成岗位相关的前缀、Schema、各岗位的描述块和向量匹配器，不修改当前状态"""
+        positions = list(job_info.keys())
+        channels = list(self.config.RESUME_CHANNELS.keys())
+        identify_and_screen_prefix = self._build_identify_and_screen_prefix(job_info)
+        jobs = JobPrompts(
+            version=version,
+            job_info=job_info,
+            position_matcher=(PositionMatcher(self.config, job_info, self.get_embedding)
+                              if self.config.USE_EMBEDDING else None),
+            identify_prefix=self._build_identify_prefix(job_info),
+            identify_schema=identify_schema(positions, channels),
+            identify_and_screen_prefix=identify_and_screen_prefix,
+            identify_and_screen_prefix_tokens=self.budget.count(identify_and_screen_prefix),
+            identify_and_screen_schema=identify_and_screen_schema(positions, channels),
+            position_blocks={position_name: self._build_position_block(position_name, detail)
+                             for position_name, detail in job_info.items()},
+        )
+        logging.info(f"[AIScreener] prompt预编译完成: 评估前缀 {self.screen_prefix_tokens} tokens, "
+                     f"岗位 {len(jobs.position_blocks)} 个")
+        return jobs
+
+    def _build_identify_prefix(self, job_info: dict) -> str:
+        job_keys = list(job_info.keys())
+        channels = list(self.config.RESUME_CHANNELS.keys())
+        return f"""你是专业的HR招聘助理。请判断用户提供的邮件信息是否为候选人简历。
+
+公司岗位列表（必须严格从以下列表中选择）: 
+{json.dumps(job_keys, ensure_ascii=False, indent=2)}
+
+可选渠道列表: {channels}
+
+请判断：
+1. 这是否为应聘简历邮件？
+2. 如果是简历，应聘的是哪个岗位？（必须严格从公司岗位列表中选择最匹配的岗位，不允许使用列表外的岗位名称）
+3. 简历来自哪个渠道？（从渠道列表中选择）
+
+请以JSON格式输出,不要带任何多余解释或代码块：
+{{
+  "is_resume": false,
+  "matched_position": "",  # 必须完全匹配公司岗位列表中的某个岗位名称
+  "matched_channel": ""
+}}"""
+
+    def _build_screen_prefix(self, scores_only: bool = False) -> str:
+        if scores_only:
+            task = "请基于用户提供的岗位信息和候选人简历，对候选人各维度打分，只输出评分，不需要评价详情"
+        else:
+            task = "请基于用户提供的岗位信息和候选人简历，对候选人进行全方位、专业的评估"
+        return f"""你是专业的HR招聘顾问。
+{SCREEN_INTRO}
+
+【公司背景】
+{self.company_info}
+
+{EDUCATION_RUBRIC}
+
+{task}，只返回JSON格式数据，不要带任何多余解释或代码块,如无数据返回为空。
+
+输出JSON格式示例:
+{{
+  "parsed_info": {{
+{parsed_info_example()}
+  }},
+{SCORES_EXAMPLE if scores_only else ANALYSIS_EXAMPLE}
+}}"""
+
+    def _build_detail_prefix(self) -> str:
+        return f"""你是专业的HR招聘顾问。
+{SCREEN_INTRO}
+
+【公司背景】
+{self.company_info}
+
+{EDUCATION_RUBRIC}
+
+用户会提供岗位信息、候选人简历以及已经完成的各维度评分。请保持评分不变，为每个维度撰写评价详情，并给出风险提示和面试问题建议。只返回JSON格式数据，不要带任何多余解释或代码块。
+
+输出JSON格式示例:
+{DETAIL_EXAMPLE}"""
+
+    def _build_identify_and_screen_prefix(self, job_info: dict) -> str:
+        channels = list(self.config.RESUME_CHANNELS.keys())
+        return f"""你是专业的HR招聘顾问。
+{SCREEN_INTRO}
+
+请先判断用户提供的邮件是否为候选人的应聘简历；如果是，识别应聘岗位和来源渠道，并对候选人进行全方位、专业的评估。
+
+【公司岗位列表】（matched_position 必须严格从以下岗位名称中选择最匹配的一个，不允许使用列表外的岗位名称，并按该岗位的要求评估）
+{self._job_catalog_text(job_info)}
+
+可选渠道列表: {channels}
+
+【公司背景】
+{self.company_info}
+
+{EDUCATION_RUBRIC}
+
+只返回JSON格式数据，不要带任何多余解释或代码块,如无数据返回为空。
+如果不是简历邮件，只返回: {{"is_resume": false}}
+
+输出JSON格式示例:
+{{
+  "is_resume": true,
+  "matched_position": "",
+  "matched_channel": "",
+  "parsed_info": {{
+{parsed_info_example()}
+  }},
+{ANALYSIS_EXAMPLE}
+}}"""
+
+    def _job_catalog_text(self, job_info: dict) -> str:
+        """全部岗位的要求描述，供单次调用模式匹配岗位并评估"""
+        return "\n".join(catalog_fragment(position_name, detail) for position_name, detail in job_info.items())
+
+    # ---------- 岗位目录 ----------
+
+    def refresh_job_catalog(self) -> bool:
+        """
+        岗位表格修改后重新加载岗位信息，返回是否有变化
+
+        由筛选主循环在每轮开始前调用，不在处理邮件的线程中调用。新的前缀、Schema和岗位embedding矩阵
+        全部生成后才替换当前快照，处理中的调用继续使用旧快照。
+        """
+        if not self.job_catalog:
+            return False
+        with self._jobs_lock:
+            self.job_catalog.load()
+            # 同一岗位目录可能被多个AIScreener共用（如批量筛选），按版本号判断本实例是否需要更新
+            if self.job_catalog.version == self.jobs.version:
+                return False
+            self.set_job_info(self.job_catalog.positions, self.job_catalog.version)
+        return True
+
+    def set_job_info(self, job_info: dict, version: str = ""):
+        """生成新的岗位快照（含岗位向量矩阵）后整体替换当前快照"""
+        jobs = self.compile_jobs(job_info, version)
+        previous = self.jobs.position_matcher
+        if jobs.position_matcher:
+            jobs.position_matcher.build()
+            if previous:
+                # 匹配统计是服务运行期间的累计值
+                jobs.position_matcher.matched, jobs.position_matcher.deferred = previous.matched, previous.deferred
+        self.jobs = jobs
+
+    def resolve_position(self, position_name: str) -> str:
+        """模型返回岗位别称时换成标准岗位名称，无法识别时原样返回"""
+        if not position_name or position_name in self.jobs.job_info or not self.job_catalog:
+            return position_name
+        return self.job_catalog.resolve(position_name) or position_name
+
+    def _position_block(self, position_name: str):
+        """岗位描述块及其token数，当前快照中的岗位已预先生成"""
+        block = self.jobs.position_blocks.get(position_name)
+        if block is None:
+            # 模型返回了岗位列表外的名称
+            block = self._build_position_block(position_name, {})
+        return block
+
+    def _build_position_block(self, position_name: str, detail: dict):
+        """
+        生成岗位描述块及其token数
+
+        岗位描述在预算内按比例截断，只与岗位有关，因此每个岗位只需生成一次。
+        """
+        job_fields = {key: detail.get(key, "") for key in JOB_DETAIL_FIELDS}
+        job_fields, _ = self.budget.fit_job_fields(self.screen_prefix_tokens, job_fields)
+        text = f"""【岗位信息】
+岗位名称: {position_name}
+工作职责: {job_fields["duties"]}
+任职要求: {job_fields["requirements"]}
+学历要求: {job_fields["education_req"]}
+经验要求: {job_fields["exp_req"]}
+绩效目标: {job_fields["perf_goals"]}"""
+        return text, self.budget.count(text)
+
+    # ---------- 结构化输出 ----------
+
+    def structured_kwargs(self, name: str, schema: dict) -> dict:
+        """当前结构化输出方式对应的额外请求参数"""
+        return request_kwargs(self.structured_mode, name, schema)
+
+    def chat(self, request: dict, name: str, schema: dict):
+        """
+        按Schema请求结构化输出并返回模型输出文本
+
+        服务端不接受 response_format/tools 参数(HTTP 400)时，本进程后续请求改为只依赖容错解析。
+        """
+        mode = self.structured_mode
+        try:
+            response = call_openai_with_retry(openai.ChatCompletion.create, self.config, prompt_type=name,
+                                              **request, **request_kwargs(mode, name, schema))
+        except Exception as e:
+            status = getattr(e, "status", None) or getattr(e, "http_status", None)
+            if mode == "none" or status != 400:
+                raise
+            logging.warning(f"[AIScreener] 服务端不支持结构化输出({mode}): {e}，改用容错解析")
+            self.structured_mode = "none"
+            response = call_openai_with_retry(openai.ChatCompletion.create, self.config, prompt_type=name,
+                                              **request)
+        return response_text(response)
+
+    # ---------- 邮件类型识别 ----------
 
     def identify_mail_type(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str):
         """
@@ -53,253 +456,414 @@ class AIScreener:
         Returns:
             tuple: (是否为简历, 匹配的岗位名称, 简历来源渠道)
         """
-        prompt = self.identify_mail_type_get_prompt(subject, resume_text, attach_filenames, from_domain)
+        position_name, candidates = self.match_position(resume_text, attach_filenames, from_domain)
+        if position_name:
+            return True, position_name, self.match_channel(from_domain)
+        prompt = self.identify_mail_type_get_prompt(subject, resume_text, attach_filenames, from_domain,
+                                                    candidates)
         # 记录prompt到日志
         log_prompt("identify_mail_type", prompt)
         return self.identify_mail_type_execute(prompt)
 
-    def identify_mail_type_get_prompt(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str):
-        """生成邮件类型判断prompt"""
-        attach_names = ", ".join(attach_filenames)
-        job_keys = list(self.job_info.keys())
-        channels = list(self.config.RESUME_CHANNELS.keys())
-        
-        prompt = f"""
-你是专业HR助手。请判断下列邮件信息是否为候选人简历：
+    def identify_mail_type_speculative(self, subject: str, resume_text: str, attach_filenames: list,
+                                       from_domain: str):
+        """
+        判断邮件类型，同时按本地猜测的岗位推测评估简历
+
+        Returns:
+            tuple: (是否为简历, 匹配的岗位名称, 简历来源渠道, 候选人基本信息字典, 评估结果字典)，
+                   未推测或推测未命中时后两项为None
+        """
+        position_name, candidates = self.match_position(resume_text, attach_filenames, from_domain)
+        if position_name:
+            return True, position_name, self.match_channel(from_domain), None, None
+        guess = ""
+        if self.speculation and likely_resume(attach_filenames, from_domain, self.config.RESUME_CHANNELS):
+            guess = self.guess_position(subject, candidates)
+        future = None
+        if guess:
+            logging.debug(f"[AIScreener] 推测评估: 岗位={guess}")
+            future = self.speculation.submit(self.screen_resume, guess, resume_text, guess,
+                                             self.match_channel(from_domain))
+        is_resume = False
+        try:
+            prompt = self.identify_mail_type_get_prompt(subject, resume_text, attach_filenames, from_domain,
+                                                        candidates)
+            log_prompt("identify_mail_type", prompt)
+            is_resume, position_name, channel = self.identify_mail_type_execute(prompt)
+        finally:
+            result = (self.speculation.resolve(future, bool(is_resume) and position_name == guess)
+                      if future else None)
+        if result and result[0] and result[1]:
+            return is_resume, position_name, channel, result[0], result[1]
+        return is_resume, position_name, channel, None, None
+
+    def guess_position(self, subject: str, candidates=()) -> str:
+        """本地猜测岗位：主题中出现的岗位名称或别称，否则取向量匹配排名第一的岗位"""
+        job_info = self.jobs.job_info
+        if self.job_catalog:
+            position_name = self.job_catalog.find_in_text(subject)
+        else:
+            names = [name for name in job_info if name and name in (subject or "")]
+            position_name = max(names, key=len) if names else ""
+        if position_name in job_info:
+            return position_name
+        return candidates[0][0] if candidates else ""
 
-邮件信息:
+    def identify_mail_type_get_prompt(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str,
+                                      candidates=()):
+        """
+        生成邮件类型判断prompt中每次调用不同的部分（固定部分见 identify_prefix）
+
+        candidates 为向量匹配排序后的 [(岗位名称, 相似度)]，附在prompt中供参考
+        """
+        attach_names = ", ".join(attach_filenames)
+        prompt = f"""邮件信息:
 - 主题: {subject}
 - 简历内容: {truncate_text(resume_text, 1000, self.config.MODEL_NAME)}
 - 附件文件名: {attach_names}
-- 发件人域名: {from_domain}
+- 发件人域名: {from_domain}"""
+        if candidates:
+            ranked = ", ".join(f"{name}({score:.2f})" for name, score in candidates)
+            prompt += f"\n- 与简历最相近的岗位(向量相似度，仅供参考): {ranked}"
+        return prompt
 
-公司岗位列表（必须严格从以下列表中选择）: 
-{json.dumps(job_keys, ensure_ascii=False, indent=2)}
+    def match_position(self, resume_text: str, attach_filenames: list, from_domain: str):
+        """
+        向量匹配岗位
 
-可选渠道列表: {channels}
+        向量匹配只决定岗位，不能判断邮件是否为简历：只有本地信号（招聘渠道来信、附件名像简历）表明
+        很可能是简历时才直接采用匹配结果，否则候选岗位附在prompt中，由LLM判断是否为简历。
 
-请判断：
-1. 这是否为应聘简历邮件？
-2. 如果是简历，应聘的是哪个岗位？（必须严格从公司岗位列表中选择最匹配的岗位，不允许使用列表外的岗位名称）
-3. 简历来自哪个渠道？（从渠道列表中选择）
+        Returns:
+            tuple: (岗位名称, 候选岗位列表)，未启用、把握不足或不能确定是简历时岗位名称为空字符串
+        """
+        position_matcher = self.jobs.position_matcher
+        if not position_matcher:
+            return "", []
+        allow_direct = likely_resume(attach_filenames, from_domain, self.config.RESUME_CHANNELS)
+        position_name, candidates = position_matcher.match(self.resume_embedding_text(resume_text), allow_direct)
+        if position_name:
+            logging.info(f"[AIScreener] 向量匹配岗位: {position_name}, 候选: {candidates}")
+        return position_name, candidates
 
-请以JSON格式输出,不要带任何多余解释或代码块：
-{{
-  "is_resume": false,
-  "matched_position": "",  # 必须完全匹配公司岗位列表中的某个岗位名称
-  "matched_channel": ""
-}}
-"""
-        return prompt
+    def resume_embedding_text(self, resume_text: str) -> str:
+        """生成简历embedding时使用的文本（截断到 EMBEDDING_MAX_TOKENS），岗位匹配和候选人索引共用以命中缓存"""
+        return truncate_text(resume_text, self.config.EMBEDDING_MAX_TOKENS, self.config.EMBEDDING_MODEL)
+
+    def match_channel(self, from_domain: str) -> str:
+        """按发件人域名匹配来源渠道（渠道列表的键），子域名也能匹配"""
+        from_domain = (from_domain or "").lower()
+        for domain in self.config.RESUME_CHANNELS:
+            if from_domain == domain.lower() or from_domain.endswith("." + domain.lower()):
+                return domain
+        return ""
 
     def identify_mail_type_execute(self, prompt: str):
         """执行邮件类型判断prompt"""
+        jobs = self.jobs
         try:
-            response = call_openai_with_retry(
-                openai.ChatCompletion.create,
-                self.config,
-                model=self.config.MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "你是专业的HR招聘助理。"},
+            txt = self.chat({
+                "model": self.config.MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": jobs.identify_prefix},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.0,
-                max_tokens=500
-            )
-            txt = response["choices"][0]["message"]["content"].strip()
-            try:
-                # Clean up JSON text
-                if txt.startswith("```"):
-                    txt = txt.split("\n", 1)[1]
-                if txt.endswith("```"):
-                    txt = txt.rsplit("\n", 1)[0]
-                result = json.loads(txt)
-                return result.get("is_resume", False), result.get("matched_position", ""), result.get("matched_channel", "")
-            except (json.JSONDecodeError, AttributeError) as e:
-                logging.error(f"identify_mail_type JSON解析失败: {e}, raw_txt={txt}")
+                "temperature": 0.0,
+                "max_tokens": 500,
+            }, "identify_mail_type", jobs.identify_schema)
+            result, issues = parse_structured(txt, jobs.identify_schema)
+            if result is None:
+                logging.error(f"identify_mail_type JSON解析失败: {issues}, raw_txt={txt}")
                 return False, "", ""
+            if issues:
+                logging.warning(f"identify_mail_type 输出已校正: {issues}")
+            return result["is_resume"], self.resolve_position(result["matched_position"]), result["matched_channel"]
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"identify_mail_type失败: {e}")
             return False, "", ""
 
-    def screen_resume(self, resume_text: str, position_name: str):
+    # ---------- 简历评估 ----------
+
+    def screen_resume(self, resume_text: str, position_name: str, channel: str = ""):
         """
         分析简历内容，评估候选人能力
         
         Args:
             resume_text: 简历文本内容
             position_name: 应聘岗位名称
+            channel: 简历来源渠道，用于去除渠道模板文字
             
         Returns:
             tuple: (候选人基本信息字典, 评估结果字典)
         """
-        prompt = self.screen_resume_get_prompt(resume_text, position_name)
-        # 记录prompt到日志
-        log_prompt("screen_resume", prompt)
-        return self.screen_resume_execute(prompt)
-
-    def screen_resume_get_prompt(self, resume_text: str, position_name: str):
-        """生成简历分析prompt"""
-        detail = self.job_info.get(position_name, {})
-        prompt = f"""
-你是一位拥有10年以上招聘经验的资深HR专家，专注于人工智能公司的技术人才评估。作为创业型AI技术公司，我们特别重视以下能力和背景：
-1. 技术创新能力和学习速度
-2. 在快速迭代环境中的适应能力
-3. 对AI技术的理解和热情
-4. 创业精神和主人翁意识
-5. 跨团队协作能力
-6. 优质教育背景（特别是985、211或国际知名高校）
+        # 联系方式、年龄、院校等确定性字段先在本地提取，只让模型输出其余字段
+        local_info = extract_resume_fields(resume_text) if self.config.LOCAL_FIELD_EXTRACTION else {}
 
-请基于以下信息，对候选人进行全方位、专业的评估：
+        if self.cascade:
+            parsed_info, analysis = self.screen_resume_with_model(
+                resume_text, position_name, channel, local_info.keys(), self.cascade.cheap_model
+            )
+            parsed_info, analysis = self.escalate(resume_text, position_name, channel, local_info.keys(),
+                                                  parsed_info, analysis)
+        else:
+            parsed_info, analysis = self.screen_resume_with_model(
+                resume_text, position_name, channel, local_info.keys(), self.config.MODEL_NAME
+            )
+        if parsed_info and local_info:
+            logging.debug(f"[AIScreener] 本地提取字段: {sorted(local_info)}")
+            parsed_info.update(local_info)
+        return parsed_info, analysis
 
-【岗位信息】
-岗位名称: {position_name}
-工作职责: {detail.get("duties", "")}
-任职要求: {detail.get("requirements", "")}
-学历要求: {detail.get("education_req", "")}
-经验要求: {detail.get("exp_req", "")}
-绩效目标: {detail.get("perf_goals", "")}
+    def screen_resume_with_model(self, resume_text: str, position_name: str, channel: str,
+                                 skip_fields, model: str):
+        """用指定模型评估简历，相同简历、岗位、模型和prompt版本的结果直接复用"""
+        def compute():
+            prompt = self.screen_resume_get_prompt(resume_text, position_name, channel,
+                                                   skip_fields=skip_fields)
+            # 记录prompt到日志
+            log_prompt("screen_resume", prompt)
+            return self.screen_resume_execute(prompt, model)
 
-【公司背景】
-{self.company_info}
+        return self.result_cache.get_or_compute(
+            md5_hash(resume_text), position_name, model,
+            self.screen_prompt_version(position_name, skip_fields),
+            compute, is_valid=lambda result: bool(result[0]) and bool(result[1])
+        )
 
-【教育背景评估标准】
-按照第一学历和学校评估：
-1. 最高级（15分）：清华、北大、Top30国际名校
-2. 较高级（12分）：其他985高校、Top50国际名校
-3. 中等级（10分）：211高校、知名外国大学
-4. 基本级（5分）：一般本科院校
-5. 其他（0分）：大专及其他院校，本科非统招视为专科
+    def escalate(self, resume_text: str, position_name: str, channel: str, skip_fields,
+                 parsed_info: dict, analysis: dict):
+        """
+        分级评估：小模型的结果在合格线附近或无效时，用大模型重新评估
 
-最高学历加分（在第一学历基础上）：
-- 国内外顶尖院校相关专业硕博：+5分
-- 985高校相关专业硕博：+4分
-- 211高校相关专业硕博：+3分
-- 其他院校相关专业硕博：+0分
+        Returns:
+            tuple: (候选人基本信息字典, 评估结果字典)，大模型失败时保留小模型的有效结果
+        """
+        reason = self.cascade.escalation_reason(parsed_info, analysis)
+        if not reason:
+            self.cascade.record(position_name, analysis)
+            return parsed_info, analysis
 
-【候选人简历】
-{truncate_text(resume_text, self.config.MAX_TOKEN, self.config.MODEL_NAME)}
+        logging.info(f"[AIScreener] 分级评估升级({reason}): 岗位={position_name}")
+        strong_info, strong_analysis = self.screen_resume_with_model(
+            resume_text, position_name, channel, skip_fields, self.config.MODEL_NAME
+        )
+        self.cascade.record(position_name, analysis, strong_analysis, reason)
+        if strong_info and strong_analysis:
+            return strong_info, strong_analysis
+        return parsed_info, analysis
 
-请根据以上信息，对候选人进行专业评估，只返回JSON格式数据，不要带任何多余解释或代码块,如无数据返回为空。
+    def _active_screen_prefix(self):
+        """简历评估使用的固定前缀、token数、Schema和输出上限：两阶段评估时只输出评分"""
+        if self.detail_mode == "deferred":
+            return self.scores_prefix, self.scores_prefix_tokens, SCREEN_SCORES_SCHEMA, 600
+        return self.screen_prefix, self.screen_prefix_tokens, SCREEN_SCHEMA, 1500
 
-输出JSON格式示例:
-{{
-  "parsed_info": {{
-    "name": "候选人姓名",
-    "position": "应聘职位（必须匹配岗位要求中的职位名称）",
-    "experience": "工作年限",
-    "latest_company": "最近就职公司",
-    "first_education": "第一学历",
-    "first_university": "第一学历院校",
-    "highest_education": "最高学历",
-    "highest_university": "最高学历院校",
-    "marital_status": "婚姻状况",
-    "age": 0-30,
-    "gender": "性别", 
-    "phone": "联系电话",
-    "email": "电子邮箱",
-    "wechat": "微信号",
-    "expected_salary": "期望薪资",
-    "resume_source": "简历来源"
-  }},
-  "analysis": {{
-    "education_score": 0,
-    "education_detail": "教育背景评价（第一学历、学校层次、专业匹配度等）",
-    "technical_score": 0,
-    "technical_detail": "技术实力评价（技术栈匹配度、项目经验深度、算法能力等）",
-    "innovation_score": 0,
-    "innovation_detail": "创新潜力评价（高水平论文专利、学习能力、技术视野等）",
-    "growth_score": 0,
-    "growth_detail": "成长速度评价（履历提升、自我驱动力、知识更新速度等）",
-    "startup_score": 0,
-    "startup_detail": "创业特质评价（创业经历、主动性、抗压能力等）",
-    "teamwork_score": 0,
-    "teamwork_detail": "团队协作评价（团队领导经历、沟通能力、跨部门协作等）",
-    "risk": "风险提示（教育风险、技术风险、稳定性风险、团队融入风险等）",
-    "questions": "技术深度考察题（考察实际编码和算法能力）,
-    项目难点解决案例（考察问题解决能力）,
-    创新思维案例（考察技术创新能力）,
-    学习能力案例（考察快速掌握新技术的能力）,
-    压力处理案例（考察抗压能力）,
-    对AI创业公司的理解（考察认知匹配度）"
-  }}
-}}
-"""
-        return prompt
+    def screen_prompt_version(self, position_name: str, skip_fields=()) -> str:
+        """简历评估prompt的版本号，由固定前缀、岗位描述块和相关配置决定"""
+        return prompt_version(
+            SCREEN_PROMPT_REVISION, self._active_screen_prefix()[0], self._position_block(position_name)[0],
+            skip_fields_note(skip_fields), self.config.RESUME_SECTIONIZER, self.config.MAX_TOKEN,
+            self.config.PROMPT_MIN_RESUME_TOKENS
+        )
+
+    def compact_resume(self, resume_text: str, channel: str = "") -> str:
+        """本地切分简历并去除模板文字，返回用于prompt的紧凑文本"""
+        if not self.sectionizer:
+            return resume_text
+        result = self.sectionizer.sectionize(resume_text, channel)
+        if not result["compact_text"]:
+            return resume_text
+        logging.info(f"[AIScreener] 简历结构化压缩: {result['original_tokens']} -> "
+                     f"{result['compact_tokens']} tokens, 节省 {result['saved_tokens']} tokens")
+        return result["compact_text"]
 
-    def screen_resume_execute(self, prompt: str):
-        """执行简历分析prompt"""
+    def screen_resume_get_prompt(self, resume_text: str, position_name: str, channel: str = "",
+                                 skip_fields=()):
+        """
+        生成简历分析prompt中每次调用不同的部分：预编译的岗位描述块 + 简历
+
+        固定部分见 screen_prefix；skip_fields 为无需模型输出的 parsed_info 字段。
+        """
+        block, block_tokens = self._position_block(position_name)
+        prefix_tokens = self._active_screen_prefix()[1]
+        resume_text = self.compact_resume(resume_text, channel)
+        resume_text, resume_tokens = self.budget.fit_resume(prefix_tokens + block_tokens, resume_text)
+        logging.debug(f"[AIScreener] prompt token分配: 前缀 {prefix_tokens}, "
+                      f"岗位 {block_tokens}, 简历 {resume_tokens}")
+        return f"{block}\n\n【候选人简历】\n{resume_text}{skip_fields_note(skip_fields)}"
+
+    def screen_resume_execute(self, prompt: str, model: str = None):
+        """执行简历分析prompt，model 默认为 MODEL_NAME"""
+        prefix, _, schema, max_tokens = self._active_screen_prefix()
         try:
-            response = call_openai_with_retry(
-                openai.ChatCompletion.create,
-                self.config,
-                model=self.config.MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "你是专业的HR招聘顾问。"},
+            txt = self.chat({
+                "model": model or self.config.MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": prefix},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=1500
-            )
-            txt = response["choices"][0]["message"]["content"].strip()
+                "temperature": 0.1,
+                "max_tokens": max_tokens,
+            }, "screen_resume" if schema is SCREEN_SCHEMA else "screen_scores", schema)
             
             # 添加原始响应日志
             logging.debug(f"OpenAI原始响应:\n{txt}")
-            
-            try:
-                # 清理和解析JSON
-                txt = txt.strip()
-                if "```" in txt:
-                    txt = txt[txt.find("{"):txt.rfind("}")+1]  # 直接提取JSON部分
-                
-                # 打印原始响应和清理后的JSON
-                logging.debug(f"OpenAI原始响应:\n{txt}")
-                
-                result = json.loads(txt)
-                parsed_info = result.get("parsed_info", {})
-                analysis = result.get("analysis", {})
-                
-                if not parsed_info or not analysis:
-                    logging.error("JSON缺少必要字段 parsed_info 或 analysis")
-                    logging.error(f"解析结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                    return {}, {}
-
-                # 补充缺失的评分和详情
-                score_fields = [
-                    ("education_score", "education_detail"),
-                    ("technical_score", "technical_detail"),
-                    ("innovation_score", "innovation_detail"),
-                    ("growth_score", "growth_detail"),
-                    ("startup_score", "startup_detail"),
-                    ("teamwork_score", "teamwork_detail")
-                ]
-
-                # 确保所有字段都存在
-                for score_field, detail_field in score_fields:
-                    if score_field not in analysis:
-                        logging.warning(f"缺失评分字段: {score_field}")
-                        analysis[score_field] = 0
-                    if detail_field not in analysis:
-                        logging.warning(f"缺失详情字段: {detail_field}")
-                        analysis[detail_field] = ""
-                    
-                    # 尝试转换score为整数
-                    try:
-                        analysis[score_field] = int(analysis[score_field])
-                    except (ValueError, TypeError):
-                        logging.warning(f"评分转换失败 {score_field}: {analysis[score_field]}")
-                        analysis[score_field] = 0
-
-                return parsed_info, analysis
-                
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON解析失败: {e}\nJSON文本:\n{txt}")
-                return {}, {}
-                
+            return parse_screen_result(txt, schema)
+
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"AI评估失败: {e}")
             return {}, {}
 
+    def screen_details(self, resume_text: str, position_name: str, analysis: dict, channel: str = "") -> dict:
+        """
+        两阶段评估的第二阶段：基于已有评分生成各维度评价详情、风险提示和面试问题
+
+        Args:
+            resume_text: 简历文本内容
+            position_name: 应聘岗位名称
+            analysis: 第一阶段的评估结果，其中的评分随prompt提供给模型
+            channel: 简历来源渠道
+
+        Returns:
+            dict: DETAIL_FIELDS 对应的字段，失败时返回空字典
+        """
+        block, block_tokens = self._position_block(position_name)
+        scores = {key: value for key, value in analysis.items() if key.endswith("_score")}
+        scores_text = json.dumps(scores, ensure_ascii=False)
+        resume_text, _ = self.budget.fit_resume(
+            self.detail_prefix_tokens + block_tokens + self.budget.count(scores_text),
+            self.compact_resume(resume_text, channel)
+        )
+        prompt = f"{block}\n\n【候选人简历】\n{resume_text}\n\n【已有评分】\n{scores_text}"
+        log_prompt("screen_details", prompt)
+        try:
+            txt = self.chat({
+                "model": self.config.MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": self.detail_prefix},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.1,
+                "max_tokens": 1200,
+            }, "screen_details", SCREEN_DETAIL_SCHEMA)
+            result = repair_json(txt)
+            if not isinstance(result, dict):
+                logging.error(f"评价详情JSON解析失败, JSON文本:\n{txt}")
+                return {}
+            return {key: value for key, value in coerce(result, SCREEN_DETAIL_SCHEMA).items()
+                    if key in DETAIL_FIELDS}
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"生成评价详情失败: {e}")
+            return {}
+
+    # ---------- 单次调用模式 ----------
+
+    def precheck_mail(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str):
+        """
+        本地预检，排除明显的非简历邮件，无需调用LLM
+
+        Returns:
+            tuple: (是否可能为简历, 判定原因)，未开启预检时总是放行
+        """
+        if not self.config.MAIL_PRECHECK:
+            return True, "未开启预检"
+        return precheck_mail(subject, resume_text, attach_filenames, from_domain, self.config.RESUME_CHANNELS)
+
+    def identify_and_screen(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str):
+        """
+        单次调用完成邮件类型识别、岗位/渠道匹配和简历评估
+        
+        Args:
+            subject: 邮件主题
+            resume_text: 邮件正文文本
+            attach_filenames: 附件文件名列表
+            from_domain: 发件人域名
+            
+        Returns:
+            tuple: (是否为简历, 匹配的岗位名称, 简历来源渠道, 候选人基本信息字典, 评估结果字典)
+                   调用或解析失败时是否为简历为None
+        """
+        position_name, _ = self.match_position(resume_text, attach_filenames, from_domain)
+        if position_name:
+            # 岗位已确定，只需评估，不必在prompt中带上全部岗位描述
+            channel = self.match_channel(from_domain)
+            parsed_info, analysis = self.screen_resume(resume_text, position_name, channel)
+            return True, position_name, channel, parsed_info, analysis
+
+        local_info = extract_resume_fields(resume_text) if self.config.LOCAL_FIELD_EXTRACTION else {}
+        prompt = self.identify_and_screen_get_prompt(subject, resume_text, attach_filenames, from_domain,
+                                                     skip_fields=local_info.keys())
+        log_prompt("identify_and_screen", prompt)
+        model = self.cascade.cheap_model if self.cascade else None
+        is_resume, position_name, channel, parsed_info, analysis = self.identify_and_screen_execute(prompt, model)
+        position_name = self.resolve_position(position_name)
+        if self.cascade and is_resume:
+            parsed_info, analysis = self.escalate(resume_text, position_name, channel, local_info.keys(),
+                                                  parsed_info, analysis)
+        if parsed_info and local_info:
+            parsed_info.update(local_info)
+        return is_resume, position_name, channel, parsed_info, analysis
+
+    def identify_and_screen_get_prompt(self, subject: str, resume_text: str, attach_filenames: list,
+                                       from_domain: str, skip_fields=()):
+        """生成单次调用模式prompt中每次调用不同的部分：邮件信息 + 简历（固定部分见 identify_and_screen_prefix）"""
+        attach_names = ", ".join(attach_filenames)
+        resume_text = self.compact_resume(resume_text, from_domain)
+        prefix_tokens = self.jobs.identify_and_screen_prefix_tokens
+        resume_text, resume_tokens = self.budget.fit_resume(prefix_tokens, resume_text)
+        logging.debug(f"[AIScreener] prompt token分配: 前缀 {prefix_tokens}, "
+                      f"简历 {resume_tokens}")
+        return f"""【邮件信息】
+- 主题: {subject}
+- 附件文件名: {attach_names}
+- 发件人域名: {from_domain}
+
+【候选人简历】
+{resume_text}{skip_fields_note(skip_fields)}"""
+
+    def identify_and_screen_request(self, prompt: str, structured: bool = True, model: str = None,
+                                    jobs: JobPrompts = None) -> dict:
+        """
+        单次调用模式的请求参数，在线调用和批量接口共用
+
+        structured 为 False 时不含结构化输出参数；model 默认为 MODEL_NAME；jobs 默认为当前岗位快照
+        """
+        jobs = jobs or self.jobs
+        request = {
+            "model": model or self.config.MODEL_NAME,
+            "messages": [
+                {"role": "system", "content": jobs.identify_and_screen_prefix},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,
+            "max_tokens": 1500,
+        }
+        if structured:
+            request.update(self.structured_kwargs("identify_and_screen", jobs.identify_and_screen_schema))
+        return request
+
+    def identify_and_screen_execute(self, prompt: str, model: str = None):
+        """执行单次调用模式的识别+评估prompt"""
+        jobs = self.jobs
+        try:
+            request = self.identify_and_screen_request(prompt, structured=False, model=model, jobs=jobs)
+            txt = self.chat(request, "identify_and_screen", jobs.identify_and_screen_schema)
+            logging.debug(f"OpenAI原始响应:\n{txt}")
+            return parse_identify_and_screen(txt, jobs.identify_and_screen_schema)
+                
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"identify_and_screen失败: {e}")
+            return None, "", "", {}, {}
+
     def get_embedding(self, text: str):
         if not text.strip():
             return []
@@ -313,65 +877,182 @@ class AIScreener:
             response = call_openai_with_retry(
                 openai.Embedding.create,
                 self.config,
+                prompt_type="embedding",
                 input=text,
-                model="text-embedding-ada-002"
+                model=self.config.EMBEDDING_MODEL
             )
             emb = response["data"][0]["embedding"]
             if self.embedding_cache:
                 self.embedding_cache.set(h, emb)
-                self.embedding_cache.save()
             return emb
         except Exception as e:
             logging.error(f"get_embedding失败: {e}")
             return []
 
-def call_openai_with_retry(api_func, config, **kwargs):
-    """带重试和超时机制的OpenAI API调用"""
+def validate_screen_result(result: dict, schema: dict = SCREEN_SCHEMA):
+    """
+    校验简历评估结果：按Schema补齐缺失的评分和详情字段并转换类型
+
+    Returns:
+        tuple: (parsed_info, analysis)，缺少必要字段时返回 ({}, {})
+    """
+    if not result.get("parsed_info") or not result.get("analysis"):
+        logging.error("JSON缺少必要字段 parsed_info 或 analysis")
+        logging.error(f"解析结果: {json.dumps(result, ensure_ascii=False, indent=2)}")
+        return {}, {}
+
+    issues = []
+    result = coerce(result, schema, issues=issues)
+    if issues:
+        logging.warning(f"评估结果已校正: {issues}")
+    return result["parsed_info"], result["analysis"]
+
+def parse_screen_result(txt: str, schema: dict = SCREEN_SCHEMA):
+    """
+    解析简历评估的模型输出，格式不规范时尝试修复
+
+    Returns:
+        tuple: (parsed_info, analysis)，解析失败时返回 ({}, {})
+    """
+    result = repair_json(txt)
+    if result is None:
+        logging.error(f"JSON解析失败, JSON文本:\n{txt}")
+        return {}, {}
+    return validate_screen_result(result, schema)
+
+def parse_identify_and_screen(txt: str, schema: dict = None):
+    """
+    解析单次调用模式的模型输出
+
+    Args:
+        txt: 模型输出
+        schema: 单次调用模式的Schema，默认不限定岗位和渠道
+
+    Returns:
+        tuple: (是否为简历, 匹配的岗位名称, 简历来源渠道, 候选人基本信息字典, 评估结果字典)，
+               解析失败时是否为简历为None
+    """
+    schema = schema or identify_and_screen_schema()
+    result = repair_json(txt)
+    if result is None:
+        logging.error(f"identify_and_screen JSON解析失败, JSON文本:\n{txt}")
+        return None, "", "", {}, {}
+
+    identity = coerce(result, identify_schema())
+    if not identity["is_resume"]:
+        return False, "", "", {}, {}
+
+    parsed_info, analysis = validate_screen_result(result, schema)
+    return True, identity["matched_position"], identity["matched_channel"], parsed_info, analysis
+
+def call_openai_with_retry(api_func, config, prompt_type: str = "", **kwargs):
+    """
+    带重试和超时机制的OpenAI API调用，所有请求共用进程内的RPM/TPM限流器
+
+    每次调用（含全部重试）的token、耗时、重试次数和错误记录到调用台账，prompt_type 标识调用类型
+    """
+    ledger = get_llm_ledger(config)
+    stats = {"attempts": 1}
+    start = time.perf_counter()
+    try:
+        response = _call_openai(api_func, config, stats, prompt_type, **kwargs)
+    except Exception as e:
+        ledger.record(prompt_type, kwargs.get('model'), latency=time.perf_counter() - start,
+                      retries=stats["attempts"] - 1, error=type(e).__name__)
+        raise
+    usage = response.get("usage") or {}
+    ledger.record(prompt_type, kwargs.get('model'), usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                  time.perf_counter() - start, stats["attempts"] - 1)
+    return response
+
+def _call_openai(api_func, config, stats: dict, prompt_type: str = "", **kwargs):
+    if config.LLM_CLIENT == "async" and api_func == openai.ChatCompletion.create:
+        # 异步客户端：共享连接池，按服务端限流头统一退避
+        kwargs.pop('timeout', None)
+        return get_llm_client(config).chat_completion_sync(stats=stats, prompt_type=prompt_type, **kwargs)
+
     max_retries = config.AI_RETRY_TIMES
-    base_timeout = config.AI_TIMEOUT
-    backoff_factor = 2
-    
+    backends = get_backend_pool(config)
+    breaker = get_circuit_breaker(config)
+    estimated = estimate_request_tokens(kwargs.get('messages', []), kwargs.get('max_tokens'),
+                                        kwargs.get('model'))
+    # 固定超时：故障期间不再逐次延长等待，由熔断器和重试预算限制总耗时
+    kwargs['timeout'] = config.AI_TIMEOUT
+    last_error = None
+    wait_time = 0.0
+    backend = None
+    failover = False
+
     for attempt in range(max_retries):
+        if attempt > 0:
+            # 换后端重试（限流、认证失败）不放大请求量，不占用重试预算
+            if not failover and not breaker.allow_retry():
+                raise Exception(f"OpenAI API调用失败，重试预算已用完: {last_error}")
+            logging.debug(f"等待 {wait_time:.1f} 秒后重试...")
+            time.sleep(wait_time)
+        stats["attempts"] = attempt + 1
+        breaker.before_call()
+        # 选择负载最小的健康后端，重试时优先换一个后端
+        backend = backends.acquire(estimated, kwargs.get('model'), exclude=backend)
         try:
-            # 指数退避的等待时间
-            if attempt > 0:
-                wait_time = min(base_timeout * (backoff_factor ** (attempt - 1)), 60)
-                logging.debug(f"等待 {wait_time} 秒后重试...")
-                time.sleep(wait_time)
-            
-            # 根据尝试次数增加超时时间
-            timeout = base_timeout * (attempt + 1)
-            kwargs['timeout'] = timeout
-            logging.debug(f"调用OpenAI API (尝试 {attempt + 1}/{max_retries}, 超时={timeout}秒)")
-            
-            response = api_func(**kwargs)
+            logging.debug(f"调用OpenAI API (后端 {backend.name}, 尝试 {attempt + 1}/{max_retries}, "
+                          f"超时={config.AI_TIMEOUT}秒)")
+            response = api_func(api_key=backend.api_key, api_base=backend.api_base, **kwargs)
+            breaker.record_success()
+            usage = response.get("usage") or {}
+            backend.rate_limiter.adjust_tokens(estimated, usage.get("total_tokens"))
+            backends.release(backend, "ok")
             return response
-            
-        except openai.error.Timeout as e:
-            logging.warning(f"OpenAI请求超时 (尝试 {attempt + 1}/{max_retries}): {e}")
-        except openai.error.APIError as e:
-            if '502' in str(e):  # Bad Gateway error
-                logging.warning(f"OpenAI API网关错误 (尝试 {attempt + 1}/{max_retries}): 502 Bad Gateway")
-            else:
-                logging.warning(f"OpenAI API错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+
+        except (openai.error.AuthenticationError, openai.error.PermissionError) as e:
+            # 该后端的key无效，暂停使用该后端
+            breaker.record_success()
+            backend.rate_limiter.adjust_tokens(estimated, 0)
+            backends.release(backend, "auth_error")
+            if not backends.multiple:
+                raise
+            last_error = e
+            wait_time = 0.0
+            failover = True
+            logging.warning(f"后端 {backend.name} 认证失败，换后端重试: {e}")
+        except openai.error.InvalidRequestError:
+            # 服务可用但请求本身有误，重试没有意义
+            breaker.record_success()
+            backend.rate_limiter.adjust_tokens(estimated, 0)
+            backends.release(backend, "ok")
+            raise
         except openai.error.RateLimitError as e:
-            wait_time = min(backoff_factor ** attempt, 60)
-            logging.warning(f"达到速率限制，等待{wait_time}秒后重试: {e}")
-            time.sleep(wait_time)
-        except openai.error.APIConnectionError as e:
-            logging.warning(f"OpenAI API连接错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-            time.sleep(5)  # 连接错误等待更长时间
+            # 按服务端返回的等待时间让该后端的所有线程一起暂停，有其他后端时立即换后端重试
+            breaker.record_success()
+            last_error = e
+            headers = {k.lower(): v for k, v in (e.headers or {}).items()}
+            wait_time = retry_delay(headers, attempt)
+            backend.rate_limiter.adjust_tokens(estimated, 0)
+            backend.rate_limiter.block_for(wait_time)
+            backends.release(backend, "rate_limited")
+            failover = backends.multiple
+            if failover:
+                wait_time = 0.0
+            logging.warning(f"后端 {backend.name} 达到速率限制，{wait_time:.1f}秒后重试: {e}")
         except Exception as e:
-            logging.error(f"OpenAI请求异常 (尝试 {attempt + 1}/{max_retries}): {type(e).__name__}: {e}")
-            if attempt == max_retries - 1:  # 最后一次尝试时记录更详细的错误信息
-                logging.error(f"详细错误信息: {str(e)}", exc_info=True)
-        
-        # 最后一次尝试失败
-        if attempt == max_retries - 1:
-            error_msg = f"OpenAI API调用失败，已重试{max_retries}次"
-            logging.error(error_msg)
-            raise Exception(error_msg)
+            # 超时、连接错误、5xx等，计入熔断器
+            breaker.record_failure()
+            last_error = e
+            failover = False
+            backend.rate_limiter.adjust_tokens(estimated, 0)
+            backends.release(backend, "failure")
+            wait_time = retry_delay(None, attempt, cap=config.LLM_MAX_BACKOFF)
+            if isinstance(e, openai.error.Timeout):
+                logging.warning(f"OpenAI请求超时 (尝试 {attempt + 1}/{max_retries}): {e}")
+            elif isinstance(e, (openai.error.APIError, openai.error.APIConnectionError)):
+                logging.warning(f"OpenAI API错误 (尝试 {attempt + 1}/{max_retries}): {e}")
+            else:
+                logging.error(f"OpenAI请求异常 (尝试 {attempt + 1}/{max_retries}): {type(e).__name__}: {e}")
+
+    error_msg = f"OpenAI API调用失败，已重试{max_retries}次: {last_error}"
+    logging.error(error_msg)
+    raise Exception(error_msg)
 
 def truncate_text(text: str, max_len: int, model_name: str) -> str:
-    # TODO: refine if needed
-    return text[:max_len]
+    """按token边界截断文本，max_len 为token数"""
+    return truncate_tokens(text, max_len, model_name)
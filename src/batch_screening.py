@@ -0,0 +1,287 @@
+# batch_screening.py
+"""
+批量接口筛选模块
+
+首次回填或prompt变更后会积压大量 NEW 邮件，逐封同步调用既慢又贵。本模块把待处理邮件
+打包成批量接口(Batch API)的JSONL任务：
+1. 本地预检后，每封邮件生成一条单次调用模式（识别+评估）的请求，custom_id 为 email-<id>
+2. 上传文件并创建批量任务，邮件状态置为 BATCH_PENDING，在线筛选不会再处理这些邮件
+3. 定期查询任务状态，完成后下载结果，通过 RecruitService.store_candidate 写入候选人
+4. 任务信息写入检查点文件，重启后继续查询已提交的任务而不是重新提交
+
+接口地址取 BATCH_API_BASE（默认同 OPENAI_API_BASE），可以指向 tools/mock_openai_server.py 做本地测试。
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import requests
+from datetime import datetime
+from sqlalchemy import text
+from db_manager import Email
+from ai_screener import AIScreener, parse_identify_and_screen
+from structured_output import response_text
+from recruit_service import RecruitService
+from resume_extractor import extract_resume_fields
+
+# 批量任务的终止状态
+FINISHED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchAPIClient:
+    def __init__(self, config):
+        self.base_url = (config.BATCH_API_BASE or config.OPENAI_API_BASE).rstrip("/")
+        self.timeout = config.AI_TIMEOUT
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {config.OPENAI_API_KEY}"
+
+    def _request(self, method, path, **kwargs):
+        resp = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    def upload_file(self, content: bytes, filename: str) -> str:
+        resp = self._request("POST", "/files", data={"purpose": "batch"},
+                             files={"file": (filename, content, "application/jsonl")})
+        return resp.json()["id"]
+
+    def create_batch(self, input_file_id: str, metadata: dict = None) -> dict:
+        return self._request("POST", "/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+            "metadata": metadata or {},
+        }).json()
+
+    def get_batch(self, batch_id: str) -> dict:
+        return self._request("GET", f"/batches/{batch_id}").json()
+
+    def download_file(self, file_id: str) -> str:
+        return self._request("GET", f"/files/{file_id}/content").text
+
+
+class BatchScreeningRunner:
+    def __init__(self, config, job_info: dict, company_info: str, job_catalog=None):
+        self.config = config
+        # 与在线筛选共用岗位目录，筛选主循环每轮调用 ai_screener.refresh_job_catalog 同步岗位表格的修改
+        self.ai_screener = AIScreener(config, job_info, company_info, job_catalog=job_catalog)
+        self.recruit_service = RecruitService(config)
+        self.client = BatchAPIClient(config)
+        self.state_file = config.BATCH_API_STATE_FILE
+        self.max_requests = config.BATCH_API_MAX_REQUESTS
+        self.jobs = self._load_state()
+
+    # ---------- 检查点 ----------
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("jobs", {})
+        except Exception as e:
+            logging.error(f"[BatchScreening] 读取检查点失败: {e}")
+            return {}
+
+    def _save_state(self):
+        state_dir = os.path.dirname(self.state_file)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"jobs": self.jobs}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    # ---------- 提交 ----------
+
+    def build_request(self, db_email) -> dict:
+        """生成单封邮件的批量请求行"""
+        try:
+            attachments_info = json.loads(db_email.attachments_info) if db_email.attachments_info else []
+            attach_filenames = [att.get('name', '') for att in attachments_info if isinstance(att, dict)]
+        except Exception:
+            attach_filenames = []
+        from_domain = db_email.from_address.split('@')[-1] if db_email.from_address else ""
+
+        is_candidate, reason = self.ai_screener.precheck_mail(
+            db_email.subject, db_email.content_text, attach_filenames, from_domain
+        )
+        if not is_candidate:
+            return {"precheck_reason": reason}
+
+        local_info = extract_resume_fields(db_email.content_text) if self.config.LOCAL_FIELD_EXTRACTION else {}
+        prompt = self.ai_screener.identify_and_screen_get_prompt(
+            db_email.subject, db_email.content_text, attach_filenames, from_domain,
+            skip_fields=local_info.keys()
+        )
+        return {
+            "custom_id": f"email-{db_email.id}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self.ai_screener.identify_and_screen_request(prompt),
+        }
+
+    def submit_pending(self, session) -> int:
+        """
+        把 NEW 状态的邮件打包成一个批量任务提交
+
+        Returns:
+            int: 本次处理的邮件数（含本地预检排除的），为0表示没有可提交的邮件或提交失败
+        """
+        emails = session.query(Email).filter(
+            Email.process_status == "NEW"
+        ).order_by(Email.id).limit(self.max_requests).all()
+        if not emails:
+            return 0
+
+        lines, email_ids = [], []
+        for db_email in emails:
+            request = self.build_request(db_email)
+            if "precheck_reason" in request:
+                db_email.process_status = "NOT_RESUME"
+                db_email.error_message = f"非简历邮件(本地预检: {request['precheck_reason']})"
+                continue
+            lines.append(json.dumps(request, ensure_ascii=False))
+            email_ids.append(db_email.id)
+        session.commit()
+        if not email_ids:
+            return len(emails)
+
+        # 先占用邮件并写检查点，再提交；提交失败时放回 NEW
+        claimed = self._set_status(session, email_ids, "BATCH_PENDING", from_status="NEW")
+        if claimed != len(email_ids):
+            # 部分邮件已被在线筛选处理，重新生成本批次
+            self._set_status(session, email_ids, "NEW", from_status="BATCH_PENDING")
+            logging.warning("[BatchScreening] 部分邮件状态已变化，下次重新打包")
+            return 0
+
+        job_id = uuid.uuid4().hex[:12]
+        self.jobs[job_id] = {"email_ids": email_ids, "batch_id": None, "status": "preparing",
+                             "submitted_at": datetime.now().isoformat()}
+        self._save_state()
+        try:
+            content = ("\n".join(lines) + "\n").encode("utf-8")
+            file_id = self.client.upload_file(content, f"screening_{job_id}.jsonl")
+            batch = self.client.create_batch(file_id, metadata={"job_id": job_id})
+        except Exception as e:
+            logging.error(f"[BatchScreening] 提交批量任务失败: {e}")
+            self._set_status(session, email_ids, "NEW", from_status="BATCH_PENDING")
+            del self.jobs[job_id]
+            self._save_state()
+            return 0
+
+        self.jobs[job_id].update({"batch_id": batch["id"], "input_file_id": file_id,
+                                  "status": batch.get("status", "validating")})
+        self._save_state()
+        logging.info(f"[BatchScreening] 已提交批量任务 {batch['id']}: {len(email_ids)} 封邮件")
+        return len(emails)
+
+    @staticmethod
+    def _set_status(session, email_ids, status, from_status):
+        result = session.execute(text(f"""
+            UPDATE emails
+            SET process_status = :status, update_time = NOW()
+            WHERE id IN ({",".join(str(int(i)) for i in email_ids)})
+            AND process_status = :from_status
+        """), {"status": status, "from_status": from_status})
+        session.commit()
+        return result.rowcount
+
+    # ---------- 查询与回写 ----------
+
+    def poll(self, session) -> int:
+        """
+        查询所有未完成的任务，完成的任务回写结果并从检查点移除
+
+        Returns:
+            int: 仍未完成的任务数
+        """
+        for job_id, job in list(self.jobs.items()):
+            if not job.get("batch_id"):
+                # 提交过程中中断，任务是否创建未知，邮件放回 NEW 重新提交
+                logging.warning(f"[BatchScreening] 任务 {job_id} 未完成提交，邮件重新排队")
+                self._set_status(session, job["email_ids"], "NEW", from_status="BATCH_PENDING")
+                del self.jobs[job_id]
+                self._save_state()
+                continue
+
+            try:
+                batch = self.client.get_batch(job["batch_id"])
+            except Exception as e:
+                logging.warning(f"[BatchScreening] 查询任务 {job['batch_id']} 失败: {e}")
+                continue
+
+            status = batch.get("status")
+            if status != job.get("status"):
+                job["status"] = status
+                self._save_state()
+            if status not in FINISHED_STATUSES:
+                continue
+
+            output = self.client.download_file(batch["output_file_id"]) if batch.get("output_file_id") else ""
+            errors = self.client.download_file(batch["error_file_id"]) if batch.get("error_file_id") else ""
+            self.apply_results(session, job["email_ids"], output, errors, status)
+            del self.jobs[job_id]
+            self._save_state()
+        return len(self.jobs)
+
+    def apply_results(self, session, email_ids, output: str, errors: str, batch_status: str):
+        """回写批量任务结果，没有结果的邮件标记为 FAILED 由在线筛选重试"""
+        from screening import save_screening_result
+
+        results = {}
+        for line in (output + "\n" + errors).splitlines():
+            if line.strip():
+                item = json.loads(line)
+                results[item.get("custom_id")] = item
+
+        completed = failed = 0
+        for email_id in email_ids:
+            db_email = session.query(Email).filter_by(id=email_id).first()
+            if db_email is None or db_email.process_status != "BATCH_PENDING":
+                continue
+            try:
+                item = results.get(f"email-{email_id}")
+                response = (item or {}).get("response") or {}
+                if not item or response.get("status_code") != 200:
+                    error = (item or {}).get("error") or f"批量任务{batch_status}，无结果"
+                    raise ValueError(f"批量请求失败: {error}")
+
+                txt = response_text(response["body"])
+                is_resume, position_name, channel, parsed_info, analysis = parse_identify_and_screen(
+                    txt, self.ai_screener.identify_and_screen_schema
+                )
+                if is_resume is False:
+                    db_email.process_status = "NOT_RESUME"
+                    db_email.error_message = "非简历邮件"
+                    session.commit()
+                    completed += 1
+                    continue
+                if not parsed_info or not analysis:
+                    raise ValueError("AI分析返回空结果")
+
+                if self.config.LOCAL_FIELD_EXTRACTION:
+                    parsed_info.update(extract_resume_fields(db_email.content_text))
+                save_screening_result(session, db_email, self.recruit_service, parsed_info, analysis, channel)
+                completed += 1
+            except Exception as e:
+                session.rollback()
+                db_email.process_status = "FAILED"
+                db_email.error_message = f"批量筛选失败: {str(e)[:500]}"
+                db_email.update_time = datetime.now()
+                session.commit()
+                failed += 1
+        logging.info(f"[BatchScreening] 批量任务回写完成: 成功 {completed} 封, 失败 {failed} 封")
+
+    # ---------- 运行 ----------
+
+    def run(self, session, poll_interval: int = 60, submit: bool = True):
+        """提交全部积压邮件并等待所有任务完成"""
+        if submit:
+            while self.submit_pending(session):
+                pass
+        while self.poll(session):
+            logging.info(f"[BatchScreening] {len(self.jobs)} 个任务处理中，{poll_interval}秒后再次查询")
+            time.sleep(poll_interval)
@@ -0,0 +1,350 @@
+# candidate_index.py
+"""
+候选人向量索引模块
+
+candidate_embeddings 表以JSON文本保存候选人的简历embedding，无法检索。本模块在进程内维护索引：
+1. 向量归一化后保存在可增长的 float32 矩阵中，内积即余弦相似度
+2. 条目数少于 CANDIDATE_INDEX_IVF_THRESHOLD 时精确检索（一次矩阵乘法）；超过后用 NumPy 训练
+   球面 k-means 聚类中心(IVF)，查询时只计算最近的 CANDIDATE_INDEX_NPROBE 个簇内的向量
+3. 保存候选人时写入 candidate_embeddings 并增量加入索引，新向量直接分配到最近的簇；
+   条目数比训练时翻倍后标记为待训练，由筛选主循环在两轮之间调用 train()，不阻塞写入和检索
+4. 索引快照保存在 CANDIDATE_INDEX_DIR，启动时加载快照并补齐表中更新的记录；也可以从表完整重建
+"""
+
+import os
+import json
+import shutil
+import logging
+import threading
+import numpy as np
+from db_manager import Candidate, CandidateEmbedding
+
+# 聚类训练的迭代次数和每个簇的采样数
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 64
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """球面 k-means：在采样上训练 nlist 个归一化的聚类中心"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLES_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # 空簇用随机样本重新初始化
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class CandidateIndex:
+    def __init__(self, config):
+        self.index_dir = config.CANDIDATE_INDEX_DIR
+        self.ivf_threshold = config.CANDIDATE_INDEX_IVF_THRESHOLD
+        self.nprobe = config.CANDIDATE_INDEX_NPROBE
+        self._lock = threading.RLock()
+        self._reset(dim=0)
+
+    def _reset(self, dim: int):
+        self.dim = dim
+        self.size = 0
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.rows = {}              # candidate_id -> 行号
+        self.centroids = None       # IVF 聚类中心
+        self.assign = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self.watermark = 0          # 已加入索引的 candidate_embeddings 最大ID
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def needs_training(self) -> bool:
+        """条目数达到阈值且比上次训练时翻倍"""
+        return self.size >= self.ivf_threshold and self.size >= 2 * max(self.trained_size, self.ivf_threshold // 2)
+
+    # ---------- 增量更新 ----------
+
+    def _grow(self, needed: int):
+        capacity = len(self.vectors)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, dtype, shape in (("vectors", np.float32, (capacity, self.dim)), ("ids", np.int64, (capacity,)),
+                                   ("alive", bool, (capacity,)), ("assign", np.int32, (capacity,))):
+            grown = np.zeros(shape, dtype=dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, candidate_id: int, vector, embedding_id: int = 0) -> bool:
+        """加入或替换一个候选人的向量，维度不一致时忽略并返回 False"""
+        vector = normalize(vector).ravel()
+        with self._lock:
+            if not self.dim:
+                self._reset(dim=vector.size)
+            self.watermark = max(self.watermark, embedding_id)
+            if vector.size != self.dim:
+                logging.warning(f"[CandidateIndex] 向量维度 {vector.size} 与索引维度 {self.dim} 不一致，已忽略")
+                return False
+            self.remove(candidate_id)
+            self._grow(self.size + 1)
+            row = self.size
+            self.vectors[row] = vector
+            self.ids[row] = candidate_id
+            self.alive[row] = True
+            if self.centroids is not None:
+                self.assign[row] = int(np.argmax(self.centroids @ vector))
+            self.rows[candidate_id] = row
+            self.size += 1
+            self.dirty = True
+            return True
+
+    def remove(self, candidate_id: int) -> bool:
+        with self._lock:
+            row = self.rows.pop(candidate_id, None)
+            if row is None:
+                return False
+            self.alive[row] = False
+            self.dirty = True
+            return True
+
+    def train(self):
+        """训练IVF聚类中心并重新分配所有向量，同时去掉已删除的行
+
+        k-means 在锁外对向量副本进行，期间的写入和检索照常使用旧的聚类中心
+        """
+        with self._lock:
+            self._compact()
+            if self.size < self.ivf_threshold:
+                self.centroids = None
+                self.trained_size = 0
+                return
+            nlist = int(np.clip(4 * np.sqrt(self.size), 16, 4096))
+            sample = self.vectors[:self.size].copy()
+        centroids = train_centroids(sample, nlist)
+        with self._lock:
+            # 训练期间可能有删除和新增，按当前的行重新分配
+            self._compact()
+            vectors = self.vectors[:self.size]
+            assign = np.empty(self.size, dtype=np.int32)
+            for start in range(0, self.size, 65536):
+                chunk = vectors[start:start + 65536]
+                assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+            self.assign[:self.size] = assign
+            self.centroids = centroids
+            self.trained_size = self.size
+            self.dirty = True
+            logging.info(f"[CandidateIndex] IVF训练完成: {self.size} 条, {nlist} 个簇")
+
+    def _compact(self):
+        live = np.flatnonzero(self.alive[:self.size])
+        if len(live) == self.size:
+            return
+        self.vectors[:len(live)] = self.vectors[live]
+        self.ids[:len(live)] = self.ids[live]
+        self.assign[:len(live)] = self.assign[live]
+        self.alive[:len(live)] = True
+        self.alive[len(live):self.size] = False
+        self.size = len(live)
+        self.rows = {int(cid): row for row, cid in enumerate(self.ids[:self.size])}
+
+    # ---------- 检索 ----------
+
+    def search(self, vector, k: int = 10, min_score: float = 0.0, exclude_ids=()):
+        """
+        检索最相似的候选人
+
+        Args:
+            vector: 查询向量
+            k: 返回数量
+            min_score: 最低余弦相似度
+            exclude_ids: 排除的候选人ID
+
+        Returns:
+            list: [(候选人ID, 相似度), ...]，按相似度降序
+        """
+        query = normalize(vector).ravel()
+        with self._lock:
+            if not self.size or query.size != self.dim:
+                return []
+            if self.centroids is not None:
+                nprobe = min(self.nprobe, len(self.centroids))
+                probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+                rows = np.flatnonzero(np.isin(self.assign[:self.size], probe) & self.alive[:self.size])
+                scores = self.vectors[rows] @ query
+            else:
+                rows = np.flatnonzero(self.alive[:self.size])
+                scores = (self.vectors[:self.size] @ query)[rows]
+            ids = self.ids[rows]
+
+        if exclude_ids:
+            keep = ~np.isin(ids, list(exclude_ids))
+            ids, scores = ids[keep], scores[keep]
+        keep = scores >= min_score
+        ids, scores = ids[keep], scores[keep]
+        if not len(ids):
+            return []
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def vector(self, candidate_id: int):
+        with self._lock:
+            row = self.rows.get(candidate_id)
+            return None if row is None else self.vectors[row].copy()
+
+    def find_similar(self, candidate_id: int, k: int = 10, min_score: float = 0.0):
+        """与指定候选人最相似的其他候选人，候选人不在索引中时返回空列表"""
+        vector = self.vector(candidate_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, min_score, exclude_ids=(candidate_id,))
+
+    # ---------- 数据库 ----------
+
+    def store(self, session, candidate_id: int, vector):
+        """保存候选人embedding到 candidate_embeddings 表并加入索引"""
+        row = CandidateEmbedding(candidate_id=candidate_id,
+                                 embedding=json.dumps([round(float(v), 6) for v in vector]))
+        session.add(row)
+        session.commit()
+        self.add(candidate_id, vector, row.id)
+
+    def sync(self, session, check_removed: bool = False, batch_size: int = 2000) -> int:
+        """
+        加入表中 watermark 之后的记录（其他进程写入的或快照之后新增的）
+
+        check_removed 为 True 时同时移除已删除候选人（重复简历被覆盖等）的向量
+
+        Returns:
+            int: 新加入的条数
+        """
+        added = 0
+        while True:
+            rows = session.query(CandidateEmbedding.id, CandidateEmbedding.candidate_id,
+                                 CandidateEmbedding.embedding).join(
+                Candidate, Candidate.id == CandidateEmbedding.candidate_id
+            ).filter(CandidateEmbedding.id > self.watermark).order_by(
+                CandidateEmbedding.id
+            ).limit(batch_size).all()
+            if not rows:
+                break
+            for embedding_id, candidate_id, embedding in rows:
+                try:
+                    added += self.add(candidate_id, json.loads(embedding), embedding_id)
+                except (TypeError, ValueError):
+                    self.watermark = max(self.watermark, embedding_id)
+        if added:
+            logging.info(f"[CandidateIndex] 从表中加入 {added} 条, 当前 {len(self)} 条")
+        if not check_removed:
+            return added
+
+        with self._lock:
+            known = list(self.rows)
+        for start in range(0, len(known), 5000):
+            chunk = known[start:start + 5000]
+            existing = {cid for (cid,) in session.query(Candidate.id).filter(Candidate.id.in_(chunk))}
+            for candidate_id in set(chunk) - existing:
+                self.remove(candidate_id)
+        return added
+
+    def rebuild(self, session) -> int:
+        """清空索引并从 candidate_embeddings 表完整重建"""
+        with self._lock:
+            self._reset(dim=0)
+        self.sync(session)
+        self.train()
+        self.save()
+        return len(self)
+
+    # ---------- 快照 ----------
+
+    def save(self):
+        """原子写入快照目录"""
+        with self._lock:
+            if not self.size:
+                return
+            self._compact()
+            tmp_dir = f"{self.index_dir}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            np.save(os.path.join(tmp_dir, "vectors.npy"), self.vectors[:self.size])
+            np.save(os.path.join(tmp_dir, "ids.npy"), self.ids[:self.size])
+            np.save(os.path.join(tmp_dir, "assign.npy"), self.assign[:self.size])
+            if self.centroids is not None:
+                np.save(os.path.join(tmp_dir, "centroids.npy"), self.centroids)
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "watermark": self.watermark, "trained_size": self.trained_size}, f)
+            old_dir = f"{self.index_dir}.old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(self.index_dir):
+                os.replace(self.index_dir, old_dir)
+            os.replace(tmp_dir, self.index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            self.dirty = False
+
+    def load(self) -> bool:
+        meta_file = os.path.join(self.index_dir, "meta.json")
+        if not os.path.exists(meta_file):
+            return False
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(os.path.join(self.index_dir, "vectors.npy"))
+            ids = np.load(os.path.join(self.index_dir, "ids.npy"))
+            assign = np.load(os.path.join(self.index_dir, "assign.npy"))
+            centroids_file = os.path.join(self.index_dir, "centroids.npy")
+            centroids = np.load(centroids_file) if os.path.exists(centroids_file) else None
+        except Exception as e:
+            logging.error(f"[CandidateIndex] 读取快照失败: {e}")
+            return False
+        with self._lock:
+            self._reset(dim=meta["dim"])
+            self._grow(len(ids))
+            self.size = len(ids)
+            self.vectors[:self.size] = vectors
+            self.ids[:self.size] = ids
+            self.assign[:self.size] = assign
+            self.alive[:self.size] = True
+            self.rows = {int(cid): row for row, cid in enumerate(ids)}
+            self.centroids = centroids
+            self.trained_size = meta.get("trained_size", 0)
+            self.watermark = meta["watermark"]
+        logging.info(f"[CandidateIndex] 加载快照: {self.size} 条")
+        return True
+
+    def load_or_rebuild(self, session) -> int:
+        """启动时调用：有快照时加载并补齐，否则从表重建"""
+        if self.load():
+            self.sync(session, check_removed=True)
+            if self.needs_training:
+                self.train()
+            return len(self)
+        return self.rebuild(session)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_candidate_index(config) -> CandidateIndex:
+    """进程内共享的候选人向量索引"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CandidateIndex(config)
+        return _index
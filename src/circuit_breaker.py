@@ -0,0 +1,148 @@
+# circuit_breaker.py
+"""
+LLM调用熔断模块
+
+接口故障时每个筛选线程都各自重试、退避，整轮筛选要等所有线程的重试结束。本模块在进程内共享：
+1. 熔断器：连续 CIRCUIT_FAILURE_THRESHOLD 次失败（超时、连接错误、5xx）后打开，CIRCUIT_OPEN_SECONDS 秒内
+   所有调用直接抛出 CircuitOpenError，筛选流程把邮件放回队列；到期后放行一个探测请求，成功则关闭，失败则继续熔断；
+   探测请求被取消时由调用方调用 abandon_probe 放行下一个探测，超过 2×AI_TIMEOUT 仍无结果的探测也视为已放弃
+2. 重试预算：最近 RETRY_BUDGET_WINDOW 秒内的重试次数不超过请求数的 RETRY_BUDGET_RATIO
+   （至少允许 RETRY_BUDGET_MIN_RETRIES 次），故障时不会因为各线程同时重试而放大请求量
+3. 服务端有响应（包括4xx和429）即视为服务可用，429由限流器统一退避，不计入失败
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝LLM调用"""
+
+
+class CircuitBreaker:
+    def __init__(self, config):
+        self.failure_threshold = config.CIRCUIT_FAILURE_THRESHOLD
+        self.open_seconds = config.CIRCUIT_OPEN_SECONDS
+        self.retry_ratio = config.RETRY_BUDGET_RATIO
+        self.retry_min = config.RETRY_BUDGET_MIN_RETRIES
+        self.window = config.RETRY_BUDGET_WINDOW
+        self._lock = threading.Lock()
+        self.state = "closed"       # closed/open/half_open
+        self.failures = 0           # 连续失败次数
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        # 探测请求（含对冲请求）的最长耗时，超过后允许新的探测
+        self.probe_timeout = config.AI_TIMEOUT * 2
+        self._requests = deque()
+        self._retries = deque()
+        self.opened = 0
+        self.rejected = 0
+        self.retries_denied = 0
+
+    # ---------- 调用前检查 ----------
+
+    def before_call(self) -> bool:
+        """
+        每次发送请求（含重试）前调用
+
+        Returns:
+            bool: 本次请求是否为半开状态下的探测请求；探测请求没有调用 record_success/record_failure
+                  就结束（如被取消）时，调用方需调用 abandon_probe
+
+        Raises:
+            CircuitOpenError: 熔断中，或半开状态下已有探测请求
+        """
+        with self._lock:
+            now = time.time()
+            if self.state == "open":
+                remaining = self.opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"LLM服务熔断中，{remaining:.0f}秒后恢复")
+                self.state = "half_open"
+                self._probing = False
+            probe = False
+            if self.state == "half_open":
+                if self._probing and now - self._probe_started < self.probe_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError("LLM服务熔断恢复中，等待探测请求结果")
+                self._probing = probe = True
+                self._probe_started = now
+            self._trim(now)
+            self._requests.append(now)
+            return probe
+
+    def abandon_probe(self):
+        """探测请求没有结果就结束，允许下一个请求作为探测"""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def allow_retry(self) -> bool:
+        """是否还有重试预算，允许时计入一次重试"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self._retries) >= max(self.retry_min, self.retry_ratio * len(self._requests)):
+                self.retries_denied += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def _trim(self, now: float):
+        for timestamps in (self._requests, self._retries):
+            while timestamps and timestamps[0] < now - self.window:
+                timestamps.popleft()
+
+    # ---------- 调用结果 ----------
+
+    def record_success(self):
+        """服务端有响应"""
+        with self._lock:
+            if self.state != "closed":
+                logging.info("[CircuitBreaker] LLM服务已恢复，关闭熔断")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """超时、连接错误或5xx"""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.time()
+                self.opened += 1
+                logging.warning(f"[CircuitBreaker] LLM调用连续失败 {self.failures} 次，"
+                                f"熔断 {self.open_seconds} 秒")
+
+    # ---------- 状态 ----------
+
+    def remaining_open_seconds(self) -> float:
+        """距离允许探测请求的秒数，未熔断时为0"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.opened_at + self.open_seconds - time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "opened": self.opened, "rejected": self.rejected,
+                    "retries_denied": self.retries_denied}
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker(config) -> CircuitBreaker:
+    """进程内共享的熔断器，所有筛选线程和异步客户端共用"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(config)
+        return _breaker
@@ -47,6 +47,10 @@ class Config:
         except Exception:
             self.RESUME_CHANNELS = {}
 
+        # 岗位表格及其编译结果，表格修改后自动重新编译
+        self.JOB_DESC_FILE = os.getenv("JOB_DESC_FILE", "config/job_desc.xlsx")
+        self.JOB_CATALOG_CACHE = os.getenv("JOB_CATALOG_CACHE", "data/job_catalog.json")
+
         # SMTP
         self.EMAIL_SENDER_SMTP = os.getenv("EMAIL_SENDER_SMTP")
         self.EMAIL_SENDER_PORT = int(os.getenv("EMAIL_SENDER_PORT", "587"))
@@ -55,10 +59,66 @@ class Config:
 
         # OpenAI
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+        self.OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
         self.MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4")
+        # LLM客户端: async(共享连接池的异步客户端)/sync(openai SDK同步调用)
+        self.LLM_CLIENT = os.getenv("LLM_CLIENT", "async").lower()
+        self.LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        # 结构化输出: json_schema/tools(函数调用)/json_object/none(只做容错解析)，服务端不支持时自动退回none
+        self.LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "json_schema").lower()
+        # 进程内共享的令牌桶限流，0表示不限制；配置文件路径后同一台机器上的多个进程共享额度
+        self.LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "0"))
+        self.LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0"))
+        self.LLM_RATE_LIMIT_FILE = os.getenv("LLM_RATE_LIMIT_FILE", "")
+        # 多个API key/接口地址（JSON列表），每个后端独立限流，请求发往负载最小的健康后端；为空时只用 OPENAI_API_KEY
+        # 例: [{"name":"key1","api_key":"sk-...","api_base":"https://api.openai.com/v1","rpm":500,"tpm":40000}]
+        try:
+            self.LLM_BACKENDS = json.loads(os.getenv("LLM_BACKENDS_JSON", "") or "[]")
+        except Exception:
+            self.LLM_BACKENDS = []
+        self.LLM_BACKEND_FAILURE_THRESHOLD = int(os.getenv("LLM_BACKEND_FAILURE_THRESHOLD", "3"))  # 后端连续失败该次数后暂停使用
+        self.LLM_BACKEND_COOLDOWN = float(os.getenv("LLM_BACKEND_COOLDOWN", "30"))  # 后端暂停使用的秒数
+        # LLM调用台账：每次调用的token、耗时、重试和错误写入 llm_call_log 表
+        self.LLM_LEDGER = os.getenv("LLM_LEDGER", "True").lower() == "true"
+        self.LLM_LEDGER_FLUSH_SIZE = int(os.getenv("LLM_LEDGER_FLUSH_SIZE", "50"))  # 累积条数达到该值时批量写入
+        self.LLM_LEDGER_FLUSH_SECONDS = float(os.getenv("LLM_LEDGER_FLUSH_SECONDS", "10"))
+        # 模型单价(每百万token的输入/输出价格)，用于统计成本，格式: 模型=输入/输出,...
+        self.LLM_PRICES = os.getenv("LLM_PRICES", "gpt-4=30/60,gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6,text-embedding-ada-002=0.1/0")
         self.AI_TIMEOUT = int(os.getenv("AI_TIMEOUT", "60"))  # Add default 60 seconds timeout
         self.AI_RETRY_TIMES = int(os.getenv("AI_RETRY_TIMES", "5"))
-        self.MAX_TOKEN = int(os.getenv("MAX_TOKEN", "10000"))
+        self.LLM_MAX_BACKOFF = float(os.getenv("LLM_MAX_BACKOFF", "10"))  # 重试退避的最长等待(秒)，服务端指定的等待时间除外
+        # 熔断与重试预算（进程内共享）
+        self.CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 连续失败次数达到该值时熔断
+        self.CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))  # 熔断持续时间，到期后放行一个探测请求
+        self.RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))  # 重试次数不超过请求数的比例
+        self.RETRY_BUDGET_MIN_RETRIES = int(os.getenv("RETRY_BUDGET_MIN_RETRIES", "10"))  # 请求量较少时至少允许的重试次数
+        # 请求对冲(异步客户端)：超过同类请求耗时分位数仍未返回时再发送一次，先返回的有效结果胜出
+        self.LLM_HEDGING = os.getenv("LLM_HEDGING", "False").lower() == "true"
+        self.LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))  # 触发对冲的耗时分位数
+        self.LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))  # 对冲请求数不超过请求总数的比例
+        self.LLM_HEDGE_WINDOW = float(os.getenv("LLM_HEDGE_WINDOW", "60"))  # 对冲预算的统计窗口(秒)
+        self.LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # 同类请求至少有该数量的耗时样本才对冲
+        self.LLM_HEDGE_SAMPLES = int(os.getenv("LLM_HEDGE_SAMPLES", "500"))  # 每类请求保留的耗时样本数
+        self.RETRY_BUDGET_WINDOW = float(os.getenv("RETRY_BUDGET_WINDOW", "10"))  # 重试预算的统计窗口(秒)
+        self.MAX_TOKEN = int(os.getenv("MAX_TOKEN", "10000"))  # 单个prompt的token上限
+        # 固定部分之外，岗位描述最多占用的预算比例，其余留给简历
+        self.PROMPT_JOB_TOKEN_SHARE = float(os.getenv("PROMPT_JOB_TOKEN_SHARE", "0.25"))
+        self.PROMPT_MIN_RESUME_TOKENS = int(os.getenv("PROMPT_MIN_RESUME_TOKENS", "1000"))  # 简历至少保留的token数
+        # 简历结构化压缩：本地切分区块并去除渠道模板文字后再发送给LLM
+        self.RESUME_SECTIONIZER = os.getenv("RESUME_SECTIONIZER", "True").lower() == "true"
+        # 联系方式、年龄、性别、院校等字段由本地规则提取，LLM只输出评估相关字段
+        self.LOCAL_FIELD_EXTRACTION = os.getenv("LOCAL_FIELD_EXTRACTION", "True").lower() == "true"
+        # 评价详情生成方式：inline 评估时一并输出；deferred 评估只输出评分，合格或重点关注的候选人在空闲时补充详情
+        # 推测评估（两步流程）：很可能是简历的邮件在识别类型的同时按本地猜测的岗位开始评估
+        self.SPECULATIVE_SCREENING = os.getenv("SPECULATIVE_SCREENING", "False").lower() == "true"
+        self.SCREENING_DETAIL_MODE = os.getenv("SCREENING_DETAIL_MODE", "inline").lower()
+        self.DETAIL_JOBS_PER_CYCLE = int(os.getenv("DETAIL_JOBS_PER_CYCLE", "20"))  # 每轮最多补充详情的候选人数
+        self.DETAIL_JOB_MAX_ATTEMPTS = int(os.getenv("DETAIL_JOB_MAX_ATTEMPTS", "3"))  # 补充详情的最多尝试次数
+        # 各渠道额外的模板文字正则（JSON格式，渠道名->正则列表）
+        try:
+            self.RESUME_BOILERPLATE = json.loads(os.getenv("RESUME_BOILERPLATE_JSON", "{}"))
+        except Exception:
+            self.RESUME_BOILERPLATE = {}
 
         # Twilio短信(可选)
         self.TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
@@ -78,6 +138,8 @@ class Config:
         self.OSS_CUSTOM_DOMAIN = os.getenv("OSS_CUSTOM_DOMAIN", "")
 
         self.MAX_ATTACHMENT_SIZE_MB = float(os.getenv("MAX_ATTACHMENT_SIZE_MB", "5"))
+        # HTML正文提取引擎: lxml(流式解析，大HTML更快，出错时自动回退bs4)/bs4
+        self.HTML_TEXT_EXTRACTOR = os.getenv("HTML_TEXT_EXTRACTOR", "lxml").lower()
         # 并发配置
         self.PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "4"))
         self.FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", "100"))
@@ -86,6 +148,19 @@ class Config:
         # Embedding & Celery
         self.USE_EMBEDDING = os.getenv("USE_EMBEDDING", "False").lower() == "true"
         self.CACHE_EMBEDDINGS = os.getenv("CACHE_EMBEDDINGS", "False").lower() == "true"
+        self.EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        self.EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "data/embeddings")  # CACHE_EMBEDDINGS的存储目录
+        self.EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", "data/embedding_cache.json")  # 原JSON缓存，存储为空时自动导入
+        self.EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "8000"))  # 简历embedding的截断长度
+        # 岗位向量匹配(USE_EMBEDDING)：第一名相似度不低于MIN_SCORE且领先第二名MARGIN以上时不再调用LLM
+        self.POSITION_MATCH_TOP_K = int(os.getenv("POSITION_MATCH_TOP_K", "3"))
+        self.POSITION_MATCH_MIN_SCORE = float(os.getenv("POSITION_MATCH_MIN_SCORE", "0.80"))
+        self.POSITION_MATCH_MARGIN = float(os.getenv("POSITION_MATCH_MARGIN", "0.03"))
+        # 候选人向量索引：保存候选人时写入 candidate_embeddings 并加入索引，用于查找相似候选人
+        self.CANDIDATE_INDEX = os.getenv("CANDIDATE_INDEX", "False").lower() == "true"
+        self.CANDIDATE_INDEX_DIR = os.getenv("CANDIDATE_INDEX_DIR", "data/candidate_index")  # 索引快照目录
+        self.CANDIDATE_INDEX_IVF_THRESHOLD = int(os.getenv("CANDIDATE_INDEX_IVF_THRESHOLD", "20000"))  # 超过该条数改用IVF近似检索
+        self.CANDIDATE_INDEX_NPROBE = int(os.getenv("CANDIDATE_INDEX_NPROBE", "8"))  # IVF检索的簇数
         self.USE_CELERY = os.getenv("USE_CELERY", "False").lower() == "true"
         self.CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
         self.CELERY_BACKEND_URL = os.getenv("CELERY_BACKEND_URL", "redis://127.0.0.1:6379/0")
@@ -140,6 +215,31 @@ class Config:
         self.SCREENING_INTERVAL = int(os.getenv("SCREENING_INTERVAL", "30"))  # 批次间隔时间(秒)
         self.SCREENING_CHECK_INTERVAL = int(os.getenv('SCREENING_CHECK_INTERVAL', '60'))  # 检查间隔1分钟
         self.SCREENING_STALL_TIMEOUT = int(os.getenv('SCREENING_STALL_TIMEOUT', '30'))  # 停滞超时(分钟)
+        # 筛选模式: two_step(先识别邮件类型再评估，两次调用)/single_call(一次调用同时识别和评估)
+        self.SCREENING_MODE = os.getenv("SCREENING_MODE", "two_step").lower()
+        self.MAIL_PRECHECK = os.getenv("MAIL_PRECHECK", "True").lower() == "true"  # 本地预检排除明显的非简历邮件
+        # 本地非简历邮件分类器（基于emails表历史结果训练）
+        self.MAIL_CLASSIFIER_ENABLED = os.getenv("MAIL_CLASSIFIER_ENABLED", "True").lower() == "true"
+        self.MAIL_CLASSIFIER_THRESHOLD = float(os.getenv("MAIL_CLASSIFIER_THRESHOLD", "0.95"))  # 非简历概率达到该值才跳过LLM
+        self.MAIL_CLASSIFIER_RETRAIN_HOURS = float(os.getenv("MAIL_CLASSIFIER_RETRAIN_HOURS", "24"))
+        self.MAIL_CLASSIFIER_MAX_SAMPLES = int(os.getenv("MAIL_CLASSIFIER_MAX_SAMPLES", "20000"))
+        self.MAIL_CLASSIFIER_MODEL_PATH = os.getenv("MAIL_CLASSIFIER_MODEL_PATH", "data/mail_classifier.npz")
+        self.LLM_RESULT_CACHE = os.getenv("LLM_RESULT_CACHE", "True").lower() == "true"  # 复用相同简历/岗位/模型/prompt版本的评估结果
+        # 近似重复简历：同一岗位下MinHash估计的相似度达到阈值时关联到已有候选人，不再调用LLM评估
+        self.NEAR_DUP_DETECTION = os.getenv("NEAR_DUP_DETECTION", "False").lower() == "true"
+        self.NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))  # 字符5-gram的Jaccard相似度
+        self.NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))  # MinHash签名维数
+        # 分级评估：先用 CASCADE_MODEL 评估，总分在合格线±CASCADE_ESCALATION_BAND内或结果无效时再用 MODEL_NAME
+        self.SCREENING_CASCADE = os.getenv("SCREENING_CASCADE", "False").lower() == "true"
+        self.CASCADE_MODEL = os.getenv("CASCADE_MODEL", "gpt-4o-mini")
+        self.CASCADE_ESCALATION_BAND = int(os.getenv("CASCADE_ESCALATION_BAND", "10"))
+        self.CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.02"))  # 区间外抽查升级的比例，用于统计一致率
+        self.CASCADE_STATS_FILE = os.getenv("CASCADE_STATS_FILE", "data/cascade_stats.json")  # 按岗位的升级率/一致率统计
+        # 批量接口(Batch API)处理积压邮件：NEW 邮件数达到阈值时打包提交，0表示不启用
+        self.BATCH_API_BACKLOG_THRESHOLD = int(os.getenv("BATCH_API_BACKLOG_THRESHOLD", "0"))
+        self.BATCH_API_MAX_REQUESTS = int(os.getenv("BATCH_API_MAX_REQUESTS", "1000"))  # 每个批量任务的请求数
+        self.BATCH_API_BASE = os.getenv("BATCH_API_BASE", "")  # 为空时使用 OPENAI_API_BASE
+        self.BATCH_API_STATE_FILE = os.getenv("BATCH_API_STATE_FILE", "data/batch_jobs.json")  # 已提交任务的检查点
 
         # 性能优化配置
         self.MAX_CONCURRENT_PROCESSES = int(os.getenv("MAX_CONCURRENT_PROCESSES", str(min(32, multiprocessing.cpu_count()))))
@@ -2,7 +2,7 @@
 import time
 import logging
 import pymysql
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Text, Boolean, DateTime
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.dialects.mysql import LONGTEXT
 from datetime import datetime
@@ -82,6 +82,56 @@ class CandidateEmbedding(Base):
     embedding    = Column(Text)
     create_time  = Column(DateTime, default=beijing_now)
 
+# ResumeSignature: 候选人简历的MinHash签名，用于识别近似重复简历
+class ResumeSignature(Base):
+    __tablename__ = "resume_signatures"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    candidate_id = Column(Integer, index=True)
+    position = Column(String(100))
+    signature = Column(Text, comment="base64编码的uint32 MinHash签名")
+    create_time = Column(DateTime, default=beijing_now)
+
+# LLMResultCache: 持久化的LLM结果缓存，键由简历哈希、岗位、模型和prompt版本组成
+class LLMResultCache(Base):
+    __tablename__ = "llm_result_cache"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), unique=True, index=True, comment="键字段的MD5")
+    resume_hash = Column(String(64), index=True)
+    position = Column(String(100))
+    model = Column(String(100))
+    prompt_version = Column(String(64))
+    result = Column(LONGTEXT, comment="JSON格式的模型结果")
+    hit_count = Column(Integer, default=0)
+    create_time = Column(DateTime, default=beijing_now)
+    update_time = Column(DateTime, default=beijing_now, onupdate=beijing_now)
+
+# LLMCallLog: 每次LLM调用的用量、耗时和重试记录，用于成本和容量统计
+class LLMCallLog(Base):
+    __tablename__ = "llm_call_log"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    email_id = Column(Integer, index=True, nullable=True)
+    prompt_type = Column(String(50), comment="identify_mail_type/screen_resume/identify_and_screen/embedding")
+    model = Column(String(100))
+    position = Column(String(100))
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    latency_ms = Column(Integer, default=0, comment="含重试等待的总耗时")
+    retries = Column(Integer, default=0)
+    error = Column(String(100), default="", comment="失败时的异常类型")
+    create_time = Column(DateTime, default=beijing_now, index=True)
+
+# CandidateDetailJob: 两阶段评估中待补充评价详情的候选人
+class CandidateDetailJob(Base):
+    __tablename__ = "candidate_detail_jobs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    candidate_id = Column(Integer, index=True)
+    position = Column(String(100))
+    status = Column(String(20), default="PENDING", index=True, comment="PENDING/DONE/FAILED")
+    attempts = Column(Integer, default=0)
+    error_message = Column(Text)
+    create_time = Column(DateTime, default=beijing_now)
+    update_time = Column(DateTime, default=beijing_now, onupdate=beijing_now)
+
 # Email: 存储邮件数据
 class Email(Base):
     __tablename__ = "emails"
@@ -97,6 +147,7 @@ class Email(Base):
     error_message = Column(Text)
     candidate_id = Column(Integer, nullable=True)
     resume_hash = Column(String(64), comment="简历内容哈希值，基于最终提取的文本内容计算")
+    token_count = Column(Integer, nullable=True, comment="简历文本token数，用于调度")
     attachment_url = Column(Text, comment="OSS附件URL，邮件处理时上传生成")
     inbox_account = Column(String(200), comment="收件邮箱账号")
     create_time = Column(DateTime, default=beijing_now)
@@ -166,6 +217,7 @@ class DBManager:
             
             # Create all tables
             Base.metadata.create_all(bind=engine)
+            add_missing_columns(engine)
             logging.info("数据库表结构已同步")
             
         except Exception as e:
@@ -175,6 +227,22 @@ class DBManager:
         cost = time.time() - start_t
         logging.info(f"[DBManager] init_engine_and_session 耗时={cost:.2f}s")
 
+# 已有表新增的列，create_all 不会修改已存在的表，需要单独补齐
+ADDED_COLUMNS = {
+    "emails": [("token_count", "INT NULL COMMENT '简历文本token数，用于调度'")],
+}
+
+def add_missing_columns(engine):
+    """为已存在的表补齐新增列"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE `{table}` ADD COLUMN `{name}` {ddl}"))
+                    logging.info(f"已为表 {table} 添加列 {name}")
+
 def get_db():
     """获取数据库会话"""
     if not SessionLocal:
@@ -0,0 +1,129 @@
+# deferred_details.py
+"""
+两阶段评估的评价详情补充模块
+
+SCREENING_DETAIL_MODE=deferred 时简历评估只输出 parsed_info 和各维度评分，输出token约为完整评估的三分之一；
+各维度评价详情、风险提示和面试问题只有HR会查看的候选人才需要：
+1. 评分合格（总分不低于 QUALIFIED_SCORE）或重点关注的候选人保存后写入 candidate_detail_jobs 表
+2. 邮件队列处理完、LLM服务未熔断时，每轮最多处理 DETAIL_JOBS_PER_CYCLE 个任务，
+   把已有评分随简历一起提供给模型生成详情，写回 candidates 表
+3. 失败的任务保留为 PENDING，下一轮重试，超过 DETAIL_JOB_MAX_ATTEMPTS 次后标记为 FAILED
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
+from circuit_breaker import CircuitOpenError
+from db_manager import Candidate, CandidateDetailJob, beijing_now
+from llm_ledger import get_llm_ledger
+from recruit_service import QUALIFIED_SCORE, compute_total_score
+from structured_output import DETAIL_FIELDS
+
+_table_ready = set()
+
+
+def ensure_table(session):
+    """首次使用时创建 candidate_detail_jobs 表"""
+    bind = session.get_bind()
+    if id(bind) not in _table_ready:
+        CandidateDetailJob.__table__.create(bind=bind, checkfirst=True)
+        _table_ready.add(id(bind))
+
+
+def needs_details(analysis: dict) -> bool:
+    """评估结果缺少评价详情，且候选人合格或被标记为重点关注"""
+    if all(analysis.get(field) for field in DETAIL_FIELDS):
+        return False
+    return compute_total_score(analysis) >= QUALIFIED_SCORE or bool(analysis.get("focus_flag"))
+
+
+def enqueue_detail_job(session, candidate_id: int, position: str):
+    """为候选人创建补充评价详情的任务"""
+    ensure_table(session)
+    session.add(CandidateDetailJob(candidate_id=candidate_id, position=position or "", status="PENDING"))
+    session.commit()
+
+
+def run_detail_jobs(config, ai_screener, session, limit: int = None) -> dict:
+    """
+    处理待补充评价详情的任务
+
+    Args:
+        config: 配置
+        ai_screener: AIScreener实例
+        session: 数据库会话，用于查询任务
+        limit: 最多处理的任务数，默认为 DETAIL_JOBS_PER_CYCLE
+
+    Returns:
+        dict: {"done": 完成数, "failed": 失败数, "deferred": 熔断放回数, "skipped": 已被其他进程处理数}
+    """
+    ensure_table(session)
+    limit = limit or config.DETAIL_JOBS_PER_CYCLE
+    job_ids = [row[0] for row in session.query(CandidateDetailJob.id).filter(
+        CandidateDetailJob.status == "PENDING"
+    ).order_by(CandidateDetailJob.id).limit(limit).all()]
+    counts = {"done": 0, "failed": 0, "deferred": 0, "skipped": 0}
+    if not job_ids:
+        return counts
+
+    # 每个线程使用独立会话
+    session_factory = sessionmaker(bind=session.get_bind())
+    with ThreadPoolExecutor(max_workers=config.SCREENING_WORKERS) as executor:
+        for result in executor.map(lambda job_id: _run_job(config, ai_screener, session_factory, job_id), job_ids):
+            counts[result] += 1
+    logging.info(f"[DeferredDetails] 补充评价详情: 完成 {counts['done']}个, 失败 {counts['failed']}个, "
+                 f"熔断放回 {counts['deferred']}个")
+    return counts
+
+
+def _run_job(config, ai_screener, session_factory, job_id: int) -> str:
+    session = session_factory()
+    ledger = get_llm_ledger(config)
+    try:
+        job = session.query(CandidateDetailJob).filter(CandidateDetailJob.id == job_id).first()
+        if not job or job.status != "PENDING":
+            return "skipped"
+        candidate = session.query(Candidate).filter(Candidate.id == job.candidate_id).first()
+        if not candidate:
+            # 候选人已被删除（重复简历覆盖等）
+            _finish(session, job, "FAILED", "候选人不存在")
+            return "failed"
+
+        analysis = {column: getattr(candidate, column) or 0
+                    for column in ("education_score", "technical_score", "innovation_score",
+                                   "growth_score", "startup_score", "teamwork_score")}
+        ledger.set_position(job.position)
+        try:
+            details = ai_screener.screen_details(candidate.resume_text or "",
+                                                 job.position or candidate.apply_position,
+                                                 analysis, candidate.resume_source or "")
+        except CircuitOpenError:
+            return "deferred"
+
+        job.attempts = (job.attempts or 0) + 1
+        if not details:
+            if job.attempts >= config.DETAIL_JOB_MAX_ATTEMPTS:
+                _finish(session, job, "FAILED", "模型未返回有效的评价详情")
+                return "failed"
+            job.error_message = "模型未返回有效的评价详情"
+            session.commit()
+            return "failed"
+
+        for field in DETAIL_FIELDS:
+            setattr(candidate, field, details.get(field, ""))
+        _finish(session, job, "DONE", "")
+        return "done"
+    except Exception as e:
+        session.rollback()
+        logging.error(f"[DeferredDetails] 任务 {job_id} 处理失败: {e}")
+        return "failed"
+    finally:
+        ledger.set_position("")
+        session.close()
+
+
+def _finish(session, job, status: str, error: str):
+    job.status = status
+    job.error_message = error
+    job.update_time = beijing_now()
+    session.commit()
@@ -32,6 +32,7 @@ from utils.text_utils import extract_text_from_html  # 添加此行
 from nowcoder.resume_fetcher import fetch_resume_from_link
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from utils.log_utils import setup_logger
+from token_budget import count_tokens
 
 CHINA_TZ = pytz.timezone("Asia/Shanghai")
 
@@ -423,6 +424,7 @@ class MailFetcher:
                     ])
                     email.received_date = mail.get("mail_date")
                     email.resume_hash = mail.get("resume_hash", "")
+                    email.token_count = count_tokens(email.content_text, self.config.MODEL_NAME)
                     email.attachment_url = mail.get("attachment_url", "")
                     email.inbox_account = mail.get("inbox_account", "")
                     email.process_status = "NEW"
@@ -541,7 +543,7 @@ class MailFetcher:
 
                     if not resume_text or not resume_text.strip():
                         logger.debug("链接简历获取失败，尝试从HTML内容提取...")
-                        resume_text = html_to_text(html_content)
+                        resume_text = html_to_text(html_content, self.config.HTML_TEXT_EXTRACTOR)
 
                     if not resume_text or not resume_text.strip():
                         logger.debug("尝试从预览窗格中提取图片...")
@@ -571,7 +573,7 @@ class MailFetcher:
                     logger.debug(f"[Step 3] 正文型简历处理开始 - 邮件ID: {mid}")
                     
                     # 先尝试从HTML提取文本，如果失败则使用原始body
-                    resume_text = extract_text_from_html(html_content)
+                    resume_text = extract_text_from_html(html_content, self.config.HTML_TEXT_EXTRACTOR)
                     logger.debug(f"从HTML提取文本长度: {len(resume_text)}")
                     
                     if not resume_text.strip():
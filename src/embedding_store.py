@@ -0,0 +1,394 @@
+# embedding_store.py
+"""
+Embedding二进制存储模块
+
+替代原先把所有向量以JSON列表写在一个文件里、每新增一条就整体重写的 EmbeddingCache：
+1. vectors.f32 为只追加的 float32 矩阵文件，每行一个向量，读取时内存映射(mmap)，不需要整体加载
+2. index.bin 为按内容哈希(MD5)开放寻址的哈希表，同样内存映射，打开和查询的耗时与条目数无关
+3. 写入时持有文件锁：先追加向量，再写入索引槽位（最后写入哈希），读者不加锁也只会读到完整的记录
+4. 哈希表装载率过高时重建新表后原子替换；compact() 去掉已删除的向量后原子替换两个文件，
+   其他进程通过文件 inode 变化发现替换并重新映射
+5. 存储为空且原 EmbeddingCache 的JSON文件(EMBEDDING_CACHE_FILE)存在时，首次打开自动导入
+"""
+
+import os
+import json
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows下不支持跨进程共享
+    fcntl = None
+
+INDEX_MAGIC = b"EMBIDX01"
+# 索引文件头: magic(8) + 容量(uint32) + 已用槽位数(uint32)
+INDEX_HEADER = struct.Struct("<8sII")
+# 槽位: 哈希(16字节) + 行号(int64)，行号为 -1 表示已删除
+SLOT = struct.Struct("<16sq")
+EMPTY_DIGEST = b"\x00" * 16
+DELETED_ROW = -1
+INITIAL_CAPACITY = 1024
+MAX_LOAD_FACTOR = 0.6
+
+
+def key_digest(key: str) -> bytes:
+    """键转为16字节哈希：32位十六进制字符串（md5_hash 的结果）直接解码，其他字符串取MD5"""
+    if len(key) == 32:
+        try:
+            digest = bytes.fromhex(key)
+            if digest != EMPTY_DIGEST:
+                return digest
+        except ValueError:
+            pass
+    return hashlib.md5(key.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 存储目录，向量维度在首次写入时确定
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta_file = os.path.join(path, "meta.json")
+        self.vectors_file = os.path.join(path, "vectors.f32")
+        self.index_file = os.path.join(path, "index.bin")
+        self.lock_file = os.path.join(path, "lock")
+        self._lock = threading.RLock()
+        self.dim = self._load_dim()
+        self._vectors = None  # (inode, 行数, mmap)
+        self._index = None    # (inode, 容量, mmap)
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 文件锁与映射 ----------
+
+    @contextmanager
+    def _write_lock(self):
+        """进程内线程锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_file, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_dim(self):
+        if not os.path.exists(self.meta_file):
+            return None
+        with open(self.meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)["dim"]
+
+    @staticmethod
+    def _map(path: str, writable: bool = False):
+        """映射整个文件，返回 (inode, 文件大小, mmap)，文件不存在或为空时返回 None"""
+        try:
+            fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            st = os.fstat(fd)
+            if st.st_size == 0:
+                return None
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            return st.st_ino, st.st_size, mmap.mmap(fd, st.st_size, access=access)
+        finally:
+            os.close(fd)
+
+    def _stale(self, mapped, path: str, min_size: int = 0) -> bool:
+        """映射已失效（文件被替换或长度不够）"""
+        if mapped is None:
+            return True
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return True
+        return st.st_ino != mapped[0] or (min_size and mapped[1] < min_size)
+
+    def _index_map(self, refresh: bool = False):
+        with self._lock:
+            if refresh or self._stale(self._index, self.index_file):
+                mapped = self._map(self.index_file)
+                self._index = None
+                if mapped:
+                    magic, capacity, _ = INDEX_HEADER.unpack_from(mapped[2], 0)
+                    if magic != INDEX_MAGIC:
+                        raise ValueError(f"索引文件格式错误: {self.index_file}")
+                    self._index = (mapped[0], capacity, mapped[2])
+            return self._index
+
+    def _vector_map(self, row: int):
+        """返回包含第 row 行的向量映射"""
+        with self._lock:
+            row_bytes = self.dim * 4
+            if self._stale(self._vectors, self.vectors_file, (row + 1) * row_bytes):
+                self._vectors = self._map(self.vectors_file)
+            return self._vectors
+
+    # ---------- 哈希表 ----------
+
+    @staticmethod
+    def _probe(buf, capacity: int, digest: bytes):
+        """
+        线性探测查找
+
+        Returns:
+            tuple: (槽位号, 行号)，未找到时行号为 None、槽位号为第一个空槽位
+        """
+        slot = int.from_bytes(digest[:8], "little") & (capacity - 1)
+        for _ in range(capacity):
+            offset = INDEX_HEADER.size + slot * SLOT.size
+            found, row = SLOT.unpack_from(buf, offset)
+            if found == EMPTY_DIGEST:
+                return slot, None
+            if found == digest:
+                return slot, row
+            slot = (slot + 1) & (capacity - 1)
+        return None, None
+
+    def _lookup(self, digest: bytes):
+        index = self._index_map()
+        if index is None:
+            return None
+        _, row = self._probe(index[2], index[1], digest)
+        if row is None:
+            # 其他进程可能刚扩容替换了索引
+            if self._stale(index, self.index_file):
+                index = self._index_map(refresh=True)
+                _, row = self._probe(index[2], index[1], digest) if index else (None, None)
+        return row
+
+    @staticmethod
+    def _create_index(path: str, capacity: int, entries):
+        """写入新的哈希表文件（先写临时文件再原子替换）"""
+        buf = bytearray(INDEX_HEADER.size + capacity * SLOT.size)
+        count = 0
+        for digest, row in entries:
+            slot = int.from_bytes(digest[:8], "little") & (capacity - 1)
+            while buf[INDEX_HEADER.size + slot * SLOT.size:INDEX_HEADER.size + slot * SLOT.size + 16] != EMPTY_DIGEST:
+                slot = (slot + 1) & (capacity - 1)
+            SLOT.pack_into(buf, INDEX_HEADER.size + slot * SLOT.size, digest, row)
+            count += 1
+        INDEX_HEADER.pack_into(buf, 0, INDEX_MAGIC, capacity, count)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _entries(self, index):
+        """遍历哈希表中的 (哈希, 行号)，包括已删除的条目"""
+        if index is None:
+            return
+        buf, capacity = index[2], index[1]
+        for slot in range(capacity):
+            digest, row = SLOT.unpack_from(buf, INDEX_HEADER.size + slot * SLOT.size)
+            if digest != EMPTY_DIGEST:
+                yield digest, row
+
+    # ---------- 读写 ----------
+
+    def get_vector(self, key: str):
+        """
+        Returns:
+            np.ndarray: float32向量（副本），不存在时返回 None
+        """
+        if self.dim is None:
+            self.dim = self._load_dim()
+            if self.dim is None:
+                self.misses += 1
+                return None
+        digest = key_digest(key)
+        for _ in range(3):
+            row = self._lookup(digest)
+            if row is None or row == DELETED_ROW:
+                break
+            index = self._index
+            vectors = self._vector_map(row)
+            if vectors is None:
+                break
+            vector = np.frombuffer(vectors[2], dtype=np.float32, count=self.dim, offset=row * self.dim * 4).copy()
+            # 读取期间其他进程完成了压缩（行号已变化）时重新查找
+            if not self._stale(index, self.index_file):
+                self.hits += 1
+                return vector
+        self.misses += 1
+        return None
+
+    def get(self, key: str):
+        """与原 EmbeddingCache.get 兼容，返回列表"""
+        vector = self.get_vector(key)
+        return vector.tolist() if vector is not None else None
+
+    def set(self, key: str, vector):
+        """追加一条向量，键已存在时不重复写入"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        digest = key_digest(key)
+        with self._write_lock():
+            if self.dim is None:
+                self.dim = self._load_dim()
+            if self.dim is None:
+                self.dim = int(vector.size)
+                with open(self.meta_file + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+                os.replace(self.meta_file + ".tmp", self.meta_file)
+            if vector.size != self.dim:
+                raise ValueError(f"向量维度 {vector.size} 与存储维度 {self.dim} 不一致")
+
+            index = self._writable_index()
+            slot, row = self._probe(index[2], index[1], digest)
+            if row is not None and row != DELETED_ROW:
+                index[2].close()
+                return
+
+            # 先追加向量，再写槽位；哈希最后写入，读者看到哈希时向量一定已写完
+            with open(self.vectors_file, "ab") as f:
+                new_row = f.tell() // (self.dim * 4)
+                f.write(vector.tobytes())
+                f.flush()
+            buf = index[2]
+            offset = INDEX_HEADER.size + slot * SLOT.size
+            if row is None:
+                struct.pack_into("<q", buf, offset + 16, new_row)
+                buf[offset:offset + 16] = digest
+                _, capacity, count = INDEX_HEADER.unpack_from(buf, 0)
+                INDEX_HEADER.pack_into(buf, 0, INDEX_MAGIC, capacity, count + 1)
+            else:
+                # 复用已删除键的槽位
+                struct.pack_into("<q", buf, offset + 16, new_row)
+            buf.flush()
+            buf.close()
+
+    def delete(self, key: str) -> bool:
+        """标记删除，向量空间在 compact() 时回收"""
+        digest = key_digest(key)
+        with self._write_lock():
+            if not os.path.exists(self.index_file):
+                return False
+            index = self._writable_index()
+            slot, row = self._probe(index[2], index[1], digest)
+            deleted = row is not None and row != DELETED_ROW
+            if deleted:
+                struct.pack_into("<q", index[2], INDEX_HEADER.size + slot * SLOT.size + 16, DELETED_ROW)
+                index[2].flush()
+            index[2].close()
+            return deleted
+
+    def _writable_index(self):
+        """持有写锁时调用：返回可写的索引映射，装载率过高时先扩容"""
+        mapped = self._map(self.index_file, writable=True)
+        if mapped is None:
+            self._create_index(self.index_file, INITIAL_CAPACITY, [])
+            mapped = self._map(self.index_file, writable=True)
+        _, capacity, count = INDEX_HEADER.unpack_from(mapped[2], 0)
+        if count + 1 > capacity * MAX_LOAD_FACTOR:
+            entries = list(self._entries((mapped[0], capacity, mapped[2])))
+            mapped[2].close()
+            self._create_index(self.index_file, capacity * 2, entries)
+            logging.info(f"[EmbeddingStore] 索引扩容: {capacity} -> {capacity * 2}")
+            mapped = self._map(self.index_file, writable=True)
+            capacity *= 2
+        return mapped[0], capacity, mapped[2]
+
+    # ---------- 维护 ----------
+
+    def compact(self) -> int:
+        """
+        去掉已删除的向量并重建索引
+
+        Returns:
+            int: 回收的行数
+        """
+        with self._write_lock():
+            index = self._map(self.index_file)
+            if index is None or self.dim is None:
+                return 0
+            _, capacity, _ = INDEX_HEADER.unpack_from(index[2], 0)
+            entries = list(self._entries((index[0], capacity, index[2])))
+            index[2].close()
+            live = sorted((row, digest) for digest, row in entries if row != DELETED_ROW)
+            total_rows = os.path.getsize(self.vectors_file) // (self.dim * 4)
+            if len(live) == total_rows:
+                return 0
+
+            row_bytes = self.dim * 4
+            tmp_path = f"{self.vectors_file}.{os.getpid()}.tmp"
+            with open(self.vectors_file, "rb") as src, open(tmp_path, "wb") as dst:
+                for row, _ in live:
+                    src.seek(row * row_bytes)
+                    dst.write(src.read(row_bytes))
+                dst.flush()
+                os.fsync(dst.fileno())
+            new_capacity = INITIAL_CAPACITY
+            while len(live) + 1 > new_capacity * MAX_LOAD_FACTOR:
+                new_capacity *= 2
+            # 先替换向量文件再替换索引：两次替换之间读者可能短暂查不到，但不会读到错误的向量
+            index_tmp = f"{self.index_file}.compact"
+            self._create_index(index_tmp, new_capacity, [(digest, i) for i, (_, digest) in enumerate(live)])
+            os.replace(self.index_file, self.index_file + ".old")
+            os.replace(tmp_path, self.vectors_file)
+            os.replace(index_tmp, self.index_file)
+            os.remove(self.index_file + ".old")
+            with self._lock:
+                self._vectors = self._index = None
+            logging.info(f"[EmbeddingStore] 压缩完成: {total_rows} -> {len(live)} 行")
+            return total_rows - len(live)
+
+    def import_json(self, json_file: str) -> int:
+        """导入原 EmbeddingCache 的JSON文件，返回导入条数"""
+        with open(json_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        imported = 0
+        for key, vector in cache.items():
+            if vector:
+                self.set(key, vector)
+                imported += 1
+        return imported
+
+    def __len__(self):
+        index = self._map(self.index_file)
+        if index is None:
+            return 0
+        _, capacity, _ = INDEX_HEADER.unpack_from(index[2], 0)
+        count = sum(1 for _, row in self._entries((index[0], capacity, index[2])) if row != DELETED_ROW)
+        index[2].close()
+        return count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(config, model: str = None) -> EmbeddingStore:
+    """进程内共享的embedding存储，不同模型的向量维度不同，各用一个子目录"""
+    model = model or config.EMBEDDING_MODEL
+    path = os.path.join(config.EMBEDDING_STORE_DIR, "".join(c if c.isalnum() or c in "-_." else "_" for c in model))
+    with _stores_lock:
+        if path not in _stores:
+            store = EmbeddingStore(path)
+            # 首次启用时迁移原 EmbeddingCache 的JSON文件（其中是默认模型的向量）
+            legacy_file = config.EMBEDDING_CACHE_FILE
+            if model == config.EMBEDDING_MODEL and legacy_file and os.path.exists(legacy_file) and not len(store):
+                try:
+                    count = store.import_json(legacy_file)
+                    logging.info(f"[EmbeddingStore] 已从 {legacy_file} 导入 {count} 条向量")
+                except (OSError, ValueError) as e:
+                    logging.warning(f"[EmbeddingStore] 导入 {legacy_file} 失败: {e}")
+            _stores[path] = store
+        return _stores[path]
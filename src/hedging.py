@@ -0,0 +1,106 @@
+# hedging.py
+"""
+LLM请求对冲模块
+
+少数 chat/completions 请求的耗时远高于中位数，而 run_screening 要等一轮中所有邮件处理完，
+这些慢请求决定了每轮的耗时。开启 LLM_HEDGING 后（异步客户端）：
+1. 按prompt类型记录最近 LLM_HEDGE_SAMPLES 次成功请求的耗时
+2. 请求超过该类型耗时的 LLM_HEDGE_QUANTILE 分位数（至少有 LLM_HEDGE_MIN_SAMPLES 个样本）仍未返回时，
+   再发送一个相同的请求，先返回有效结果的一方胜出
+3. 最近 LLM_HEDGE_WINDOW 秒内对冲请求数不超过请求总数的 LLM_HEDGE_BUDGET，额外的token成本有上限
+4. 落败的请求在后台继续完成，用它的实际耗时统计对冲节省的时间，耗时样本也不会因为对冲而偏小
+"""
+
+import time
+import threading
+from collections import deque
+import numpy as np
+
+
+class HedgePolicy:
+    def __init__(self, config):
+        self.quantile = config.LLM_HEDGE_QUANTILE
+        self.budget = config.LLM_HEDGE_BUDGET
+        self.min_samples = config.LLM_HEDGE_MIN_SAMPLES
+        self.max_samples = config.LLM_HEDGE_SAMPLES
+        self.window = config.LLM_HEDGE_WINDOW
+        self._lock = threading.Lock()
+        self._latencies = {}            # prompt类型 -> 最近的耗时(秒)
+        self._requests = deque()
+        self._hedges = deque()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.saved_seconds = 0.0
+        self.extra_tokens = 0
+
+    # ---------- 耗时统计 ----------
+
+    def observe(self, prompt_type: str, seconds: float):
+        """记录一次成功请求的耗时"""
+        with self._lock:
+            samples = self._latencies.get(prompt_type)
+            if samples is None:
+                samples = self._latencies[prompt_type] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def hedge_delay(self, prompt_type: str):
+        """该类型请求的对冲等待时间（耗时分位数），样本不足时返回None"""
+        with self._lock:
+            samples = self._latencies.get(prompt_type)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            return float(np.quantile(np.fromiter(samples, dtype=np.float64), self.quantile))
+
+    # ---------- 对冲预算 ----------
+
+    def note_request(self):
+        """每个主请求发送前调用"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_hedge(self) -> bool:
+        """是否还有对冲预算，允许时计入一次对冲"""
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            if len(self._hedges) + 1 > self.budget * len(self._requests):
+                self.budget_denied += 1
+                return False
+            self._hedges.append(now)
+            self.hedged += 1
+            return True
+
+    def _trim(self, now: float):
+        for timestamps in (self._requests, self._hedges):
+            while timestamps and timestamps[0] < now - self.window:
+                timestamps.popleft()
+
+    # ---------- 结果 ----------
+
+    def record_win(self):
+        """对冲请求先返回有效结果"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def record_loser(self, tokens: int, saved_seconds: float = 0.0):
+        """
+        落败请求完成
+
+        Args:
+            tokens: 落败请求消耗的token
+            saved_seconds: 对冲请求胜出时，主请求比对冲请求晚返回的时间
+        """
+        with self._lock:
+            self.extra_tokens += int(tokens or 0)
+            self.saved_seconds += max(0.0, saved_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hedged": self.hedged, "hedge_wins": self.hedge_wins, "budget_denied": self.budget_denied,
+                    "saved_seconds": self.saved_seconds, "extra_tokens": self.extra_tokens,
+                    "delays": {prompt_type: float(np.quantile(np.fromiter(samples, dtype=np.float64), self.quantile))
+                               for prompt_type, samples in self._latencies.items()
+                               if len(samples) >= self.min_samples}}
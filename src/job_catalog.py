@@ -0,0 +1,217 @@
+# job_catalog.py
+"""
+岗位目录模块
+
+岗位信息原先在启动时用 pandas 解析 config/job_desc.xlsx，修改岗位描述需要重启服务。本模块：
+1. 把表格编译为 JOB_CATALOG_CACHE（JSON）：字段名映射、空单元格清理、岗位别称索引和各岗位的prompt片段，
+   启动时表格未变化就直接读取编译结果，不再导入 pandas/openpyxl 解析表格
+2. 筛选每轮开始前检查表格的修改时间和大小，变化时重新编译并整体替换当前目录（读取方拿到的始终是完整的一版）
+3. 别称索引把岗位名称、岗位别称（逗号/顿号/斜杠分隔）归一化后映射到标准岗位名称
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+
+CATALOG_FORMAT = 1
+
+# 表格列名 -> 字段名
+FIELD_MAPPING = {
+    "岗位": "position_name",
+    "岗位别称": "alias",
+    "职责描述": "duties",
+    "任职要求": "requirements",
+    "学历要求": "education_req",
+    "资历要求": "exp_req",
+    "工作地点": "location",
+    "绩效考核目标": "perf_goals",
+}
+
+_ALIAS_SPLIT_RE = re.compile(r"[,，、/|;；\n]+")
+_ALIAS_NORMALIZE_RE = re.compile(r"[\s\-_()（）【】\[\]]+")
+
+
+def normalize_alias(name: str) -> str:
+    """别称匹配用的归一化：去空白和括号等符号、转小写"""
+    return _ALIAS_NORMALIZE_RE.sub("", str(name or "")).lower()
+
+
+def _clean(value):
+    """pandas读取的空单元格为NaN，统一转为空字符串；其他值转为字符串"""
+    if value is None or value != value:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def catalog_fragment(position_name: str, detail: dict) -> str:
+    """单次调用模式的岗位目录中该岗位的描述"""
+    return (f"- 岗位名称: {position_name}\n"
+            f"  工作职责: {detail.get('duties', '')}\n"
+            f"  任职要求: {detail.get('requirements', '')}\n"
+            f"  学历要求: {detail.get('education_req', '')}\n"
+            f"  经验要求: {detail.get('exp_req', '')}")
+
+
+def compile_job_catalog(xlsx_path: str) -> dict:
+    """解析岗位表格，生成可直接序列化为JSON的岗位目录"""
+    import pandas as pd
+
+    with open(xlsx_path, "rb") as f:
+        df = pd.read_excel(f)
+    df = df.rename(columns=FIELD_MAPPING)
+
+    positions = {}
+    for _, row in df.iterrows():
+        position_name = _clean(row.get("position_name"))
+        if position_name:
+            positions[position_name] = {key: _clean(value) for key, value in row.to_dict().items()}
+
+    aliases = {}
+    for position_name, detail in positions.items():
+        names = [position_name] + [name for name in _ALIAS_SPLIT_RE.split(detail.get("alias", "")) if name.strip()]
+        for name in names:
+            key = normalize_alias(name)
+            if key and aliases.setdefault(key, position_name) != position_name:
+                logging.warning(f"[JobCatalog] 岗位别称 {name} 同时属于 {aliases[key]} 和 {position_name}，"
+                                f"按 {aliases[key]} 处理")
+
+    stat = os.stat(xlsx_path)
+    return {
+        "format": CATALOG_FORMAT,
+        "source_mtime": stat.st_mtime,
+        "source_size": stat.st_size,
+        "version": hashlib.md5(json.dumps(positions, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16],
+        "positions": positions,
+        "aliases": aliases,
+        "fragments": {name: catalog_fragment(name, detail) for name, detail in positions.items()},
+    }
+
+
+class JobCatalog:
+    def __init__(self, xlsx_path: str = "config/job_desc.xlsx", cache_path: str = "data/job_catalog.json"):
+        self.xlsx_path = xlsx_path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._failed_source = None
+        self.reloads = 0
+        self.load()
+
+    # ---------- 读取 ----------
+
+    @property
+    def positions(self) -> dict:
+        """{岗位名称: 岗位字段}"""
+        return self._catalog["positions"] if self._catalog else {}
+
+    @property
+    def version(self) -> str:
+        return self._catalog["version"] if self._catalog else ""
+
+    def resolve(self, name: str) -> str:
+        """岗位名称或别称 -> 标准岗位名称，无法识别时返回空字符串"""
+        if not self._catalog or not name:
+            return ""
+        if name in self._catalog["positions"]:
+            return name
+        return self._catalog["aliases"].get(normalize_alias(name), "")
+
+    def find_in_text(self, text: str) -> str:
+        """文本（如邮件主题）中出现的岗位名称或别称对应的标准岗位名称，多个时取最长的匹配"""
+        if not self._catalog or not text:
+            return ""
+        text = normalize_alias(text)
+        matches = [key for key in self._catalog["aliases"] if len(key) >= 2 and key in text]
+        return self._catalog["aliases"][max(matches, key=len)] if matches else ""
+
+    def catalog_text(self) -> str:
+        """全部岗位的描述，供单次调用模式匹配岗位并评估"""
+        return "\n".join(self._catalog["fragments"].values()) if self._catalog else ""
+
+    # ---------- 加载与重载 ----------
+
+    def _source_stat(self):
+        try:
+            stat = os.stat(self.xlsx_path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None
+
+    def _read_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+            return catalog if catalog.get("format") == CATALOG_FORMAT else None
+        except Exception as e:
+            logging.warning(f"[JobCatalog] 读取编译结果失败: {e}")
+            return None
+
+    def _write_cache(self, catalog: dict):
+        if not self.cache_path:
+            return
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(catalog, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.warning(f"[JobCatalog] 保存编译结果失败: {e}")
+
+    def load(self) -> bool:
+        """
+        加载岗位目录：编译结果与表格一致时直接读取，否则重新编译
+
+        Returns:
+            bool: 岗位目录是否发生变化
+        """
+        with self._lock:
+            source = self._source_stat()
+            current = self._catalog
+            # 表格未变化，或表格被移走时继续使用当前目录
+            if current and (source is None or source == (current["source_mtime"], current["source_size"])):
+                return False
+
+            catalog = self._read_cache()
+            if catalog and source and source != (catalog["source_mtime"], catalog["source_size"]):
+                catalog = None
+            if catalog is None and source and source != self._failed_source:
+                try:
+                    catalog = compile_job_catalog(self.xlsx_path)
+                    self._write_cache(catalog)
+                    logging.info(f"[JobCatalog] 已编译岗位表格 {self.xlsx_path}: {len(catalog['positions'])} 个岗位")
+                except Exception as e:
+                    logging.warning(f"未能加载岗位信息: {e}")
+                    # 表格正在保存或格式有误时保留当前目录，表格再次修改后重试
+                    self._failed_source = source
+                    return False
+            if catalog is None:
+                return False
+            changed = current is None or catalog["version"] != current["version"]
+            self._catalog = catalog
+            if current is not None and changed:
+                self.reloads += 1
+                logging.info(f"[JobCatalog] 岗位信息已更新: {len(catalog['positions'])} 个岗位, 版本 {catalog['version']}")
+            return changed
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_job_catalog(config) -> JobCatalog:
+    """进程内共享的岗位目录"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = JobCatalog(config.JOB_DESC_FILE, config.JOB_CATALOG_CACHE)
+        return _catalog
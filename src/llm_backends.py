@@ -0,0 +1,174 @@
+# llm_backends.py
+"""
+LLM后端池模块
+
+原先所有请求使用同一个 OPENAI_API_KEY，吞吐受单个key的 RPM/TPM 额度限制，增加筛选线程也无济于事。
+配置 LLM_BACKENDS_JSON 后：
+1. 每个后端（API key + 接口地址，也可以是 OpenAI 兼容的网关）有独立的 RPM/TPM 限流器，
+   429只暂停该后端，其他后端照常处理
+2. 每次请求（含重试）选择当前并发数/权重最小、且能立即获取额度的健康后端；
+   重试时优先换一个后端；可用 models 限定后端支持的模型
+3. 连续 LLM_BACKEND_FAILURE_THRESHOLD 次失败（超时、连接错误、5xx）的后端暂停 LLM_BACKEND_COOLDOWN 秒，
+   认证失败的后端暂停10倍时间，全部后端不可用时由熔断器处理
+未配置时只有一个由 OPENAI_API_KEY/OPENAI_API_BASE 组成的后端，使用原有的共享限流器。
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from rate_limiter import RateLimiter, get_rate_limiter
+
+
+class LLMBackend:
+    def __init__(self, name: str, api_key: str, api_base: str, rate_limiter: RateLimiter,
+                 weight: float = 1.0, models=()):
+        self.name = name
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+        self.rate_limiter = rate_limiter
+        self.weight = weight if weight > 0 else 1.0
+        self.models = set(models or ())
+        self.in_flight = 0
+        self.failures = 0               # 连续失败次数
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def serves(self, model: str) -> bool:
+        return not self.models or not model or model in self.models
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+
+def parse_backends(config) -> list:
+    """按 LLM_BACKENDS 生成后端列表，未配置时使用 OPENAI_API_KEY/OPENAI_API_BASE"""
+    if not config.LLM_BACKENDS:
+        return [LLMBackend("default", config.OPENAI_API_KEY, config.OPENAI_API_BASE, get_rate_limiter(config))]
+    backends = []
+    for i, spec in enumerate(config.LLM_BACKENDS):
+        name = str(spec.get("name") or f"backend{i + 1}")
+        # 多进程共享限流状态时每个后端使用各自的状态文件
+        state_file = f"{config.LLM_RATE_LIMIT_FILE}.{name}" if config.LLM_RATE_LIMIT_FILE else ""
+        limiter = RateLimiter(int(spec.get("rpm", config.LLM_RPM_LIMIT)), int(spec.get("tpm", config.LLM_TPM_LIMIT)),
+                              state_file)
+        backends.append(LLMBackend(name, spec.get("api_key") or config.OPENAI_API_KEY,
+                                   spec.get("api_base") or config.OPENAI_API_BASE, limiter,
+                                   float(spec.get("weight", 1.0)), spec.get("models") or ()))
+    return backends
+
+
+class LLMBackendPool:
+    def __init__(self, config):
+        self.failure_threshold = config.LLM_BACKEND_FAILURE_THRESHOLD
+        self.cooldown = config.LLM_BACKEND_COOLDOWN
+        self.backends = parse_backends(config)
+        self._lock = threading.Lock()
+        if len(self.backends) > 1:
+            logging.info(f"[LLMBackendPool] {len(self.backends)} 个LLM后端: "
+                         f"{', '.join(b.name for b in self.backends)}")
+
+    @property
+    def multiple(self) -> bool:
+        return len(self.backends) > 1
+
+    # ---------- 选择后端 ----------
+
+    def try_acquire(self, tokens: int, model: str = "", exclude: LLMBackend = None):
+        """
+        选择负载最小且能立即获取额度的健康后端
+
+        Args:
+            tokens: 预扣的token数
+            model: 请求的模型，后端配置了 models 时只选择支持该模型的后端
+            exclude: 尽量避开的后端（重试、对冲时使用）
+
+        Returns:
+            tuple: (后端, 0.0)；没有可立即使用的后端时为 (None, 需要等待的秒数)
+        """
+        with self._lock:
+            now = time.time()
+            eligible = [b for b in self.backends if b.serves(model)] or self.backends
+            healthy = [b for b in eligible if b.healthy(now)]
+            if not healthy:
+                # 全部后端都在暂停中时选择最早恢复的一个，由熔断器判断服务是否整体不可用
+                healthy = [min(eligible, key=lambda b: b.unhealthy_until)]
+            if exclude is not None and len(healthy) > 1:
+                healthy = [b for b in healthy if b is not exclude]
+            ordered = sorted(healthy, key=lambda b: b.in_flight / b.weight)
+
+        wait = None
+        for backend in ordered:
+            backend_wait = backend.rate_limiter.try_acquire(tokens)
+            if backend_wait <= 0:
+                with self._lock:
+                    backend.in_flight += 1
+                    backend.requests += 1
+                return backend, 0.0
+            wait = backend_wait if wait is None else min(wait, backend_wait)
+        return None, wait or 0.0
+
+    def acquire(self, tokens: int, model: str = "", exclude: LLMBackend = None) -> LLMBackend:
+        """阻塞直到有后端可用，返回的后端用完后必须调用 release"""
+        while True:
+            backend, wait = self.try_acquire(tokens, model, exclude)
+            if backend:
+                return backend
+            time.sleep(min(wait, 5))
+
+    async def acquire_async(self, tokens: int, model: str = "", exclude: LLMBackend = None) -> LLMBackend:
+        """协程版本的 acquire"""
+        while True:
+            backend, wait = self.try_acquire(tokens, model, exclude)
+            if backend:
+                return backend
+            await asyncio.sleep(min(wait, 5))
+
+    # ---------- 调用结果 ----------
+
+    def release(self, backend: LLMBackend, outcome: str = "ok"):
+        """
+        请求结束
+
+        Args:
+            backend: acquire 返回的后端
+            outcome: ok（服务端有响应）/rate_limited（429）/failure（超时、连接错误、5xx）/auth_error（401、403）
+        """
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+            if outcome in ("ok", "rate_limited"):
+                backend.failures = 0
+                backend.rate_limited += int(outcome == "rate_limited")
+                return
+            backend.errors += 1
+            if outcome == "auth_error":
+                backend.unhealthy_until = time.time() + self.cooldown * 10
+                logging.error(f"[LLMBackendPool] 后端 {backend.name} 认证失败，暂停 {self.cooldown * 10:.0f} 秒")
+                return
+            backend.failures += 1
+            if backend.failures >= self.failure_threshold:
+                backend.unhealthy_until = time.time() + self.cooldown
+                logging.warning(f"[LLMBackendPool] 后端 {backend.name} 连续失败 {backend.failures} 次，"
+                                f"暂停 {self.cooldown:.0f} 秒")
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.time()
+            return {b.name: {"requests": b.requests, "errors": b.errors, "rate_limited": b.rate_limited,
+                             "in_flight": b.in_flight, "healthy": b.healthy(now)}
+                    for b in self.backends}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_backend_pool(config) -> LLMBackendPool:
+    """进程内共享的LLM后端池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMBackendPool(config)
+        return _pool
@@ -0,0 +1,175 @@
+# llm_cache.py
+"""
+LLM结果缓存模块
+
+以 (resume_hash, position, model, prompt_version) 为键把模型结果持久化到 llm_result_cache 表：
+1. 同一份简历重复筛选（重置邮件、重复投递）时直接复用结果，不再调用模型
+2. prompt模板或模型变化时 prompt_version/model 随之变化，自动失效
+3. 同一进程内相同键的并发请求合并为一次调用，其余线程等待结果
+4. 统计命中、未命中和合并次数
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from db_manager import LLMResultCache
+
+
+def prompt_version(*parts) -> str:
+    """根据prompt模板的固定部分计算版本号，任一部分变化版本号都会变化"""
+    h = hashlib.md5()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, ensure_ascii=False, sort_keys=True)
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, config):
+        self.config = config
+        self.enabled = config.LLM_RESULT_CACHE
+        self._session_factory = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _session(self):
+        # 进程内共用一个连接池，避免每次查询都新建engine
+        if self._session_factory is None:
+            with self._lock:
+                if self._session_factory is None:
+                    db_url = (
+                        f"mysql+pymysql://{self.config.DB_USER}:{self.config.DB_PASSWORD}"
+                        f"@{self.config.DB_HOST}:{self.config.DB_PORT}/{self.config.DB_NAME}?charset=utf8mb4"
+                    )
+                    engine = create_engine(db_url, pool_pre_ping=True, pool_size=self.config.DB_POOL_SIZE,
+                                           max_overflow=self.config.DB_MAX_OVERFLOW)
+                    LLMResultCache.__table__.create(bind=engine, checkfirst=True)
+                    self._session_factory = sessionmaker(bind=engine)
+        return self._session_factory()
+
+    @staticmethod
+    def make_key(resume_hash: str, position: str, model: str, version: str) -> str:
+        return hashlib.md5("\x00".join([resume_hash, position or "", model, version]).encode('utf-8')).hexdigest()
+
+    def load(self, key: str):
+        session = self._session()
+        try:
+            row = session.query(LLMResultCache).filter_by(cache_key=key).first()
+            if row is None:
+                return None
+            session.execute(update(LLMResultCache).where(LLMResultCache.id == row.id)
+                            .values(hit_count=LLMResultCache.hit_count + 1))
+            session.commit()
+            return json.loads(row.result)
+        finally:
+            session.close()
+
+    def store(self, key: str, resume_hash: str, position: str, model: str, version: str, result):
+        session = self._session()
+        try:
+            row = session.query(LLMResultCache).filter_by(cache_key=key).first()
+            if row is None:
+                row = LLMResultCache(cache_key=key, resume_hash=resume_hash, position=position,
+                                     model=model, prompt_version=version, hit_count=0)
+                session.add(row)
+            row.result = json.dumps(result, ensure_ascii=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_or_compute(self, resume_hash: str, position: str, model: str, version: str, compute,
+                       is_valid=bool):
+        """
+        读取缓存，未命中时调用 compute() 并写入缓存
+
+        Args:
+            resume_hash: 简历文本哈希
+            position: 岗位名称
+            model: 模型名称
+            version: prompt版本号
+            compute: 无参函数，返回可JSON序列化的结果
+            is_valid: 判断结果是否可缓存（失败结果不缓存）
+
+        Returns:
+            compute() 的结果或缓存中的结果
+        """
+        if not self.enabled or not resume_hash:
+            return compute()
+
+        key = self.make_key(resume_hash, position, model, version)
+        try:
+            cached = self.load(key)
+        except Exception as e:
+            logging.warning(f"[ResultCache] 读取缓存失败: {e}")
+            cached = None
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            logging.info(f"[ResultCache] 缓存命中: resume_hash={resume_hash}, position={position}")
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            logging.info(f"[ResultCache] 合并相同请求: resume_hash={resume_hash}, position={position}")
+            return future.result()
+
+        try:
+            result = compute()
+            if is_valid(result):
+                try:
+                    self.store(key, resume_hash, position, model, version, result)
+                except Exception as e:
+                    logging.warning(f"[ResultCache] 写入缓存失败: {e}")
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        total = hits + misses + coalesced
+        return {
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_rate": (hits + coalesced) / total if total else 0.0,
+        }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache(config) -> ResultCache:
+    """进程内共享的结果缓存，合并并发请求和累计统计都依赖同一个实例"""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(config)
+        return _result_cache
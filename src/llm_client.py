@@ -0,0 +1,296 @@
+# llm_client.py
+"""
+异步LLM客户端
+
+基于 aiohttp 直接调用 OpenAI 兼容的 /chat/completions 接口：
+1. 进程内共用一个连接池和一个后台事件循环，线程池中的筛选任务通过 chat_completion_sync 提交协程
+2. 每次请求前从后端池选择负载最小的健康后端并获取该后端的 RPM/TPM 额度，请求完成后按实际用量修正
+3. 429/5xx 时按 retry-after、x-ratelimit-reset-* 头退避，429会让该后端的所有请求一起暂停而不是各自重试
+4. 重试受进程内共享的熔断器和重试预算约束，熔断期间直接抛出 CircuitOpenError
+5. 开启 LLM_HEDGING 时，超过同类请求耗时分位数仍未返回的请求按对冲预算再发送一次，先返回的有效结果胜出
+"""
+
+import json
+import random
+import asyncio
+import logging
+import threading
+import time
+import aiohttp
+from token_budget import count_tokens
+from rate_limiter import parse_reset_seconds
+from llm_backends import get_backend_pool
+from circuit_breaker import get_circuit_breaker
+from hedging import HedgePolicy
+
+# 可重试的HTTP状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class LLMError(Exception):
+    """LLM接口调用失败"""
+    def __init__(self, message, status=None, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def estimate_request_tokens(messages: list, max_tokens: int, model: str) -> int:
+    """估算一次请求消耗的token（输入 + 最大输出），用于预扣TPM额度"""
+    prompt_tokens = sum(count_tokens(m.get("content") or "", model) + 4 for m in messages)
+    return prompt_tokens + (max_tokens or 0)
+
+
+def retry_delay(headers, attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """优先使用服务端给出的等待时间，否则指数退避并加随机抖动"""
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = parse_reset_seconds(headers.get(name)) if headers else 0
+        if seconds > 0:
+            return min(seconds, cap) + random.uniform(0, 0.5)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _outcome(error) -> str:
+    """请求异常对应的后端健康状态，见 LLMBackendPool.release"""
+    status = getattr(error, "status", None)
+    if status == 429:
+        return "rate_limited"
+    if status in (401, 403):
+        return "auth_error"
+    if status is not None and status not in RETRY_STATUS:
+        return "ok"
+    return "failure"
+
+
+class AsyncLLMClient:
+    def __init__(self, config):
+        self.config = config
+        self.max_retries = config.AI_RETRY_TIMES
+        self.timeout = config.AI_TIMEOUT
+        self.max_connections = config.LLM_MAX_CONNECTIONS
+        self.max_backoff = config.LLM_MAX_BACKOFF
+        self.backends = get_backend_pool(config)
+        self.breaker = get_circuit_breaker(config)
+        self.hedging = HedgePolicy(config) if config.LLM_HEDGING else None
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post(self, backend, path: str, payload: dict, timeout: float):
+        session = await self._get_session()
+        async with session.post(f"{backend.api_base}{path}", json=payload,
+                                headers={"Authorization": f"Bearer {backend.api_key}"},
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            headers = {k.lower(): v for k, v in resp.headers.items()}
+            body = await resp.text()
+            if resp.status != 200:
+                raise LLMError(f"HTTP {resp.status}: {body[:500]}", resp.status, headers)
+            return json.loads(body), headers
+
+    async def _timed_post(self, backend, payload: dict, timeout: float, prompt_type: str):
+        """发送 chat/completions 请求，成功时记录耗时供对冲使用"""
+        start = time.perf_counter()
+        result = await self._post(backend, "/chat/completions", payload, timeout)
+        self.hedging.observe(prompt_type, time.perf_counter() - start)
+        return result
+
+    async def _post_hedged(self, backend, payload: dict, timeout: float, prompt_type: str, estimated: int):
+        """
+        发送 chat/completions 请求，超过该类型耗时分位数仍未返回时按对冲预算再发送一个相同的请求（优先换一个后端）
+
+        Returns:
+            tuple: 先返回的有效结果 (响应, 响应头, 后端)；两个请求都失败时抛出主请求的异常
+        """
+        if not self.hedging:
+            return (*await self._post(backend, "/chat/completions", payload, timeout), backend)
+        self.hedging.note_request()
+        primary = asyncio.ensure_future(self._timed_post(backend, payload, timeout, prompt_type))
+        hedge = hedge_backend = None
+        try:
+            delay = self.hedging.hedge_delay(prompt_type)
+            if delay is None or delay >= timeout:
+                return (*await primary, backend)
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self.hedging.try_hedge():
+                return (*await primary, backend)
+
+            hedge_backend = await self.backends.acquire_async(estimated, payload.get("model"), exclude=backend)
+            hedge = asyncio.ensure_future(self._timed_post(hedge_backend, payload, timeout, prompt_type))
+            pending, winner = {primary, hedge}, None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in (primary, hedge) if task in done and task.exception() is None),
+                              None)
+        except asyncio.CancelledError:
+            # 调用方被取消（等待主请求、获取对冲后端或等待两个请求时）：请求一起取消，
+            # 对冲请求的后端在这里归还，主请求的后端由调用方归还
+            primary.cancel()
+            if hedge is not None:
+                hedge.cancel()
+                hedge_backend.rate_limiter.adjust_tokens(estimated, 0)
+                self.backends.release(hedge_backend, "ok")
+            raise
+        if winner is None:
+            # 两个请求都失败，归还对冲请求预扣的token，按主请求的异常重试
+            hedge_backend.rate_limiter.adjust_tokens(estimated, 0)
+            self.backends.release(hedge_backend, _outcome(hedge.exception()))
+            return (*await primary, backend)
+
+        loser, loser_backend = (hedge, hedge_backend) if winner is primary else (primary, backend)
+        if winner is hedge:
+            self.hedging.record_win()
+            logging.debug(f"[LLMClient] 对冲请求先返回: {prompt_type}, 等待阈值 {delay:.1f}秒")
+        finished = time.perf_counter()
+        # 胜出请求的token由调用方按响应修正，落败请求完成后修正自己预扣的token
+        loser.add_done_callback(lambda task: self._settle_loser(task, loser_backend, estimated,
+                                                                winner is hedge, finished))
+        return (*winner.result(), hedge_backend if winner is hedge else backend)
+
+    def _settle_loser(self, task, backend, estimated: int, hedge_won: bool, finished: float):
+        tokens, outcome = 0, "ok"
+        if task.cancelled():
+            outcome = "failure"
+        elif task.exception() is not None:
+            outcome = _outcome(task.exception())
+        else:
+            tokens = (task.result()[0].get("usage") or {}).get("total_tokens") or 0
+        backend.rate_limiter.adjust_tokens(estimated, tokens)
+        self.backends.release(backend, outcome)
+        self.hedging.record_loser(tokens, time.perf_counter() - finished if hedge_won else 0.0)
+
+    async def chat_completion(self, model: str, messages: list, temperature: float = 0.1,
+                              max_tokens: int = None, timeout: float = None, stats: dict = None,
+                              prompt_type: str = "", **kwargs):
+        """
+        调用 chat/completions，返回与 openai.ChatCompletion.create 相同结构的字典
+
+        stats 不为None时写入实际尝试次数(attempts)，供调用台账统计重试；prompt_type 用于按类型统计耗时和对冲
+
+        Raises:
+            LLMError: 重试次数或重试预算用尽，或遇到不可重试的错误
+            CircuitOpenError: 熔断中
+        """
+        payload = {"model": model, "messages": messages, "temperature": temperature, **kwargs}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        estimated = estimate_request_tokens(messages, max_tokens, model)
+        timeout = timeout or self.timeout
+
+        last_error = None
+        backend = None
+        failover = False
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                # 换后端重试（限流、认证失败）不放大请求量，不占用重试预算
+                if not failover and not self.breaker.allow_retry():
+                    raise LLMError(f"LLM调用失败，重试预算已用完: {last_error}")
+                await asyncio.sleep(delay)
+            if stats is not None:
+                stats["attempts"] = attempt + 1
+            probe = self.breaker.before_call()
+            try:
+                # 重试时优先换一个后端
+                backend = await self.backends.acquire_async(estimated, model, exclude=backend)
+            except BaseException:
+                if probe:
+                    self.breaker.abandon_probe()
+                raise
+            try:
+                response, headers, used = await self._post_hedged(backend, payload, timeout, prompt_type,
+                                                                  estimated)
+                backend = used
+                if not isinstance(response, dict) or not response.get("choices"):
+                    raise ValueError(f"响应缺少choices: {str(response)[:200]}")
+                self.breaker.record_success()
+                used.rate_limiter.update_from_headers(headers)
+                usage = response.get("usage") or {}
+                used.rate_limiter.adjust_tokens(estimated, usage.get("total_tokens"))
+                self.backends.release(used, "ok")
+                return response
+            except LLMError as e:
+                last_error = e
+                # 请求未被处理，归还预扣的token
+                backend.rate_limiter.adjust_tokens(estimated, 0)
+                self.backends.release(backend, _outcome(e))
+                if e.status in RETRY_STATUS and e.status != 429:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                failover = self.backends.multiple and e.status in (401, 403, 429)
+                if e.status in (401, 403) and self.backends.multiple:
+                    # 该后端的key无效，换后端重试
+                    delay = 0.0
+                elif e.status not in RETRY_STATUS:
+                    raise
+                elif e.status == 429:
+                    # 按服务端给出的等待时间暂停该后端；有其他后端时立即换后端重试
+                    delay = retry_delay(e.headers, attempt)
+                    backend.rate_limiter.block_for(delay)
+                    if self.backends.multiple:
+                        delay = 0.0
+                else:
+                    delay = retry_delay(e.headers, attempt, cap=self.max_backoff)
+                logging.warning(f"LLM请求失败 (后端 {backend.name}, 尝试 {attempt + 1}/{self.max_retries}): {e}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # 连接错误、超时，或200响应的内容不是有效的JSON/缺少choices
+                last_error = e
+                failover = False
+                backend.rate_limiter.adjust_tokens(estimated, 0)
+                self.backends.release(backend, "failure")
+                self.breaker.record_failure()
+                delay = retry_delay(None, attempt, cap=self.max_backoff)
+                logging.warning(f"LLM请求异常 (后端 {backend.name}, 尝试 {attempt + 1}/{self.max_retries}): "
+                                f"{type(e).__name__}: {e}")
+            except BaseException as e:
+                # 其他异常或协程被取消：归还后端和预扣的token后原样抛出，避免占用的并发数和TPM额度无法释放
+                cancelled = isinstance(e, asyncio.CancelledError)
+                backend.rate_limiter.adjust_tokens(estimated, 0)
+                self.backends.release(backend, "ok" if cancelled else "failure")
+                if not cancelled:
+                    self.breaker.record_failure()
+                elif probe:
+                    self.breaker.abandon_probe()
+                raise
+        raise LLMError(f"LLM调用失败，已重试{self.max_retries}次: {last_error}")
+
+    def chat_completion_sync(self, **kwargs):
+        """供线程池中的同步代码调用：把协程提交到后台事件循环并等待结果"""
+        return asyncio.run_coroutine_threadsafe(self.chat_completion(**kwargs), _get_loop()).result()
+
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _get_loop():
+    """进程内共享的后台事件循环"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client-loop", daemon=True).start()
+        return _loop
+
+
+def get_llm_client(config) -> AsyncLLMClient:
+    """进程内共享的异步客户端（共用连接池和限流器）"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = AsyncLLMClient(config)
+        return _client
+
+
+def close_llm_client():
+    """关闭共享客户端的连接池（进程退出前调用）"""
+    if _client is not None and _loop is not None:
+        asyncio.run_coroutine_threadsafe(_client.close(), _loop).result(timeout=10)
@@ -0,0 +1,251 @@
+# llm_ledger.py
+"""
+LLM调用台账模块
+
+每次 call_openai_with_retry 调用（含全部重试）记录一行到 llm_call_log 表：
+prompt类型、模型、岗位、邮件ID、输入/输出token、总耗时、重试次数和失败时的异常类型。
+1. 记录先在内存中累积，达到 LLM_LEDGER_FLUSH_SIZE 条或距上次写入超过 LLM_LEDGER_FLUSH_SECONDS 秒时批量写入
+2. 处理一封邮件期间的记录暂存在当前线程，邮件处理结束时用最终确定的岗位补齐后再写入，
+   岗位识别这类发生在岗位确定之前的调用也能计入对应岗位
+3. rollup 按岗位、模型、prompt类型、日期（可组合）汇总调用量、token、耗时和按 LLM_PRICES 计算的成本
+"""
+
+import atexit
+import logging
+import threading
+import time
+from sqlalchemy import case, create_engine, func
+from sqlalchemy.orm import sessionmaker
+from db_manager import LLMCallLog, beijing_now
+
+_context = threading.local()
+
+
+def parse_prices(text: str) -> dict:
+    """解析 LLM_PRICES，返回 {模型: (输入单价, 输出单价)}，单价为每百万token"""
+    prices = {}
+    for item in (text or "").split(","):
+        if "=" not in item:
+            continue
+        model, price = item.split("=", 1)
+        try:
+            prompt_price, _, completion_price = price.partition("/")
+            prices[model.strip()] = (float(prompt_price), float(completion_price or 0))
+        except ValueError:
+            logging.warning(f"[LLMLedger] 无法解析模型单价: {item}")
+    return prices
+
+
+def call_cost(prices: dict, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = prices.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class LLMLedger:
+    def __init__(self, config):
+        self.config = config
+        self.enabled = config.LLM_LEDGER
+        self.flush_size = config.LLM_LEDGER_FLUSH_SIZE
+        self.flush_seconds = config.LLM_LEDGER_FLUSH_SECONDS
+        self._session_factory = None
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.time()
+
+    def _session(self):
+        if self._session_factory is None:
+            with self._lock:
+                if self._session_factory is None:
+                    db_url = (
+                        f"mysql+pymysql://{self.config.DB_USER}:{self.config.DB_PASSWORD}"
+                        f"@{self.config.DB_HOST}:{self.config.DB_PORT}/{self.config.DB_NAME}?charset=utf8mb4"
+                    )
+                    engine = create_engine(db_url, pool_pre_ping=True, pool_size=2, max_overflow=2)
+                    LLMCallLog.__table__.create(bind=engine, checkfirst=True)
+                    self._session_factory = sessionmaker(bind=engine)
+        return self._session_factory()
+
+    # ---------- 记录 ----------
+
+    def record(self, prompt_type: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency: float = 0.0, retries: int = 0, error: str = ""):
+        """记录一次LLM调用，latency 单位为秒"""
+        usage = getattr(_context, "usage", None)
+        if usage is not None:
+            usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + int(prompt_tokens or 0)
+            usage["completion_tokens"] = usage.get("completion_tokens", 0) + int(completion_tokens or 0)
+        if not self.enabled:
+            return
+        row = {
+            "email_id": getattr(_context, "email_id", None),
+            "prompt_type": prompt_type or "",
+            "model": model or "",
+            "position": getattr(_context, "position", ""),
+            "prompt_tokens": int(prompt_tokens or 0),
+            "completion_tokens": int(completion_tokens or 0),
+            "latency_ms": int(latency * 1000),
+            "retries": retries,
+            "error": (error or "")[:100],
+            "create_time": beijing_now(),
+        }
+        pending = getattr(_context, "pending", None)
+        if pending is not None:
+            pending.append(row)
+        else:
+            self._append([row])
+
+    def begin_email(self, email_id: int):
+        """开始处理一封邮件：之后当前线程的调用记录暂存，直到 end_email"""
+        _context.email_id = email_id
+        _context.position = ""
+        _context.pending = []
+
+    def set_position(self, position: str):
+        """设置当前线程正在处理的岗位"""
+        _context.position = position or ""
+
+    def current_email(self):
+        """当前线程正在处理的邮件ID"""
+        return getattr(_context, "email_id", None)
+
+    def attach(self, email_id=None, position: str = "", usage: dict = None):
+        """
+        在其他线程中代当前邮件发起调用时使用：记录直接写入（不暂存），usage 累计本线程之后调用的token数，
+        调用结束后以默认参数再次调用以解除
+        """
+        _context.email_id = email_id
+        _context.position = position or ""
+        _context.pending = None
+        _context.usage = usage
+
+    def end_email(self):
+        """结束处理当前邮件：用最终岗位补齐暂存的记录后写入"""
+        pending = getattr(_context, "pending", None) or []
+        position = getattr(_context, "position", "")
+        _context.email_id = None
+        _context.position = ""
+        _context.pending = None
+        for row in pending:
+            row["position"] = row["position"] or position
+        if pending:
+            self._append(pending)
+
+    def _append(self, rows: list):
+        with self._lock:
+            self._buffer.extend(rows)
+            due = (len(self._buffer) >= self.flush_size
+                   or time.time() - self._last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把累积的记录批量写入 llm_call_log，写入失败时丢弃并记录错误，不影响筛选"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.time()
+        if not rows:
+            return
+        session = None
+        try:
+            session = self._session()
+            session.bulk_insert_mappings(LLMCallLog, rows)
+            session.commit()
+        except Exception as e:
+            logging.error(f"[LLMLedger] 写入 {len(rows)} 条调用记录失败: {e}")
+            if session:
+                session.rollback()
+        finally:
+            if session:
+                session.close()
+
+
+def rollup(session, by=("day",), since=None, until=None, prices: dict = None) -> list:
+    """
+    汇总LLM调用台账
+
+    Args:
+        session: 数据库会话
+        by: 分组字段，position/model/prompt_type/day 中的一个或多个
+        since: 起始时间（含）
+        until: 截止时间（不含）
+        prices: 模型单价，见 parse_prices，为None时不计算成本
+
+    Returns:
+        list: 每组一个字典，包含分组字段以及 calls、emails、errors、retries、prompt_tokens、
+              completion_tokens、avg_latency_ms、max_latency_ms、cost、cost_per_email
+    """
+    if isinstance(by, str):
+        by = (by,)
+    columns = {
+        "position": LLMCallLog.position,
+        "model": LLMCallLog.model,
+        "prompt_type": LLMCallLog.prompt_type,
+        "day": func.date(LLMCallLog.create_time),
+    }
+    unknown = [name for name in by if name not in columns]
+    if unknown:
+        raise ValueError(f"不支持的分组字段: {unknown}")
+    keys = [columns[name].label(name) for name in by]
+
+    def filtered(query):
+        if since is not None:
+            query = query.filter(LLMCallLog.create_time >= since)
+        if until is not None:
+            query = query.filter(LLMCallLog.create_time < until)
+        return query
+
+    # 成本按模型单价计算，因此先按 分组字段+模型 聚合，再在内存中合并
+    rows = filtered(session.query(
+        *keys, LLMCallLog.model.label("_model"),
+        func.count(LLMCallLog.id), func.sum(func.coalesce(LLMCallLog.retries, 0)),
+        func.sum(func.coalesce(LLMCallLog.prompt_tokens, 0)), func.sum(func.coalesce(LLMCallLog.completion_tokens, 0)),
+        func.sum(func.coalesce(LLMCallLog.latency_ms, 0)), func.max(LLMCallLog.latency_ms),
+        func.sum(case((func.coalesce(LLMCallLog.error, "") != "", 1), else_=0)),
+    )).group_by(*keys, LLMCallLog.model).all()
+    emails = dict(
+        (tuple(str(v) for v in row[:-1]), row[-1]) for row in filtered(session.query(
+            *keys, func.count(func.distinct(LLMCallLog.email_id))
+        )).group_by(*keys).all()
+    )
+
+    groups = {}
+    for row in rows:
+        group_key = tuple(str(v) for v in row[:len(by)])
+        model, calls, retries, prompt_tokens, completion_tokens, latency, max_latency, errors = row[len(by):]
+        group = groups.setdefault(group_key, {
+            **dict(zip(by, group_key)), "calls": 0, "emails": emails.get(group_key, 0), "errors": 0,
+            "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "_latency": 0, "max_latency_ms": 0,
+            "cost": 0.0 if prices is not None else None,
+        })
+        group["calls"] += calls
+        group["errors"] += int(errors or 0)
+        group["retries"] += int(retries or 0)
+        group["prompt_tokens"] += int(prompt_tokens or 0)
+        group["completion_tokens"] += int(completion_tokens or 0)
+        group["_latency"] += int(latency or 0)
+        group["max_latency_ms"] = max(group["max_latency_ms"], int(max_latency or 0))
+        if prices is not None:
+            group["cost"] += call_cost(prices, model, int(prompt_tokens or 0), int(completion_tokens or 0))
+
+    summary = []
+    for group_key in sorted(groups):
+        group = groups[group_key]
+        group["avg_latency_ms"] = group.pop("_latency") / group["calls"] if group["calls"] else 0.0
+        group["cost_per_email"] = (group["cost"] / group["emails"]
+                                   if group["cost"] is not None and group["emails"] else None)
+        summary.append(group)
+    return summary
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_llm_ledger(config) -> LLMLedger:
+    """进程内共享的调用台账，进程退出时写入剩余记录"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = LLMLedger(config)
+            atexit.register(_ledger.flush)
+        return _ledger
@@ -0,0 +1,333 @@
+# mail_classifier.py
+"""
+非简历邮件本地分类器
+
+用 emails 表中已有的处理结果（NOT_RESUME / COMPLETED）训练一个 TF-IDF + 逻辑回归模型，
+在调用 identify_mail_type 之前拦截高置信度的非简历邮件：
+1. 特征：主题、发件域名、附件扩展名和正文前若干字符的英文单词与中文二元组
+2. 模型：L2正则的逻辑回归，稀疏矩阵运算只依赖NumPy
+3. 定期在后台线程重训，训练时留出最近的一部分样本做验证，非简历精确率不达标
+   （或验证集中没有样本达到阈值、无法验证）时不启用拦截
+4. 统计检查数和拦截数，供筛选服务报告跳过率
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import sessionmaker
+from db_manager import Email
+
+# 正文只取前若干字符，足够区分邮件类型
+MAX_BODY_CHARS = 3000
+
+# 训练样本要求
+MIN_SAMPLES_PER_CLASS = 50
+HOLDOUT_RATIO = 0.2
+# 验证集上非简历判定的最低精确率，低于该值不启用拦截
+MIN_HOLDOUT_PRECISION = 0.98
+
+_WORD_RE = re.compile(r"[a-z0-9]{2,}")
+_CJK_RUN_RE = re.compile(r"[一-鿿]+")
+
+
+def tokenize_mail(subject: str, body: str, attach_filenames: list, from_domain: str) -> list:
+    """将邮件转为特征词列表，主题/域名/附件加前缀与正文区分"""
+    tokens = []
+
+    def add_text(text, prefix):
+        text = (text or "").lower()
+        tokens.extend(prefix + w for w in _WORD_RE.findall(text))
+        for run in _CJK_RUN_RE.findall(text):
+            if len(run) == 1:
+                tokens.append(prefix + run)
+            else:
+                tokens.extend(prefix + run[i:i + 2] for i in range(len(run) - 1))
+
+    add_text(subject, "s:")
+    add_text((body or "")[:MAX_BODY_CHARS], "")
+
+    domain = (from_domain or "").lower()
+    if domain:
+        tokens.append("d:" + domain)
+        # 同时保留主域名，便于泛化到子域名
+        tokens.append("d:" + ".".join(domain.split(".")[-2:]))
+
+    attach_filenames = attach_filenames or []
+    tokens.append(f"a:count{min(len(attach_filenames), 3)}")
+    for name in attach_filenames:
+        ext = os.path.splitext(name or "")[1].lower()
+        if ext:
+            tokens.append("a:" + ext)
+    return tokens
+
+
+class MailClassifier:
+    def __init__(self, config):
+        """
+        初始化分类器，有已保存的模型时直接加载
+
+        Args:
+            config: 配置对象，读取 MAIL_CLASSIFIER_* 配置
+        """
+        self.config = config
+        self.enabled = config.MAIL_CLASSIFIER_ENABLED
+        self.threshold = config.MAIL_CLASSIFIER_THRESHOLD
+        self.model_path = config.MAIL_CLASSIFIER_MODEL_PATH
+        self.retrain_interval = config.MAIL_CLASSIFIER_RETRAIN_HOURS * 3600
+        self.max_samples = config.MAIL_CLASSIFIER_MAX_SAMPLES
+
+        # (vocab, idf, weights, bias) 整体替换，预测线程无需加锁
+        self._model = None
+        self.trained_at = 0
+        self.holdout_precision = None
+
+        self._training = False
+        self._train_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+
+        if self.enabled:
+            self.load()
+
+    # ---------- 持久化 ----------
+
+    def load(self):
+        if not os.path.exists(self.model_path):
+            return
+        try:
+            data = np.load(self.model_path, allow_pickle=False)
+            vocab = {token: i for i, token in enumerate(data["vocab"].tolist())}
+            self._model = (vocab, data["idf"], data["weights"], float(data["bias"]))
+            self.trained_at = float(data["trained_at"])
+            precision = float(data["holdout_precision"])
+            # 保存为NaN表示验证集无法给出精确率
+            self.holdout_precision = None if np.isnan(precision) else precision
+            logging.info(f"已加载邮件分类器: 词表 {len(vocab)}, 验证精确率 "
+                         f"{'-' if self.holdout_precision is None else f'{self.holdout_precision:.3f}'}")
+        except Exception as e:
+            logging.warning(f"加载邮件分类器失败，将重新训练: {e}")
+            self._model = None
+            self.trained_at = 0
+
+    def save(self):
+        vocab, idf, weights, bias = self._model
+        tokens = sorted(vocab, key=vocab.get)
+        model_dir = os.path.dirname(self.model_path)
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
+        # 先写临时文件再替换，避免其他进程读到半个文件
+        tmp_path = self.model_path + ".tmp.npz"
+        precision = np.nan if self.holdout_precision is None else self.holdout_precision
+        np.savez(tmp_path, vocab=np.array(tokens), idf=idf, weights=weights, bias=bias,
+                 trained_at=self.trained_at, holdout_precision=precision)
+        os.replace(tmp_path, self.model_path)
+
+    # ---------- 训练 ----------
+
+    def maybe_retrain(self, session):
+        """
+        模型不存在或超过重训间隔时，在后台线程中从 emails 表重新训练
+
+        训练期间继续使用旧模型，不阻塞筛选主循环。
+
+        Args:
+            session: 数据库会话，仅用于获取连接，训练线程使用独立会话
+        """
+        if not self.enabled:
+            return
+        if self._model is not None and time.time() - self.trained_at < self.retrain_interval:
+            return
+        with self._train_lock:
+            if self._training:
+                return
+            self._training = True
+        session_factory = sessionmaker(bind=session.get_bind())
+        threading.Thread(target=self._train_in_background, args=(session_factory,),
+                         name="mail-classifier-train", daemon=True).start()
+
+    def _train_in_background(self, session_factory):
+        session = session_factory()
+        try:
+            self.train(session)
+        except Exception as e:
+            logging.error(f"训练邮件分类器失败: {e}", exc_info=True)
+            # 失败后等到下一个重训间隔再试，避免每轮重复失败
+            self.trained_at = time.time()
+        finally:
+            session.close()
+            with self._train_lock:
+                self._training = False
+
+    def load_samples(self, session):
+        """
+        读取已由LLM判定的邮件作为训练样本
+
+        本地预检/分类器拦截的邮件（error_message 含“本地”）不参与训练，避免模型自我强化。
+
+        Returns:
+            list: [(tokens, label)]，label=1 表示非简历，按时间从旧到新排列
+        """
+        rows = session.query(
+            Email.subject, Email.content_text, Email.attachments_info,
+            Email.from_address, Email.process_status
+        ).filter(
+            Email.process_status.in_(["NOT_RESUME", "COMPLETED"]),
+            or_(Email.error_message.is_(None), ~Email.error_message.like("%本地%"))
+        ).order_by(Email.id.desc()).limit(self.max_samples).all()
+
+        samples = []
+        for subject, content_text, attachments_info, from_address, status in reversed(rows):
+            try:
+                attachments = json.loads(attachments_info) if attachments_info else []
+                attach_filenames = [a.get('name', '') for a in attachments if isinstance(a, dict)]
+            except Exception:
+                attach_filenames = []
+            from_domain = from_address.split('@')[-1] if from_address else ""
+            tokens = tokenize_mail(subject, content_text, attach_filenames, from_domain)
+            samples.append((tokens, 1 if status == "NOT_RESUME" else 0))
+        return samples
+
+    def train(self, session):
+        samples = self.load_samples(session)
+        positives = sum(label for _, label in samples)
+        negatives = len(samples) - positives
+        if min(positives, negatives) < MIN_SAMPLES_PER_CLASS:
+            logging.info(f"邮件分类器样本不足(非简历 {positives}, 简历 {negatives})，暂不启用")
+            self.trained_at = time.time()
+            return
+
+        # 最近的样本做验证，更接近上线后的邮件分布
+        split = int(len(samples) * (1 - HOLDOUT_RATIO))
+        train_samples, holdout = samples[:split], samples[split:]
+
+        model = self._fit(train_samples)
+        probs = self._predict_batch(model, [tokens for tokens, _ in holdout])
+        labels = np.array([label for _, label in holdout])
+        flagged = probs >= self.threshold
+        # 验证集中没有样本达到阈值时无法证明精确率，视为未通过验证
+        precision = float(labels[flagged].mean()) if flagged.any() else None
+        recall = float(flagged[labels == 1].mean()) if (labels == 1).any() else 0.0
+
+        # 用全部样本重训，替换模型期间暂停拦截
+        model = self._fit(samples)
+        self.holdout_precision = None
+        self._model = model
+        self.holdout_precision = precision
+        self.trained_at = time.time()
+        self.save()
+        logging.info(f"邮件分类器训练完成: 样本 {len(samples)}(非简历 {positives}), "
+                     f"词表 {len(model[0])}, 阈值 {self.threshold} 下验证精确率 "
+                     f"{'-' if precision is None else f'{precision:.3f}'}, 召回率 {recall:.3f}")
+        if precision is None:
+            logging.warning(f"邮件分类器验证集中没有非简历概率达到 {self.threshold} 的邮件，无法验证，暂不拦截")
+        elif precision < MIN_HOLDOUT_PRECISION:
+            logging.warning(f"邮件分类器验证精确率低于 {MIN_HOLDOUT_PRECISION}，暂不拦截")
+
+    def _fit(self, samples, epochs=300, lr=0.5, l2=1e-4, min_df=2, max_features=50000):
+        docs = [tokens for tokens, _ in samples]
+        labels = np.array([label for _, label in samples], dtype=np.float64)
+
+        # 文档频率建词表
+        df = {}
+        for tokens in docs:
+            for token in set(tokens):
+                df[token] = df.get(token, 0) + 1
+        kept = sorted((t for t, c in df.items() if c >= min_df), key=lambda t: (-df[t], t))
+        vocab = {token: i for i, token in enumerate(kept[:max_features])}
+        counts = np.array([df[t] for t in vocab], dtype=np.float64)
+        idf = np.log((1 + len(docs)) / (1 + counts)) + 1
+
+        rows, cols, data = self._tfidf(vocab, idf, docs)
+        n, d = len(docs), len(vocab)
+
+        # 类别加权，避免样本不均衡时偏向多数类
+        pos = labels.sum()
+        sample_weight = np.where(labels == 1, n / (2 * pos), n / (2 * (n - pos)))
+
+        weights = np.zeros(d)
+        bias = 0.0
+        for _ in range(epochs):
+            z = np.bincount(rows, weights=data * weights[cols], minlength=n) + bias
+            p = 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+            g = (p - labels) * sample_weight / n
+            weights -= lr * (np.bincount(cols, weights=data * g[rows], minlength=d) + l2 * weights)
+            bias -= lr * g.sum()
+        return vocab, idf, weights, bias
+
+    @staticmethod
+    def _tfidf(vocab, idf, docs):
+        """稀疏TF-IDF矩阵（COO三元组），每行L2归一化"""
+        rows, cols, data = [], [], []
+        for i, tokens in enumerate(docs):
+            tf = {}
+            for token in tokens:
+                j = vocab.get(token)
+                if j is not None:
+                    tf[j] = tf.get(j, 0) + 1
+            if not tf:
+                continue
+            idx = np.fromiter(tf.keys(), dtype=np.int64, count=len(tf))
+            values = (1 + np.log(np.fromiter(tf.values(), dtype=np.float64, count=len(tf)))) * idf[idx]
+            values /= np.sqrt((values * values).sum())
+            rows.append(np.full(len(tf), i, dtype=np.int64))
+            cols.append(idx)
+            data.append(values)
+        if not rows:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(data)
+
+    def _predict_batch(self, model, docs):
+        vocab, idf, weights, bias = model
+        rows, cols, data = self._tfidf(vocab, idf, docs)
+        z = np.bincount(rows, weights=data * weights[cols], minlength=len(docs)) + bias
+        return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+    # ---------- 预测 ----------
+
+    @property
+    def active(self) -> bool:
+        return (self.enabled and self._model is not None
+                and (self.holdout_precision or 0) >= MIN_HOLDOUT_PRECISION)
+
+    def predict_not_resume(self, subject: str, resume_text: str, attach_filenames: list,
+                           from_domain: str) -> float:
+        """返回邮件为非简历的概率，模型不可用时返回 None"""
+        model = self._model
+        if model is None:
+            return None
+        tokens = tokenize_mail(subject, resume_text, attach_filenames, from_domain)
+        return float(self._predict_batch(model, [tokens])[0])
+
+    def should_skip(self, subject: str, resume_text: str, attach_filenames: list, from_domain: str):
+        """
+        判断是否可以跳过LLM直接标记为非简历
+
+        Returns:
+            tuple: (是否跳过, 非简历概率)
+        """
+        if not self.active:
+            return False, None
+        prob = self.predict_not_resume(subject, resume_text, attach_filenames, from_domain)
+        skip = prob is not None and prob >= self.threshold
+        with self._stats_lock:
+            self.checked += 1
+            if skip:
+                self.skipped += 1
+        return skip, prob
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            checked, skipped = self.checked, self.skipped
+        return {
+            "checked": checked,
+            "skipped": skipped,
+            "skip_rate": skipped / checked if checked else 0.0,
+        }
@@ -0,0 +1,79 @@
+# mail_precheck.py
+"""
+邮件本地预检模块
+
+在调用LLM之前用廉价的规则排除明显不是简历的邮件（自动回复、退信、系统通知等），
+只拒绝“明显”的情况：来自招聘渠道、带文档附件或含有简历特征词的邮件一律放行。
+"""
+
+import re
+
+# 简历特征词：命中任意一个即放行
+_RESUME_SIGNAL_RE = re.compile(
+    r"简历|应聘|求职|投递|候选人|教育背景|教育经历|工作经历|工作经验|项目经历|实习|本科|硕士|博士|毕业"
+    r"|resume|curriculum vitae|\bCV\b|education|experience",
+    re.IGNORECASE,
+)
+
+# 通知/自动回复类邮件的主题特征
+_NOTIFICATION_SUBJECT_RE = re.compile(
+    r"自动回复|auto[- ]?reply|automatic reply|out of office|退信|undeliver|delivery status|系统通知"
+    r"|验证码|verification code|订阅|newsletter|unsubscribe|发票|账单|invoice|会议邀请|invitation:",
+    re.IGNORECASE,
+)
+
+# 可能是简历的附件类型
+RESUME_ATTACHMENT_EXTS = ('.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png')
+
+# 附件名中的简历特征
+_RESUME_FILENAME_RE = re.compile(r"简历|履历|resume|\bcv\b|curriculum", re.IGNORECASE)
+
+# 无附件时正文少于该长度视为非简历
+MIN_RESUME_TEXT_LENGTH = 100
+
+
+def precheck_mail(subject: str, resume_text: str, attach_filenames: list, from_domain: str,
+                  resume_channels: dict = None):
+    """
+    本地预检邮件是否可能为简历
+
+    Args:
+        subject: 邮件主题
+        resume_text: 邮件正文文本
+        attach_filenames: 附件文件名列表
+        from_domain: 发件人域名
+        resume_channels: 招聘渠道配置（域名->渠道名）
+
+    Returns:
+        tuple: (是否可能为简历, 判定原因)
+    """
+    subject = subject or ""
+    resume_text = resume_text or ""
+    attach_filenames = attach_filenames or []
+    from_domain = (from_domain or "").lower()
+
+    if from_domain and any(from_domain.endswith(domain.lower()) for domain in (resume_channels or {})):
+        return True, "招聘渠道来信"
+
+    if any(name.lower().endswith(RESUME_ATTACHMENT_EXTS) for name in attach_filenames):
+        return True, "含文档附件"
+
+    if _RESUME_SIGNAL_RE.search(subject) or _RESUME_SIGNAL_RE.search(resume_text[:5000]):
+        return True, "含简历特征词"
+
+    if _NOTIFICATION_SUBJECT_RE.search(subject):
+        return False, "通知或自动回复类邮件"
+
+    if len(resume_text.strip()) < MIN_RESUME_TEXT_LENGTH:
+        return False, "正文过短且无附件"
+
+    return True, "无法排除"
+
+
+def likely_resume(attach_filenames: list, from_domain: str, resume_channels: dict = None) -> bool:
+    """本地信号表明邮件很可能是简历：招聘渠道来信，或带有文件名像简历的文档附件"""
+    from_domain = (from_domain or "").lower()
+    if from_domain and any(from_domain.endswith(domain.lower()) for domain in (resume_channels or {})):
+        return True
+    return any(name.lower().endswith(RESUME_ATTACHMENT_EXTS) and _RESUME_FILENAME_RE.search(name)
+               for name in attach_filenames or [])
@@ -0,0 +1,218 @@
+# near_duplicate.py
+"""
+近似重复简历检测模块
+
+resume_hash 是清洗后文本的MD5，换一个电话号码、更新日期或换一种PDF解析方式都会得到“新”简历并重新评估。
+开启 NEAR_DUP_DETECTION 后：
+1. 简历文本去掉空白、转小写后取字符5-gram，计算 NEAR_DUP_NUM_PERM 维的MinHash签名
+2. 签名按LSH分段(band)建立倒排表，只有至少一段完全相同的简历才会成为候选，再用签名估计Jaccard相似度
+3. 同一岗位下相似度不低于 NEAR_DUP_THRESHOLD 的已评估简历，新邮件直接关联到该候选人，不再调用LLM评估
+4. 签名保存在 resume_signatures 表，启动时加载，每轮补齐其他进程写入的记录
+"""
+
+import re
+import zlib
+import base64
+import logging
+import threading
+import numpy as np
+from db_manager import Candidate, ResumeSignature
+
+SHINGLE_SIZE = 5
+# 哈希函数 (a*x+b) mod p 使用的素数(< 2^32)，a < 2^31 保证乘积不溢出uint64
+HASH_PRIME = np.uint64(4294967291)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def shingles(text: str) -> np.ndarray:
+    """文本的字符5-gram哈希集合"""
+    text = _WHITESPACE_RE.sub("", text or "").lower()
+    if len(text) < SHINGLE_SIZE:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = {zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) % HASH_PRIME
+
+
+def choose_bands(num_perm: int, threshold: float, recall: float = 0.99):
+    """
+    选择LSH分段参数：在相似度为 threshold 的简历被召回概率不低于 recall 的前提下，每段行数尽量多（候选更少）
+
+    Returns:
+        tuple: (段数, 每段行数)
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    def __init__(self, config):
+        self.threshold = config.NEAR_DUP_THRESHOLD
+        self.num_perm = config.NEAR_DUP_NUM_PERM
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, 2 ** 31, size=(self.num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, size=(self.num_perm, 1), dtype=np.uint64)
+        self.bands, self.rows = choose_bands(self.num_perm, self.threshold)
+        self._lock = threading.Lock()
+        self.signatures = {}                                # candidate_id -> (岗位, 签名)
+        self.buckets = [{} for _ in range(self.bands)]      # 每段: 段内容 -> {candidate_id}
+        self.watermark = 0                                  # 已加载的 resume_signatures 最大ID
+        self.loaded = False
+        self.linked = 0
+        self.checked = 0
+
+    # ---------- 签名 ----------
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash签名，文本过短时返回None"""
+        hashes = shingles(text)
+        if not len(hashes):
+            return None
+        return ((self._a * hashes + self._b) % HASH_PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """由签名估计的Jaccard相似度"""
+        return float(np.mean(sig_a == sig_b))
+
+    # ---------- 索引 ----------
+
+    def add(self, candidate_id: int, position: str, signature: np.ndarray):
+        with self._lock:
+            self._remove(candidate_id)
+            self.signatures[candidate_id] = (position or "", signature)
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                bucket.setdefault(key, set()).add(candidate_id)
+
+    def remove(self, candidate_id: int):
+        with self._lock:
+            self._remove(candidate_id)
+
+    def _remove(self, candidate_id: int):
+        entry = self.signatures.pop(candidate_id, None)
+        if entry is None:
+            return
+        for bucket, key in zip(self.buckets, self._band_keys(entry[1])):
+            ids = bucket.get(key)
+            if ids:
+                ids.discard(candidate_id)
+                if not ids:
+                    del bucket[key]
+
+    def query(self, signature: np.ndarray, position: str = None) -> list:
+        """
+        查找近似重复的候选人
+
+        Args:
+            signature: MinHash签名
+            position: 岗位名称，为None时不限岗位
+
+        Returns:
+            list: [(候选人ID, 相似度), ...]，相似度不低于阈值，按相似度降序
+        """
+        if signature is None:
+            return []
+        with self._lock:
+            found = set()
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                found.update(bucket.get(key, ()))
+            matches = []
+            for candidate_id in found:
+                candidate_position, candidate_signature = self.signatures[candidate_id]
+                if position is not None and candidate_position != position:
+                    continue
+                score = self.similarity(signature, candidate_signature)
+                if score >= self.threshold:
+                    matches.append((candidate_id, score))
+        return sorted(matches, key=lambda m: -m[1])
+
+    def __len__(self):
+        return len(self.signatures)
+
+    # ---------- 数据库 ----------
+
+    def find_duplicate(self, session, signature: np.ndarray, position: str):
+        """
+        同一岗位下最相似且仍然存在的已评估候选人
+
+        Returns:
+            tuple: (候选人ID, 相似度)，没有时为 (None, 0.0)
+        """
+        with self._lock:
+            self.checked += 1
+        for candidate_id, score in self.query(signature, position):
+            if session.query(Candidate.id).filter(Candidate.id == candidate_id).first():
+                with self._lock:
+                    self.linked += 1
+                return candidate_id, score
+            # 候选人已被删除（重复简历覆盖等）
+            self.remove(candidate_id)
+        return None, 0.0
+
+    def store(self, session, candidate_id: int, position: str, signature: np.ndarray):
+        """保存签名到 resume_signatures 表并加入索引"""
+        if signature is None:
+            return
+        row = ResumeSignature(candidate_id=candidate_id, position=position or "",
+                              signature=base64.b64encode(signature.tobytes()).decode("ascii"))
+        session.add(row)
+        session.commit()
+        self.add(candidate_id, position, signature)
+
+    def sync(self, session, batch_size: int = 5000) -> int:
+        """
+        加载 resume_signatures 表中 watermark 之后的记录，首次调用时加载全部
+
+        Returns:
+            int: 新加入的条数
+        """
+        if not self.loaded:
+            ResumeSignature.__table__.create(bind=session.get_bind(), checkfirst=True)
+            self.loaded = True
+        added = 0
+        while True:
+            rows = session.query(ResumeSignature.id, ResumeSignature.candidate_id, ResumeSignature.position,
+                                 ResumeSignature.signature).filter(
+                ResumeSignature.id > self.watermark
+            ).order_by(ResumeSignature.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row_id, candidate_id, position, encoded in rows:
+                self.watermark = max(self.watermark, row_id)
+                try:
+                    signature = np.frombuffer(base64.b64decode(encoded), dtype=np.uint32)
+                except (TypeError, ValueError):
+                    continue
+                if len(signature) != self.num_perm:
+                    continue
+                self.add(candidate_id, position, signature)
+                added += 1
+        if added:
+            logging.info(f"[NearDuplicate] 加载 {added} 条简历签名, 当前 {len(self)} 条")
+        return added
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"checked": self.checked, "linked": self.linked,
+                    "link_rate": self.linked / self.checked if self.checked else 0.0}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index(config) -> NearDuplicateIndex:
+    """进程内共享的近似重复索引"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(config)
+        return _index
@@ -0,0 +1,122 @@
+# position_matcher.py
+"""
+岗位向量匹配模块
+
+岗位匹配原先完全交给 identify_mail_type 的LLM调用。开启 USE_EMBEDDING 后：
+1. 各岗位的名称、别称、职责和任职要求在首次使用时生成embedding，归一化后组成 NumPy 矩阵
+2. 简历embedding与矩阵做一次矩阵乘法得到余弦相似度，返回排序后的 top-k 岗位
+3. 第一名的相似度不低于 POSITION_MATCH_MIN_SCORE 且领先第二名至少 POSITION_MATCH_MARGIN 时
+   直接采用第一名，否则仍由LLM判断（prompt中附上候选岗位供参考）
+4. 向量匹配只能说明邮件内容与岗位相近，不能说明邮件是简历（职位推送、转发的岗位描述同样相近），
+   因此只有本地信号已表明邮件很可能是简历时才允许直接采用，是否为简历仍由LLM判断
+"""
+
+import logging
+import threading
+import numpy as np
+
+# 岗位描述中参与embedding的字段
+JOB_TEXT_FIELDS = [("alias", "岗位别称"), ("duties", "工作职责"), ("requirements", "任职要求")]
+
+
+def job_text(position_name: str, detail: dict) -> str:
+    """岗位的embedding文本"""
+    lines = [f"岗位名称: {position_name}"]
+    for key, label in JOB_TEXT_FIELDS:
+        value = detail.get(key)
+        # pandas读取的空单元格为NaN
+        if value is None or value != value or not str(value).strip():
+            continue
+        lines.append(f"{label}: {value}")
+    return "\n".join(lines)
+
+
+class PositionMatcher:
+    def __init__(self, config, job_info: dict, embed_func):
+        """
+        Args:
+            config: 配置对象，读取 POSITION_MATCH_TOP_K、POSITION_MATCH_MIN_SCORE、POSITION_MATCH_MARGIN
+            job_info: 岗位信息
+            embed_func: 文本 -> embedding 列表的函数，失败时返回空列表
+        """
+        self.job_info = job_info
+        self.embed_func = embed_func
+        self.top_k = config.POSITION_MATCH_TOP_K
+        self.min_score = config.POSITION_MATCH_MIN_SCORE
+        self.margin = config.POSITION_MATCH_MARGIN
+        self.positions = []
+        self.matrix = None
+        self._lock = threading.Lock()
+        self.matched = 0
+        self.deferred = 0
+
+    def build(self) -> bool:
+        """生成岗位embedding矩阵，只执行一次；任一岗位生成失败时不启用向量匹配"""
+        if self.matrix is not None:
+            return True
+        with self._lock:
+            if self.matrix is not None:
+                return True
+            positions, vectors = [], []
+            for position_name, detail in self.job_info.items():
+                vector = self.embed_func(job_text(position_name, detail))
+                if not vector:
+                    logging.warning(f"[PositionMatcher] 岗位 {position_name} 生成embedding失败，暂不启用向量匹配")
+                    return False
+                positions.append(position_name)
+                vectors.append(vector)
+            if not vectors:
+                return False
+            matrix = np.asarray(vectors, dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            self.positions = positions
+            self.matrix = matrix
+            logging.info(f"[PositionMatcher] 岗位向量矩阵: {matrix.shape[0]} 个岗位, {matrix.shape[1]} 维")
+            return True
+
+    def rank(self, resume_text: str) -> list:
+        """
+        按余弦相似度排序岗位
+
+        Returns:
+            list: [(岗位名称, 相似度), ...]，最多 top_k 个，失败时为空列表
+        """
+        if not resume_text.strip() or not self.build():
+            return []
+        vector = self.embed_func(resume_text)
+        if not vector or len(vector) != self.matrix.shape[1]:
+            return []
+        vector = np.asarray(vector, dtype=np.float32)
+        scores = self.matrix @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+        k = min(self.top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.positions[i], float(scores[i])) for i in top]
+
+    def match(self, resume_text: str, allow_direct: bool = True):
+        """
+        向量匹配岗位
+
+        Args:
+            resume_text: 简历文本
+            allow_direct: 是否允许直接采用第一名；为False时只返回排序结果，由LLM判断
+
+        Returns:
+            tuple: (岗位名称, 排序后的候选岗位)，把握不足时岗位名称为空字符串，由LLM判断
+        """
+        ranked = self.rank(resume_text)
+        if not ranked:
+            return "", ranked
+        best_score = ranked[0][1]
+        second_score = ranked[1][1] if len(ranked) > 1 else -1.0
+        with self._lock:
+            if allow_direct and best_score >= self.min_score and best_score - second_score >= self.margin:
+                self.matched += 1
+                return ranked[0][0], ranked
+            self.deferred += 1
+        return "", ranked
+
+    def stats(self) -> dict:
+        total = self.matched + self.deferred
+        return {"matched": self.matched, "deferred": self.deferred,
+                "match_rate": self.matched / total if total else 0.0}
@@ -0,0 +1,196 @@
+# rate_limiter.py
+"""
+LLM请求限流模块
+
+同时按每分钟请求数(RPM)和每分钟token数(TPM)限流的令牌桶：
+1. 进程内所有线程/协程共用一个桶，不再各自退避
+2. 配置 LLM_RATE_LIMIT_FILE 时桶状态保存在文件中并用文件锁保护，同一台机器上的多个进程共享额度
+3. 收到429或服务端返回的 x-ratelimit-* 头时，所有调用方一起暂停到服务端给出的恢复时间
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows下不支持跨进程共享
+    fcntl = None
+
+
+def parse_reset_seconds(value) -> float:
+    """解析 retry-after / x-ratelimit-reset-* 头，支持 "20"、"1.5s"、"6m0s"、"120ms" 等格式"""
+    if value is None:
+        return 0.0
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, number = 0.0, ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        i += 1
+    return total
+
+
+class RateLimiter:
+    def __init__(self, rpm: int, tpm: int, state_file: str = ""):
+        """
+        Args:
+            rpm: 每分钟请求数上限，0 表示不限制
+            tpm: 每分钟token数上限，0 表示不限制
+            state_file: 跨进程共享状态的文件路径，为空时只在进程内共享
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.state_file = state_file if (state_file and fcntl is not None) else ""
+        self._lock = threading.Lock()
+        now = time.time()
+        self._state = {"requests": float(rpm), "tokens": float(tpm), "updated": now, "blocked_until": 0.0}
+
+    # ---------- 状态读写 ----------
+
+    @contextmanager
+    def _locked_state(self):
+        """加锁并返回可修改的状态，退出时写回"""
+        with self._lock:
+            if not self.state_file:
+                yield self._state
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            with open(self.state_file, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    content = f.read()
+                    state = dict(self._state)
+                    if content:
+                        try:
+                            state.update(json.loads(content))
+                        except ValueError:
+                            logging.warning("[RateLimiter] 共享状态文件损坏，已重置")
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state, now):
+        elapsed = max(now - state["updated"], 0)
+        if self.rpm:
+            state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+        if self.tpm:
+            state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    # ---------- 获取额度 ----------
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        尝试获取一次请求和 tokens 个token的额度
+
+        Returns:
+            float: 0 表示获取成功，否则为需要等待的秒数
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+            # 单次请求超过TPM上限时按上限计算，避免永远拿不到额度
+            tokens = min(tokens, self.tpm) if self.tpm else tokens
+            wait = 0.0
+            if self.rpm and state["requests"] < 1:
+                wait = max(wait, (1 - state["requests"]) * 60 / self.rpm)
+            if self.tpm and state["tokens"] < tokens:
+                wait = max(wait, (tokens - state["tokens"]) * 60 / self.tpm)
+            if wait > 0:
+                return wait
+            if self.rpm:
+                state["requests"] -= 1
+            if self.tpm:
+                state["tokens"] -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int):
+        """阻塞直到获取到额度"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 5))
+
+    async def acquire_async(self, tokens: int):
+        """协程版本的 acquire"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(min(wait, 5))
+
+    # ---------- 服务端反馈 ----------
+
+    def adjust_tokens(self, estimated: int, actual: int):
+        """按响应中的实际用量修正预扣的token"""
+        if not self.tpm or actual is None:
+            return
+        with self._locked_state() as state:
+            state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+
+    def block_for(self, seconds: float):
+        """所有调用方暂停 seconds 秒（429时使用）"""
+        if seconds <= 0:
+            return
+        until = time.time() + seconds
+        with self._locked_state() as state:
+            if until > state["blocked_until"]:
+                state["blocked_until"] = until
+                logging.warning(f"[RateLimiter] 触发限流，所有请求暂停 {seconds:.1f} 秒")
+
+    def update_from_headers(self, headers):
+        """根据 x-ratelimit-* 响应头同步剩余额度"""
+        if not headers:
+            return
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests is None and remaining_tokens is None:
+            return
+        with self._locked_state() as state:
+            try:
+                if self.rpm and remaining_requests is not None:
+                    state["requests"] = min(state["requests"], float(remaining_requests))
+                if self.tpm and remaining_tokens is not None:
+                    state["tokens"] = min(state["tokens"], float(remaining_tokens))
+            except ValueError:
+                pass
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config) -> RateLimiter:
+    """进程内共享的限流器"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(config.LLM_RPM_LIMIT, config.LLM_TPM_LIMIT,
+                                        config.LLM_RATE_LIMIT_FILE)
+        return _rate_limiter
@@ -4,6 +4,20 @@ import logging
 from resume_parser import md5_hash, compact_resume_text
 from db_manager import Candidate, beijing_now
 
+# 总分达到该值的候选人标记为合格
+QUALIFIED_SCORE = 60
+
+def compute_total_score(analysis: dict) -> int:
+    """各项评分之和"""
+    return sum([
+        analysis.get('education_score', 0),
+        analysis.get('technical_score', 0),
+        analysis.get('innovation_score', 0),
+        analysis.get('growth_score', 0),
+        analysis.get('startup_score', 0),
+        analysis.get('teamwork_score', 0)
+    ])
+
 class RecruitService:
     def __init__(self, config, session=None):
         """初始化招聘服务"""
@@ -19,17 +33,10 @@ class RecruitService:
         """存储候选人信息"""
         try:
             # 计算总分
-            total_score = sum([
-                analysis.get('education_score', 0),
-                analysis.get('technical_score', 0),
-                analysis.get('innovation_score', 0),
-                analysis.get('growth_score', 0),
-                analysis.get('startup_score', 0),
-                analysis.get('teamwork_score', 0)
-            ])
+            total_score = compute_total_score(analysis)
             
             # 设置是否合格(总分大于60分为合格)
-            is_qualified = 1 if total_score >= 60 else 0
+            is_qualified = 1 if total_score >= QUALIFIED_SCORE else 0
             
             # Convert boolean values to integers for MySQL compatibility
             focus_flag = int(analysis.get('focus_flag', False))
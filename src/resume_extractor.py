@@ -0,0 +1,241 @@
+# resume_extractor.py
+"""
+简历字段规则提取模块
+
+用预编译正则和高校名录在本地提取确定性字段，减少LLM需要输出的内容：
+1. 联系方式：手机号、邮箱、微信号
+2. 个人信息：年龄、性别、婚姻状况
+3. 教育信息：第一学历/院校、最高学历/院校（基于985/211/QS名录识别院校）
+"""
+
+import re
+from datetime import datetime
+
+# 本地可提取的 parsed_info 字段
+LOCAL_FIELDS = (
+    "phone", "email", "wechat", "age", "gender", "marital_status",
+    "first_education", "first_university", "highest_education", "highest_university",
+)
+
+UNIVERSITIES_985 = [
+    "清华大学", "北京大学", "中国人民大学", "北京航空航天大学", "北京理工大学", "中国农业大学",
+    "北京师范大学", "中央民族大学", "南开大学", "天津大学", "大连理工大学", "东北大学", "吉林大学",
+    "哈尔滨工业大学", "复旦大学", "同济大学", "上海交通大学", "华东师范大学", "南京大学", "东南大学",
+    "浙江大学", "中国科学技术大学", "厦门大学", "山东大学", "中国海洋大学", "武汉大学", "华中科技大学",
+    "湖南大学", "中南大学", "中山大学", "华南理工大学", "四川大学", "电子科技大学", "重庆大学",
+    "西安交通大学", "西北工业大学", "西北农林科技大学", "兰州大学", "国防科技大学",
+]
+
+UNIVERSITIES_211 = [
+    "北京交通大学", "北京工业大学", "北京科技大学", "北京化工大学", "北京邮电大学", "北京林业大学",
+    "北京中医药大学", "北京外国语大学", "中国传媒大学", "中央财经大学", "对外经济贸易大学",
+    "北京体育大学", "中央音乐学院", "中国政法大学", "华北电力大学", "中国矿业大学", "中国石油大学",
+    "中国地质大学", "天津医科大学", "河北工业大学", "太原理工大学", "内蒙古大学", "辽宁大学",
+    "大连海事大学", "延边大学", "东北师范大学", "哈尔滨工程大学", "东北农业大学", "东北林业大学",
+    "华东理工大学", "东华大学", "上海外国语大学", "上海财经大学", "上海大学", "海军军医大学",
+    "苏州大学", "南京航空航天大学", "南京理工大学", "河海大学", "江南大学", "南京农业大学",
+    "中国药科大学", "南京师范大学", "安徽大学", "合肥工业大学", "福州大学", "南昌大学", "郑州大学",
+    "武汉理工大学", "华中农业大学", "华中师范大学", "中南财经政法大学", "湖南师范大学", "暨南大学",
+    "华南师范大学", "广西大学", "海南大学", "西南交通大学", "西南财经大学", "四川农业大学", "西南大学",
+    "贵州大学", "云南大学", "西藏大学", "西北大学", "西安电子科技大学", "长安大学", "陕西师范大学",
+    "空军军医大学", "青海大学", "宁夏大学", "新疆大学", "石河子大学",
+]
+
+# QS世界大学排名前30（不含已在985名录中的清华、北大）
+UNIVERSITIES_QS_TOP30 = [
+    "麻省理工学院", "帝国理工学院", "牛津大学", "哈佛大学", "剑桥大学", "斯坦福大学",
+    "苏黎世联邦理工学院", "新加坡国立大学", "伦敦大学学院", "加州理工学院", "宾夕法尼亚大学",
+    "加州大学伯克利分校", "墨尔本大学", "南洋理工大学", "康奈尔大学", "香港大学", "悉尼大学",
+    "新南威尔士大学", "芝加哥大学", "普林斯顿大学", "耶鲁大学", "多伦多大学", "洛桑联邦理工学院",
+    "爱丁堡大学", "慕尼黑工业大学", "麦吉尔大学", "澳大利亚国立大学",
+    "Massachusetts Institute of Technology", "Imperial College London", "University of Oxford",
+    "Harvard University", "University of Cambridge", "Stanford University", "ETH Zurich",
+    "National University of Singapore", "University College London",
+    "California Institute of Technology", "University of Pennsylvania",
+    "University of California, Berkeley", "UC Berkeley", "University of Melbourne",
+    "Nanyang Technological University", "Cornell University", "University of Hong Kong",
+    "University of Sydney", "University of New South Wales", "University of Chicago",
+    "Princeton University", "Yale University", "University of Toronto", "EPFL",
+    "University of Edinburgh", "Technical University of Munich", "McGill University",
+    "Australian National University",
+]
+
+# QS世界大学排名30-50
+UNIVERSITIES_QS_TOP50 = [
+    "哥伦比亚大学", "约翰霍普金斯大学", "东京大学", "加州大学洛杉矶分校", "密歇根大学", "香港中文大学",
+    "伦敦国王学院", "伦敦政治经济学院", "卡内基梅隆大学", "首尔大学", "杜克大学", "纽约大学",
+    "香港科技大学", "英属哥伦比亚大学", "京都大学", "曼彻斯特大学", "昆士兰大学", "莫纳什大学",
+    "Columbia University", "Johns Hopkins University", "University of Tokyo",
+    "University of California, Los Angeles", "UCLA", "University of Michigan",
+    "Chinese University of Hong Kong", "King's College London", "London School of Economics",
+    "Carnegie Mellon University", "Seoul National University", "Duke University",
+    "New York University", "Hong Kong University of Science and Technology",
+    "University of British Columbia", "Kyoto University", "University of Manchester",
+    "University of Queensland", "Monash University",
+]
+
+# 常见简称/英文名 -> 标准名称
+UNIVERSITY_ALIASES = {
+    "北航": "北京航空航天大学", "北理工": "北京理工大学", "哈工大": "哈尔滨工业大学",
+    "上海交大": "上海交通大学", "西安交大": "西安交通大学", "中科大": "中国科学技术大学",
+    "华中科大": "华中科技大学", "北邮": "北京邮电大学", "西电": "西安电子科技大学",
+    "Tsinghua University": "清华大学", "Peking University": "北京大学",
+    "Fudan University": "复旦大学", "Zhejiang University": "浙江大学",
+    "Shanghai Jiao Tong University": "上海交通大学", "Nanjing University": "南京大学",
+    "University of Science and Technology of China": "中国科学技术大学",
+    "Harbin Institute of Technology": "哈尔滨工业大学", "Wuhan University": "武汉大学",
+    "Sun Yat-sen University": "中山大学",
+}
+
+# 名录内的院校
+KNOWN_UNIVERSITIES = set(UNIVERSITIES_985 + UNIVERSITIES_211 + UNIVERSITIES_QS_TOP30 + UNIVERSITIES_QS_TOP50)
+
+# 学历等级
+DEGREE_LABELS = {4: "博士", 3: "硕士", 2: "本科", 1: "大专"}
+_DEGREE_RANKS = {
+    "博士": 4, "Ph.D": 4, "PhD": 4, "Doctor": 4,
+    "硕士": 3, "研究生": 3, "MBA": 3, "Master": 3,
+    "本科": 2, "学士": 2, "Bachelor": 2,
+    "大专": 1, "专科": 1,
+}
+
+# 独立学院（如“南京大学金陵学院”）不按母体高校计算
+_INDEPENDENT_COLLEGE = r"(?!金陵学院|城市学院|锦城学院|锦江学院|珠海学院|成都学院|科技学院|文华学院|滨海学院|独立学院)"
+
+_UNIVERSITY_RE = re.compile(
+    "(" + "|".join(re.escape(n) for n in sorted(
+        KNOWN_UNIVERSITIES | set(UNIVERSITY_ALIASES), key=len, reverse=True
+    )) + ")" + _INDEPENDENT_COLLEGE
+)
+# 任意院校/科研机构提及（排除“大学英语”“大学生”“College English”等非院校用法），用于判断是否有名录外的院校
+_ANY_UNIVERSITY_RE = re.compile(
+    r"大学(?!英语|生|物理|数学|语文)|学院|研究所|研究院|科学院|中科院"
+    r"|\bUniversity\b|\bInstitute\b|\bCollege\b(?!\s+English)|\bAcademy\b"
+)
+# 名录内院校名称后紧跟的院系（如“北京大学信息科学技术学院”）不算名录外的院校
+_FACULTY_SUFFIX_RE = re.compile(r"[^\s,，、/|;；()（）]{0,20}")
+# 英文学历加单词边界，避免“Mastering”“Doctoral”被识别为学历
+_DEGREE_RE = re.compile("|".join(
+    rf"\b{re.escape(d)}\b" if d.isascii() else re.escape(d)
+    for d in sorted(_DEGREE_RANKS, key=len, reverse=True)
+))
+
+_PHONE_RE = re.compile(r"(?<!\d)(?:\+?86[\s-]?)?(1[3-9]\d)[\s-]?(\d{4})[\s-]?(\d{4})(?!\d)")
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_WECHAT_RE = re.compile(
+    r"(?:微信|WeChat|Wechat|wechat|weixin|VX|vx)\s*(?:号|ID|id)?\s*[:：]?\s*([A-Za-z][-_A-Za-z0-9]{5,19}|1[3-9]\d{9})"
+)
+_AGE_RE = re.compile(r"(?:年龄\s*[:：]?\s*(\d{2})|(?<!\d)(\d{2})\s*岁)")
+_BIRTH_RE = re.compile(
+    r"(?:出生(?:年月|日期)?\s*[:：]?\s*((?:19|20)\d{2}))"
+    r"|(?:(?<!\d)((?:19|20)\d{2})\s*(?:年|[-./])\s*(?:\d{1,2}\s*(?:月|[-./])?\s*)?(?:\d{1,2}\s*日?\s*)?出生)"
+)
+_GENDER_RE = re.compile(r"性别\s*[:：]?\s*(男|女)|(?:^|[\s|/,，])(男|女)(?=[\s|/,，]|$)|\b(Male|Female)\b")
+_MARITAL_RE = re.compile(r"(已婚|未婚|离异)")
+
+
+def _is_faculty(text: str, match, mention) -> bool:
+    """名录内院校名称后直接相连的“…学院/研究院/研究所”是该校的院系"""
+    if mention.group(0) not in ("学院", "研究院", "研究所") or mention.start() < match.end():
+        return False
+    suffix = _FACULTY_SUFFIX_RE.match(text, match.end())
+    return suffix.end() >= mention.start()
+
+
+def _extract_education(text: str) -> dict:
+    """
+    识别院校并就近匹配学历，推断第一学历和最高学历
+
+    院校前后40个字符内距离最近的学历关键词视为该段教育经历的学历。
+    简历中出现名录外的院校（含学院、研究所、中科院及英文 Institute/College 等）时
+    无法可靠判断第一/最高学历，全部教育字段交由LLM处理。
+    """
+    matches = list(_UNIVERSITY_RE.finditer(text))
+    for mention in _ANY_UNIVERSITY_RE.finditer(text):
+        if not any(m.start() <= mention.start() < m.end() or _is_faculty(text, m, mention) for m in matches):
+            return {}
+
+    degrees = [(m.start(), _DEGREE_RANKS[m.group(0)]) for m in _DEGREE_RE.finditer(text)]
+    entries = []
+    for match in matches:
+        name = UNIVERSITY_ALIASES.get(match.group(1), match.group(1))
+        rank = 0
+        best_distance = 41
+        for pos, degree_rank in degrees:
+            distance = pos - match.end() if pos >= match.end() else match.start() - pos
+            if distance < best_distance:
+                best_distance, rank = distance, degree_rank
+        entries.append((rank, name))
+
+    if not entries:
+        return {}
+
+    ranked = [e for e in entries if e[0]]
+    if ranked:
+        first = min(ranked, key=lambda e: e[0])
+        highest = max(ranked, key=lambda e: e[0])
+    else:
+        # 无法匹配学历时，只有一所院校才能确定
+        if len({name for _, name in entries}) > 1:
+            return {}
+        first = highest = entries[0]
+
+    info = {"first_university": first[1], "highest_university": highest[1]}
+    if first[0]:
+        info["first_education"] = DEGREE_LABELS[first[0]]
+    if highest[0]:
+        info["highest_education"] = DEGREE_LABELS[highest[0]]
+    return info
+
+
+def extract_resume_fields(text: str) -> dict:
+    """
+    从简历文本中规则提取确定性字段
+
+    Args:
+        text: 简历文本
+
+    Returns:
+        dict: 成功提取的 parsed_info 字段（未识别的字段不包含在内）
+    """
+    if not text:
+        return {}
+
+    info = {}
+
+    match = _PHONE_RE.search(text)
+    if match:
+        info["phone"] = "".join(match.groups())
+
+    match = _EMAIL_RE.search(text)
+    if match:
+        info["email"] = match.group(0)
+
+    match = _WECHAT_RE.search(text)
+    if match:
+        info["wechat"] = match.group(1)
+
+    match = _AGE_RE.search(text)
+    if match:
+        age = int(match.group(1) or match.group(2))
+        if 16 <= age <= 70:
+            info["age"] = age
+    if "age" not in info:
+        match = _BIRTH_RE.search(text)
+        if match:
+            age = datetime.now().year - int(match.group(1) or match.group(2))
+            if 16 <= age <= 70:
+                info["age"] = age
+
+    # 性别只在开头的基本信息区域中查找单独的“男/女”，避免误匹配正文
+    match = _GENDER_RE.search(text[:300])
+    if match:
+        gender = match.group(1) or match.group(2) or match.group(3)
+        info["gender"] = {"Male": "男", "Female": "女"}.get(gender, gender)
+
+    match = _MARITAL_RE.search(text)
+    if match:
+        info["marital_status"] = match.group(1)
+
+    info.update(_extract_education(text))
+    return info
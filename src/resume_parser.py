@@ -21,10 +21,11 @@ import pytesseract
 from PIL import Image
 import docx
 from io import BytesIO
+from utils.text_normalizer import normalize_lines, normalize_text
 
 def compact_resume_text(text: str) -> str:
-    # Simple trimming implementation
-    return " ".join(text.split())
+    # 所有空白折叠为单个空格
+    return normalize_text(text, keep_lines=False, strip_control=False)
 
 def md5_hash(text: str) -> str:
     return hashlib.md5(text.encode("utf-8")).hexdigest()
@@ -131,16 +132,8 @@ def parse_pdf(file_data: bytes) -> str:
 
     # Process and clean the extracted text
     if text_parts:
-        # Join all parts and clean up
-        text = "\n".join(text_parts)
-        lines = [line.strip() for line in text.split("\n")]
-        clean_lines = []
-        prev_line = None
-        for line in lines:
-            if line and line != prev_line:  # Remove empty and duplicate lines
-                clean_lines.append(line)
-                prev_line = line
-        return "\n".join(clean_lines)
+        # Join all parts and clean up: remove empty and duplicate lines in one pass
+        return normalize_lines("\n".join(text_parts), strip_control=False)
     
     return ""  # Return empty string if no text was extracted
 
@@ -218,18 +211,8 @@ def parse_docx(file_data: bytes) -> str:
         
         os.unlink(temp_name)
         
-        # 合并所有文本并清理
-        text = "\n".join(text_parts)
-        # 删除重复行和多余空白
-        lines = text.split("\n")
-        clean_lines = []
-        prev_line = None
-        for line in lines:
-            line = line.strip()
-            if line and line != prev_line:
-                clean_lines.append(line)
-                prev_line = line
-        return "\n".join(clean_lines)
+        # 合并所有文本并清理：单遍删除重复行和多余空白
+        return normalize_lines("\n".join(text_parts), strip_control=False)
     except Exception as e:
         logging.error(f"DOCX解析失败: {e}")
         return ""
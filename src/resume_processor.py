@@ -115,7 +115,7 @@ def process_single_email(email_dict, session, config, ai_screener, service):
 
         # 简历分析
         try:
-            parsed, analysis = ai_screener.screen_resume(db_email.content_text, position)
+            parsed, analysis = ai_screener.screen_resume(db_email.content_text, position, channel)
             if not parsed or not analysis:
                 db_email.process_status = "FAILED"
                 db_email.error_message = "AI分析返回空结果"
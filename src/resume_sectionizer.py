@@ -0,0 +1,228 @@
+# resume_sectionizer.py
+"""
+简历结构化切分模块
+
+在调用LLM之前对简历文本做本地压缩：
+1. 按标题把简历切分为基本信息、教育背景、工作经历、项目经历、专业技能等区块
+2. 按渠道去除招聘平台的页眉页脚、提示语、版权声明等模板文字
+3. 去除重复出现的联系方式和重复区块
+4. 输出固定顺序的紧凑格式，并统计节省的token数
+"""
+
+import re
+import logging
+from utils.text_normalizer import normalize_text
+from token_budget import count_tokens
+
+# 区块输出顺序及标题
+SECTION_TITLES = {
+    "contact": "基本信息",
+    "education": "教育背景",
+    "experience": "工作经历",
+    "projects": "项目经历",
+    "skills": "专业技能",
+    "other": "其他",
+}
+
+# 区块标题关键词（英文只匹配原样和全大写形式，避免把正文中的普通单词误当作标题）
+SECTION_HEADINGS = {
+    "contact": ["基本信息", "个人信息", "个人资料", "联系方式", "求职意向", "Contact",
+                "Personal Information", "Basic Information"],
+    "education": ["教育背景", "教育经历", "学历背景", "教育信息", "Education", "Educational Background"],
+    "experience": ["工作经历", "工作经验", "实习经历", "实习经验", "职业经历", "工作履历",
+                   "Work Experience", "Professional Experience", "Internship Experience",
+                   "Employment History", "Experience"],
+    "projects": ["项目经历", "项目经验", "科研经历", "研究经历", "Projects", "Project Experience",
+                 "Research Experience"],
+    "skills": ["专业技能", "技能特长", "个人技能", "技术能力", "技术栈", "Skills", "Technical Skills"],
+    "other": ["自我评价", "个人评价", "自我介绍", "个人总结", "获奖经历", "获奖情况", "荣誉奖项",
+              "证书", "语言能力", "兴趣爱好", "论文发表", "Summary", "Awards", "Certificates",
+              "Languages", "Publications"],
+}
+
+# 所有渠道通用的模板文字
+COMMON_BOILERPLATE = [
+    r"(?:本邮件|此邮件|该邮件)[^。！!]{0,60}?(?:自动发送|自动发出|系统发送|发送)[^。！!]{0,40}[。！!]?",
+    r"请勿(?:直接)?回复(?:本|此)?邮件[^。！!]{0,40}[。！!]?",
+    # 退订提示和免责声明只去除以其开头的整行，不跨行，正文中的“退订”“免责”等不受影响
+    r"^(?:如(?:不希望|不想|需)[^\n]{0,30}?)?(?:点击)?退订[^\n]{0,40}$",
+    r"^免责声明[:：]?[^\n]{0,300}$",
+    r"(?:Copyright|©)\s*[^。]{0,80}?(?:All Rights Reserved\.?|版权所有)",
+    r"版权所有[^。]{0,40}",
+    # 只去除整行都是站点链接的页脚，正文中提到的“隐私政策”等不受影响
+    r"^[ |·丨/]*(?:隐私政策|用户协议|服务条款)(?:[ |·丨/、]*(?:隐私政策|用户协议|服务条款|帮助中心|联系我们|关于我们))*[ |·丨/]*$",
+    r"(?:点击|立即)?查看(?:完整|附件|在线)简历",
+]
+
+# 各渠道特有的模板文字，键为 RESUME_CHANNELS 中的渠道名称
+CHANNEL_BOILERPLATE = {
+    "BOSS直聘": [
+        r"(?:来自|通过)BOSS直聘[^。！!]{0,20}",
+        r"(?:打开|下载)BOSS直聘\s*APP[^。！!]{0,40}",
+        r"BOSS直聘[^。！!]{0,20}(?:温馨提示|提醒您)[^。！!]{0,80}[。！!]?",
+    ],
+    "智联招聘": [
+        r"(?:该简历|此简历)?来自智联招聘[^。！!]{0,20}",
+        r"智联招聘[^。！!]{0,20}(?:温馨提示|提醒您)[^。！!]{0,80}[。！!]?",
+        r"\S*zhaopin\.com\S*",
+    ],
+    "前程无忧": [
+        r"(?:该简历|此简历)?来自前程无忧[^。！!]{0,20}",
+        r"前程无忧[^。！!]{0,20}(?:温馨提示|提醒您)[^。！!]{0,80}[。！!]?",
+        r"\S*51job\.com\S*",
+    ],
+    "猎聘网": [
+        r"(?:该简历|此简历)?来自猎聘[^。！!]{0,20}",
+        r"猎聘[^。！!]{0,20}(?:温馨提示|提醒您)[^。！!]{0,80}[。！!]?",
+        r"\S*liepin\.com\S*",
+    ],
+    "牛客优聘": [
+        r"牛客[^。！!]{0,20}(?:温馨提示|提醒您)[^。！!]{0,80}[。！!]?",
+        r"\S*nowcoder\.com\S*",
+    ],
+}
+
+# 重复出现时只保留第一次的联系方式
+_CONTACT_RE = re.compile(
+    r"(?<!\d)1[3-9]\d[\s-]?\d{4}[\s-]?\d{4}(?!\d)"
+    r"|[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+)
+
+
+def _heading_variants(keyword: str) -> list:
+    if keyword.isascii():
+        return sorted({keyword, keyword.upper()})
+    return [keyword]
+
+
+def _build_heading_re():
+    heading_to_section = {}
+    for section, keywords in SECTION_HEADINGS.items():
+        for keyword in keywords:
+            for variant in _heading_variants(keyword):
+                heading_to_section[variant] = section
+    # 长关键词优先，避免“Experience”抢先匹配“Work Experience”
+    alternation = "|".join(re.escape(k) for k in sorted(heading_to_section, key=len, reverse=True))
+    # 标题必须位于行首且后跟标题标点或独占一行，或者用【】括起；正文中间出现的“项目”“Skills”等不算标题
+    pattern = re.compile(
+        r"^[【\[■●◆#| ]*(" + alternation + r") *(?:[:：】\]|] *|$)|【(" + alternation + r")】",
+        re.MULTILINE,
+    )
+    return pattern, heading_to_section
+
+
+_HEADING_RE, _HEADING_TO_SECTION = _build_heading_re()
+
+
+class ResumeSectionizer:
+    def __init__(self, config=None):
+        """
+        初始化简历切分器，预编译各渠道的模板文字规则
+
+        Args:
+            config: 配置对象，读取 RESUME_CHANNELS（域名->渠道名）和 RESUME_BOILERPLATE（渠道名->额外规则）
+        """
+        self.model_name = getattr(config, "MODEL_NAME", None)
+        self.channel_names = dict(getattr(config, "RESUME_CHANNELS", {}) or {})
+        extra = getattr(config, "RESUME_BOILERPLATE", {}) or {}
+
+        self.common_re = re.compile("|".join(COMMON_BOILERPLATE), re.MULTILINE)
+        self.channel_res = {}
+        for channel in set(CHANNEL_BOILERPLATE) | set(extra):
+            patterns = CHANNEL_BOILERPLATE.get(channel, []) + list(extra.get(channel, []))
+            try:
+                self.channel_res[channel] = re.compile("|".join(patterns))
+            except re.error as e:
+                logging.error(f"渠道 {channel} 的模板规则无效: {e}")
+
+    def _channel_name(self, channel: str) -> str:
+        """渠道可能是域名（如 zhipin.com）也可能是渠道名，统一为渠道名"""
+        if not channel:
+            return ""
+        channel = channel.strip()
+        if channel in self.channel_res:
+            return channel
+        for domain, name in self.channel_names.items():
+            if channel.endswith(domain):
+                return name
+        return channel
+
+    def strip_boilerplate(self, text: str, channel: str = "") -> str:
+        """去除通用及渠道特有的模板文字"""
+        text = self.common_re.sub(" ", text)
+        channel_re = self.channel_res.get(self._channel_name(channel))
+        if channel_re is not None:
+            text = channel_re.sub(" ", text)
+        return text
+
+    def split_sections(self, text: str) -> dict:
+        """按标题切分区块（text 需保留行结构），标题前的内容归入基本信息"""
+        sections = {key: [] for key in SECTION_TITLES}
+        seen = []
+
+        def add(section, heading, body):
+            body = " ".join(body.split()).strip(" :：|】]")
+            if not body:
+                return
+            # 重复区块（如页眉页脚重复的联系方式）只保留一次
+            if any(body == prev or (len(body) >= 20 and body in prev) for prev in seen):
+                return
+            seen.append(body)
+            # 基本信息和“其他”区块由多个小标题合并而来，保留原标题便于模型理解
+            if section in ("contact", "other") and heading:
+                body = f"{heading}: {body}"
+            sections[section].append(body)
+
+        pos = 0
+        current, heading = "contact", ""
+        for match in _HEADING_RE.finditer(text):
+            add(current, heading, text[pos:match.start()])
+            heading = match.group(1) or match.group(2)
+            current = _HEADING_TO_SECTION[heading]
+            pos = match.end()
+        add(current, heading, text[pos:])
+        return sections
+
+    def sectionize(self, resume_text: str, channel: str = "") -> dict:
+        """
+        切分并压缩简历文本
+
+        Args:
+            resume_text: 简历文本
+            channel: 来源渠道（域名或渠道名）
+
+        Returns:
+            dict: sections(各区块文本列表), compact_text(紧凑文本),
+                  original_tokens, compact_tokens, saved_tokens
+        """
+        # 保留行结构，标题识别和页脚去除都依赖行首/行尾
+        text = normalize_text(resume_text or "", keep_lines=True, dedupe_lines=False)
+        text = self.strip_boilerplate(text, channel)
+
+        # 重复的手机号/邮箱只保留第一次出现
+        seen_contacts = set()
+
+        def dedupe_contact(match):
+            value = re.sub(r"[\s-]", "", match.group(0)).lower()
+            if value in seen_contacts:
+                return " "
+            seen_contacts.add(value)
+            return match.group(0)
+
+        text = _CONTACT_RE.sub(dedupe_contact, text)
+
+        sections = self.split_sections(text)
+        compact_text = "\n".join(
+            f"【{SECTION_TITLES[key]}】{' '.join(bodies)}"
+            for key, bodies in sections.items() if bodies
+        )
+
+        original_tokens = count_tokens(resume_text, self.model_name)
+        compact_tokens = count_tokens(compact_text, self.model_name)
+        return {
+            "sections": sections,
+            "compact_text": compact_text,
+            "original_tokens": original_tokens,
+            "compact_tokens": compact_tokens,
+            "saved_tokens": original_tokens - compact_tokens,
+        }
@@ -9,6 +9,8 @@ from db_manager import (
     get_unprocessed_emails
 )
 from ai_screener import AIScreener
+from mail_classifier import MailClassifier
+from token_budget import count_tokens
 from recruit_service import RecruitService
 from log_manager import LogManager
 from batch_processor import create_batch_record, update_batch_status
@@ -16,6 +18,12 @@ from concurrent_utils import process_email_chunk
 from datetime import datetime, timedelta
 from utils.log_utils import setup_logger
 from utils import create_db_session  # 添加这行
+from llm_ledger import get_llm_ledger
+from llm_client import get_llm_client
+from llm_backends import get_backend_pool
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from deferred_details import enqueue_detail_job, needs_details, run_detail_jobs
+from job_catalog import get_job_catalog
 from sqlalchemy import text  # Add this import at the top of your file
 
 class ResumeCache:
@@ -152,8 +160,9 @@ def run_screening(config):
     # 首先清理可能卡住的数据库锁
     cleanup_stuck_locks(config)
 
-    # 加载岗位和公司信息
-    job_info = load_job_info()
+    # 加载岗位和公司信息，岗位表格修改后自动重载
+    job_catalog = get_job_catalog(config)
+    job_info = load_job_info(config)
     company_info = load_company_info()
             
     if not job_info:
@@ -162,14 +171,65 @@ def run_screening(config):
     if not company_info:
         logger.error("未能加载公司信息，请检查 config/company_info.txt 文件")
 
+    # prompt模板在启动时按岗位预编译一次，整个服务周期内共享
+    ai_screener = AIScreener(config, job_info, company_info, job_catalog=job_catalog)
+
+    # 本地非简历分类器在整个服务周期内共享，按间隔重训
+    mail_classifier = MailClassifier(config)
+
+    # 积压邮件较多时改用批量接口处理
+    batch_runner = None
+    if config.BATCH_API_BACKLOG_THRESHOLD > 0:
+        from batch_screening import BatchScreeningRunner
+        batch_runner = BatchScreeningRunner(config, job_info, company_info, job_catalog=job_catalog)
+
+    # 候选人向量索引：首次启动时加载快照或从 candidate_embeddings 重建，之后每轮补齐其他进程写入的记录
+    candidate_index = None
+    if config.CANDIDATE_INDEX:
+        from candidate_index import get_candidate_index
+        candidate_index = get_candidate_index(config)
+    index_loaded = False
+    breaker = get_circuit_breaker(config)
+
+    near_dup_index = None
+    if config.NEAR_DUP_DETECTION:
+        from near_duplicate import get_near_duplicate_index
+        near_dup_index = get_near_duplicate_index(config)
+
     while True:  # 服务持续运行
         session = None
         try:
             # 创建共享服务实例
             session = create_db_session(config)
-            ai_screener = AIScreener(config, job_info, company_info)
+            # 岗位表格修改后从本轮开始使用新的岗位信息，每轮只检查一次，处理邮件的线程不会遇到岗位信息切换
+            if ai_screener.refresh_job_catalog():
+                logger.info(f"岗位信息已更新: {len(ai_screener.job_info)} 个岗位")
+            if batch_runner:
+                batch_runner.ai_screener.refresh_job_catalog()
+            mail_classifier.maybe_retrain(session)
+            if candidate_index:
+                try:
+                    if not index_loaded:
+                        candidate_index.load_or_rebuild(session)
+                        index_loaded = True
+                    else:
+                        candidate_index.sync(session)
+                except Exception as e:
+                    logger.warning(f"候选人向量索引同步失败: {e}")
+            if near_dup_index:
+                try:
+                    near_dup_index.sync(session)
+                except Exception as e:
+                    logger.warning(f"简历签名同步失败: {e}")
+            if batch_runner:
+                pending_jobs = batch_runner.poll(session)
+                backlog = session.query(Email).filter(Email.process_status == "NEW").count()
+                if backlog >= config.BATCH_API_BACKLOG_THRESHOLD:
+                    logger.info(f"积压邮件 {backlog} 封，提交批量任务(进行中任务 {pending_jobs} 个)")
+                    batch_runner.submit_pending(session)
             recruit_service = RecruitService(config)
             cycle_start = time.time()
+            rejected_before = breaker.stats()["rejected"]
             
             # 获取待处理邮件
             unprocessed = get_unprocessed_emails(session, config.SCREENING_BATCH_SIZE)
@@ -194,7 +254,8 @@ def run_screening(config):
                             email,
                             ai_screener,
                             recruit_service,
-                            config
+                            config,
+                            mail_classifier
                         )
                         futures.append((email.id, future))
                     
@@ -220,15 +281,76 @@ def run_screening(config):
                           f"- 失败数: {failed}封\n"
                           f"- 成功率: {(processed/len(emails_to_process)*100):.1f}%\n"
                           f"- 耗时: {cycle_time:.1f}秒")
+                cache_stats = ai_screener.result_cache.stats()
+                logger.info(f"评估结果缓存累计: 命中 {cache_stats['hits']}次, 未命中 {cache_stats['misses']}次, "
+                          f"合并请求 {cache_stats['coalesced']}次, 命中率 {cache_stats['hit_rate']*100:.1f}%")
+                if ai_screener.position_matcher:
+                    match_stats = ai_screener.position_matcher.stats()
+                    logger.info(f"岗位向量匹配累计: 直接匹配 {match_stats['matched']}封, "
+                              f"交由LLM {match_stats['deferred']}封, "
+                              f"匹配率 {match_stats['match_rate']*100:.1f}%")
+                if ai_screener.cascade:
+                    for position, stats in ai_screener.cascade.stats().items():
+                        agreement = (f"{stats['agreement_rate']*100:.1f}%"
+                                     if stats['agreement_rate'] is not None else "-")
+                        logger.info(f"分级评估[{position}]: 评估 {stats['screened']}份, "
+                                  f"升级率 {stats['escalation_rate']*100:.1f}%, "
+                                  f"一致率 {agreement}(对比 {stats['compared']}份)")
+                backend_pool = get_backend_pool(config)
+                if backend_pool.multiple:
+                    logger.info("LLM后端累计: " + "; ".join(
+                        f"{name} 请求 {s['requests']}次, 错误 {s['errors']}次, 限流 {s['rate_limited']}次"
+                        f"{'' if s['healthy'] else ', 暂停中'}" for name, s in backend_pool.stats().items()))
+                if config.LLM_CLIENT == "async" and config.LLM_HEDGING:
+                    hedge_stats = get_llm_client(config).hedging.stats()
+                    logger.info(f"请求对冲累计: 发起 {hedge_stats['hedged']}次, 对冲胜出 {hedge_stats['hedge_wins']}次, "
+                              f"预算不足 {hedge_stats['budget_denied']}次, 节省 {hedge_stats['saved_seconds']:.1f}秒, "
+                              f"额外token {hedge_stats['extra_tokens']}")
+                if ai_screener.speculation:
+                    spec_stats = ai_screener.speculation.stats()
+                    logger.info(f"推测评估累计: 发起 {spec_stats['started']}次, 命中 {spec_stats['hits']}次, "
+                              f"命中率 {spec_stats['hit_rate']*100:.1f}%, 取消 {spec_stats['cancelled']}次, "
+                              f"浪费token {spec_stats['wasted_tokens']}({spec_stats['wasted_rate']*100:.1f}%)")
+                if near_dup_index:
+                    dup_stats = near_dup_index.stats()
+                    logger.info(f"近似重复简历累计: 检查 {dup_stats['checked']}封, "
+                              f"关联已有候选人 {dup_stats['linked']}封, "
+                              f"关联率 {dup_stats['link_rate']*100:.1f}%")
+                if mail_classifier.active:
+                    classifier_stats = mail_classifier.stats()
+                    logger.info(f"本地分类器累计: 检查 {classifier_stats['checked']}封, "
+                              f"跳过LLM {classifier_stats['skipped']}封, "
+                              f"跳过率 {classifier_stats['skip_rate']*100:.1f}%")
             else:
                 logger.info("当前没有待处理的邮件")
+
+            # 两阶段评估：邮件队列处理完且LLM服务未熔断时，为合格候选人补充评价详情
+            if (config.SCREENING_DETAIL_MODE == "deferred" and len(emails_to_process) < config.SCREENING_BATCH_SIZE
+                    and not breaker.remaining_open_seconds()):
+                try:
+                    run_detail_jobs(config, ai_screener, session)
+                except Exception as e:
+                    logger.warning(f"补充评价详情失败: {e}")
+
+            if candidate_index and candidate_index.needs_training:
+                candidate_index.train()
+            if candidate_index and candidate_index.dirty:
+                candidate_index.save()
+            if ai_screener.cascade:
+                ai_screener.cascade.save()
+            get_llm_ledger(config).flush()
             
             # 清理资源
             session.close()
             
             # 等待下一轮
-            logger.info(f"等待{config.SCREENING_CHECK_INTERVAL}秒后开始下一轮检查...")
-            time.sleep(config.SCREENING_CHECK_INTERVAL)
+            # 本轮有邮件因熔断放回队列时，熔断结束后立即开始下一轮
+            interval = config.SCREENING_CHECK_INTERVAL
+            if breaker.stats()["rejected"] > rejected_before:
+                interval = min(interval, breaker.remaining_open_seconds() + 1)
+                logger.warning(f"LLM服务熔断，部分邮件已放回队列(熔断状态: {breaker.stats()})")
+            logger.info(f"等待{interval:.0f}秒后开始下一轮检查...")
+            time.sleep(interval)
             
         except Exception as e:
             logger.error(f"简历筛选异常: {e}", exc_info=True)
@@ -237,10 +359,24 @@ def run_screening(config):
             if session:
                 session.close()
 
-def process_single_email(email, ai_screener, recruit_service, config):
+def index_candidate(session, ai_screener, config, candidate_id, resume_text):
+    """写入候选人简历embedding并加入向量索引，失败不影响筛选结果"""
+    try:
+        from candidate_index import get_candidate_index
+        vector = ai_screener.get_embedding(ai_screener.resume_embedding_text(resume_text))
+        if vector:
+            get_candidate_index(config).store(session, candidate_id, vector)
+    except Exception as e:
+        session.rollback()
+        logging.warning(f"候选人 {candidate_id} 加入向量索引失败: {e}")
+
+def process_single_email(email, ai_screener, recruit_service, config, mail_classifier=None):
     """处理单封邮件"""
     logger = setup_logger(f'Screener-{email.id}')
     session = None
+    # 本封邮件的LLM调用记录在处理结束时按最终岗位写入台账
+    ledger = get_llm_ledger(config)
+    ledger.begin_email(email.id)
     
     try:
         # 创建新会话并设置短超时
@@ -281,33 +417,119 @@ def process_single_email(email, ai_screener, recruit_service, config):
             logger.warning(f"解析附件信息失败: {str(e)}")
             attach_filenames = []
         
-        # 识别邮件类型和岗位
-        try:
-            is_resume, position_name, channel = ai_screener.identify_mail_type(
-                subject=db_email.subject,
-                resume_text=db_email.content_text,
-                attach_filenames=attach_filenames,
-                from_domain=db_email.from_address.split('@')[-1] if db_email.from_address else ""
+        from_domain = db_email.from_address.split('@')[-1] if db_email.from_address else ""
+        if db_email.token_count is None:
+            db_email.token_count = count_tokens(db_email.content_text, config.MODEL_NAME)
+
+        # 本地预检：明显的非简历邮件不调用LLM
+        is_candidate, reason = ai_screener.precheck_mail(
+            db_email.subject, db_email.content_text, attach_filenames, from_domain
+        )
+        if not is_candidate:
+            db_email.process_status = "NOT_RESUME"
+            db_email.error_message = f"非简历邮件(本地预检: {reason})"
+            session.commit()
+            logger.info(f"邮件 {db_email.id} 本地预检判定为非简历邮件: {reason}")
+            return True
+
+        # 本地分类器：高置信度的非简历邮件不调用LLM
+        if mail_classifier is not None:
+            skip, prob = mail_classifier.should_skip(
+                db_email.subject, db_email.content_text, attach_filenames, from_domain
             )
-            if not is_resume:
+            if skip:
                 db_email.process_status = "NOT_RESUME"
-                db_email.error_message = "非简历邮件"
+                db_email.error_message = f"非简历邮件(本地分类器: {prob:.3f})"
                 session.commit()
-                logger.info(f"邮件 {db_email.id} 不是简历邮件")
+                logger.info(f"邮件 {db_email.id} 本地分类器判定为非简历邮件: {prob:.3f}")
+                return True
+
+        # 近似重复检测：有相似的已评估简历时需要先确定岗位，单次调用模式下改走两步流程
+        near_dup_index = signature = None
+        if config.NEAR_DUP_DETECTION:
+            from near_duplicate import get_near_duplicate_index
+            near_dup_index = get_near_duplicate_index(config)
+            signature = near_dup_index.signature(db_email.content_text)
+        has_near_dup = bool(near_dup_index and near_dup_index.query(signature))
+        single_call = config.SCREENING_MODE == "single_call" and not has_near_dup
+
+        parsed_info = analysis = None
+        if single_call:
+            # 单次调用同时完成类型识别和简历评估
+            try:
+                is_resume, position_name, channel, parsed_info, analysis = ai_screener.identify_and_screen(
+                    subject=db_email.subject,
+                    resume_text=db_email.content_text,
+                    attach_filenames=attach_filenames,
+                    from_domain=from_domain
+                )
+                if is_resume is False:
+                    db_email.process_status = "NOT_RESUME"
+                    db_email.error_message = "非简历邮件"
+                    session.commit()
+                    logger.info(f"邮件 {db_email.id} 不是简历邮件")
+                    return True
+                    
+            except CircuitOpenError as e:
+                return release_email(session, db_email, e)
+            except Exception as e:
+                db_email.process_status = "FAILED"
+                db_email.error_message = f"邮件识别与评估失败: {str(e)}"
+                session.commit()
+                return False
+        else:
+            # 识别邮件类型和岗位，有近似重复简历时需先确定岗位，不做推测评估
+            try:
+                if ai_screener.speculation and not has_near_dup:
+                    is_resume, position_name, channel, parsed_info, analysis = \
+                        ai_screener.identify_mail_type_speculative(
+                            subject=db_email.subject,
+                            resume_text=db_email.content_text,
+                            attach_filenames=attach_filenames,
+                            from_domain=from_domain
+                        )
+                else:
+                    is_resume, position_name, channel = ai_screener.identify_mail_type(
+                        subject=db_email.subject,
+                        resume_text=db_email.content_text,
+                        attach_filenames=attach_filenames,
+                        from_domain=from_domain
+                    )
+                if not is_resume:
+                    db_email.process_status = "NOT_RESUME"
+                    db_email.error_message = "非简历邮件"
+                    session.commit()
+                    logger.info(f"邮件 {db_email.id} 不是简历邮件")
+                    return True
+                    
+            except CircuitOpenError as e:
+                return release_email(session, db_email, e)
+            except Exception as e:
+                db_email.process_status = "FAILED"
+                db_email.error_message = f"邮件类型识别失败: {str(e)}"
+                session.commit()
+                return False
+        ledger.set_position(position_name)
+
+        if analysis is None and near_dup_index:
+            duplicate_id, score = near_dup_index.find_duplicate(session, signature, position_name)
+            if duplicate_id:
+                db_email.process_status = "COMPLETED"
+                db_email.candidate_id = duplicate_id
+                db_email.error_message = f"近似重复简历(相似度 {score:.2f})，关联已有候选人"
+                db_email.update_time = datetime.now()
+                session.commit()
+                logger.info(f"邮件 {db_email.id} 与候选人 {duplicate_id} 的简历近似重复(相似度 {score:.2f})，跳过评估")
                 return True
-                
-        except Exception as e:
-            db_email.process_status = "FAILED"
-            db_email.error_message = f"邮件类型识别失败: {str(e)}"
-            session.commit()
-            return False
 
         # 简历分析
         try:
-            parsed_info, analysis = ai_screener.screen_resume(
-                resume_text=db_email.content_text,
-                position_name=position_name
-            )
+            if analysis is None:
+                parsed_info, analysis = ai_screener.screen_resume(
+                    resume_text=db_email.content_text,
+                    position_name=position_name,
+                    channel=channel
+                )
             if not parsed_info or not analysis:
                 db_email.process_status = "FAILED"
                 db_email.error_message = "AI分析返回空结果"
@@ -315,29 +537,28 @@ def process_single_email(email, ai_screener, recruit_service, config):
                 return False
                 
             # 保存候选人信息
-            candidate_id = recruit_service.store_candidate(
-                session=session,
-                parsed_info=parsed_info,
-                analysis=analysis,
-                resume_source=channel or db_email.from_address,
-                resume_full_text=db_email.content_text,
-                resume_hash=db_email.resume_hash,
-                email_subject=str(db_email.subject),
-                inbox_account=str(db_email.inbox_account),
-                resume_file_url=str(db_email.attachment_url) if db_email.attachment_url else "",
-                mail_sent_time=db_email.received_date
-            )
-
-            # 更新邮件状态 - 修改这里的状态为 COMPLETED
-            db_email.process_status = "COMPLETED"  # 将 DONE 改为 COMPLETED
-            db_email.candidate_id = candidate_id
-            db_email.error_message = ""
-            db_email.update_time = datetime.now()
-            session.commit()
+            candidate_id = save_screening_result(session, db_email, recruit_service,
+                                                 parsed_info, analysis, channel)
+            if config.SCREENING_DETAIL_MODE == "deferred" and candidate_id and needs_details(analysis):
+                try:
+                    enqueue_detail_job(session, candidate_id, position_name)
+                except Exception as e:
+                    session.rollback()
+                    logger.warning(f"候选人 {candidate_id} 创建评价详情任务失败: {e}")
+            if config.CANDIDATE_INDEX and candidate_id:
+                index_candidate(session, ai_screener, config, candidate_id, db_email.content_text)
+            if near_dup_index and candidate_id:
+                try:
+                    near_dup_index.store(session, candidate_id, position_name, signature)
+                except Exception as e:
+                    session.rollback()
+                    logger.warning(f"保存简历签名失败: {e}")
             
             logger.info(f"简历处理成功: id={db_email.id}, candidate_id={candidate_id}, position={position_name}")
             return True
             
+        except CircuitOpenError as e:
+            return release_email(session, db_email, e)
         except Exception as e:
             logger.error(f"简历分析失败: {str(e)}")
             db_email.process_status = "FAILED"
@@ -358,9 +579,42 @@ def process_single_email(email, ai_screener, recruit_service, config):
             pass
         return False
     finally:
+        ledger.end_email()
         if session:
             session.close()
 
+def release_email(session, db_email, error):
+    """LLM服务熔断时把邮件放回队列，下一轮重新处理"""
+    db_email.process_status = "NEW"
+    db_email.error_message = f"LLM服务熔断，已放回队列: {error}"
+    db_email.update_time = datetime.now()
+    session.commit()
+    logging.info(f"邮件 {db_email.id} 因LLM服务熔断放回队列")
+    return False
+
+def save_screening_result(session, db_email, recruit_service, parsed_info, analysis, channel):
+    """保存候选人信息并将邮件标记为 COMPLETED，返回候选人ID"""
+    candidate_id = recruit_service.store_candidate(
+        session=session,
+        parsed_info=parsed_info,
+        analysis=analysis,
+        resume_source=channel or db_email.from_address,
+        resume_full_text=db_email.content_text,
+        resume_hash=db_email.resume_hash,
+        email_subject=str(db_email.subject),
+        inbox_account=str(db_email.inbox_account),
+        resume_file_url=str(db_email.attachment_url) if db_email.attachment_url else "",
+        mail_sent_time=db_email.received_date
+    )
+
+    # 更新邮件状态 - 修改这里的状态为 COMPLETED
+    db_email.process_status = "COMPLETED"  # 将 DONE 改为 COMPLETED
+    db_email.candidate_id = candidate_id
+    db_email.error_message = ""
+    db_email.update_time = datetime.now()
+    session.commit()
+    return candidate_id
+
 def get_unprocessed_emails(session, limit=None):
     """
     获取未处理的邮件，包括新建和失败状态的邮件
@@ -504,41 +758,13 @@ def _log_batch_progress(batch_number, processed_count, total_emails_count):
     logging.info(f"总进度: {processed_count}/{total_emails_count} ({progress_pct:.1f}%)")
     logging.info(f"{'='*50}\n")
 
-def load_job_info():
-    """加载岗位信息，并转换字段名称为指定格式"""
-    try:
-        import pandas as pd
-        with open("config/job_desc.xlsx", "rb") as f:
-            df = pd.read_excel(f)
-            
-            # 定义字段名映射关系
-            field_mapping = {
-                "岗位": "position_name",
-                "岗位别称": "alias",
-                "职责描述": "duties",
-                "任职要求": "requirements",
-                "学历要求": "education_req",
-                "资历要求": "exp_req",
-                "工作地点": "location",
-                "绩效考核目标": "perf_goals"
-            }
-            
-            # 重命名列
-            df = df.rename(columns=field_mapping)
-            
-            # 转换为字典，使用position_name作为key
-            job_dict = {}
-            for _, row in df.iterrows():
-                position_name = row.get('position_name')
-                if (position_name):
-                    job_dict[position_name] = row.to_dict()
-            
-            logging.info(f"成功加载 {len(job_dict)} 个岗位配置")
-            return job_dict
-            
-    except Exception as e:
-        logging.warning(f"未能加载岗位信息: {e}")
-        return {}
+def load_job_info(config=None):
+    """加载岗位信息（编译后的岗位目录），字段名已转换为 position_name/alias/duties 等"""
+    from job_catalog import JobCatalog, get_job_catalog
+    catalog = get_job_catalog(config) if config else JobCatalog()
+    if catalog.positions:
+        logging.info(f"成功加载 {len(catalog.positions)} 个岗位配置")
+    return catalog.positions
 
 def load_company_info():
     """加载公司信息"""
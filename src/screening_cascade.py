@@ -0,0 +1,111 @@
+# screening_cascade.py
+"""
+分级评估模块
+
+大多数候选人的总分远高于或远低于合格线，用便宜的小模型评估就足以得到相同的结论：
+1. 先用 CASCADE_MODEL 评估
+2. 总分落在合格线附近 ±CASCADE_ESCALATION_BAND 内，或结果无效时，再用 MODEL_NAME 重新评估
+3. 另按 CASCADE_AUDIT_RATE 抽查一部分未升级的简历，用于估计区间外两个模型的一致率
+4. 按岗位统计升级率、两个模型的合格结论一致率和总分平均差，计数保存在内存中，每轮筛选结束时写入 CASCADE_STATS_FILE
+"""
+
+import os
+import json
+import random
+import logging
+import threading
+from recruit_service import QUALIFIED_SCORE, compute_total_score
+
+
+class ScreeningCascade:
+    def __init__(self, config):
+        self.cheap_model = config.CASCADE_MODEL
+        self.strong_model = config.MODEL_NAME
+        self.band = config.CASCADE_ESCALATION_BAND
+        self.audit_rate = config.CASCADE_AUDIT_RATE
+        self.stats_file = config.CASCADE_STATS_FILE
+        self._lock = threading.Lock()
+        self.positions = self._load_stats()
+        self.dirty = False
+
+    # ---------- 升级判断 ----------
+
+    def escalation_reason(self, parsed_info: dict, analysis: dict) -> str:
+        """
+        判断小模型的结果是否需要由大模型重新评估
+
+        Returns:
+            str: 升级原因（invalid/borderline/audit），不需要升级时为空字符串
+        """
+        if not parsed_info or not analysis:
+            return "invalid"
+        if abs(compute_total_score(analysis) - QUALIFIED_SCORE) <= self.band:
+            return "borderline"
+        if self.audit_rate > 0 and random.random() < self.audit_rate:
+            return "audit"
+        return ""
+
+    # ---------- 统计 ----------
+
+    def record(self, position_name: str, cheap_analysis: dict, strong_analysis: dict = None, reason: str = ""):
+        """记录一次评估；升级且两个模型都返回有效结果时统计一致率"""
+        with self._lock:
+            stats = self.positions.setdefault(position_name or "未知岗位", {
+                "screened": 0, "escalated": 0, "invalid": 0, "borderline": 0, "audit": 0,
+                "compared": 0, "agreed": 0, "score_diff": 0,
+            })
+            stats["screened"] += 1
+            if reason:
+                stats["escalated"] += 1
+                stats[reason] += 1
+            if cheap_analysis and strong_analysis:
+                cheap_total = compute_total_score(cheap_analysis)
+                strong_total = compute_total_score(strong_analysis)
+                stats["compared"] += 1
+                stats["agreed"] += int((cheap_total >= QUALIFIED_SCORE) == (strong_total >= QUALIFIED_SCORE))
+                stats["score_diff"] += abs(cheap_total - strong_total)
+            self.dirty = True
+
+    def stats(self) -> dict:
+        """按岗位汇总升级率、一致率和总分平均差"""
+        with self._lock:
+            summary = {}
+            for position_name, stats in self.positions.items():
+                compared = stats["compared"]
+                summary[position_name] = {
+                    **stats,
+                    "escalation_rate": stats["escalated"] / stats["screened"] if stats["screened"] else 0.0,
+                    "agreement_rate": stats["agreed"] / compared if compared else None,
+                    "avg_score_diff": stats["score_diff"] / compared if compared else None,
+                }
+            return summary
+
+    def _load_stats(self) -> dict:
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("positions", {})
+        except Exception as e:
+            logging.error(f"[ScreeningCascade] 读取统计文件失败: {e}")
+            return {}
+
+    def save(self):
+        """有新的评估记录时写入统计文件，每轮筛选结束时调用"""
+        with self._lock:
+            if not self.dirty:
+                return
+            snapshot = {position_name: dict(stats) for position_name, stats in self.positions.items()}
+            self.dirty = False
+        if not self.stats_file:
+            return
+        try:
+            stats_dir = os.path.dirname(self.stats_file)
+            if stats_dir:
+                os.makedirs(stats_dir, exist_ok=True)
+            tmp_path = f"{self.stats_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"positions": snapshot}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_file)
+        except Exception as e:
+            logging.error(f"[ScreeningCascade] 保存统计文件失败: {e}")
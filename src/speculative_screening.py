@@ -0,0 +1,107 @@
+# speculative_screening.py
+"""
+推测评估模块
+
+两步流程中 screen_resume 要等 identify_mail_type 返回后才开始，每份简历的端到端耗时是两次调用之和。
+开启 SPECULATIVE_SCREENING 后，本地信号表明邮件很可能是简历（招聘渠道来信、附件名像简历）且能在本地
+猜出岗位（主题中的岗位名称/别称，或向量匹配排名第一的岗位）时：
+1. 识别邮件类型的同时在独立线程池中按猜测的岗位开始评估
+2. 识别结果确认是简历且岗位一致时直接使用推测评估的结果（命中）
+3. 否则取消尚未开始的推测评估，已在进行的结果丢弃，消耗的token计为浪费
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_ledger import get_llm_ledger
+
+
+class SpeculativeScreening:
+    def __init__(self, config):
+        self.config = config
+        self.ledger = get_llm_ledger(config)
+        self._pool = ThreadPoolExecutor(max_workers=config.SCREENING_WORKERS,
+                                        thread_name_prefix="speculative-screen")
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.spent_tokens = 0
+        self.wasted_tokens = 0
+
+    def submit(self, func, position_name: str, *args):
+        """
+        在线程池中执行推测评估，调用记录到当前邮件和猜测的岗位
+
+        Returns:
+            Future: 结果为 func 的返回值
+        """
+        email_id = self.ledger.current_email()
+        usage = {}
+
+        def run():
+            self.ledger.attach(email_id, position_name, usage)
+            try:
+                return func(*args)
+            finally:
+                self.ledger.attach()
+
+        future = self._pool.submit(run)
+        future.usage = usage
+        with self._lock:
+            self.started += 1
+        return future
+
+    def resolve(self, future, hit: bool):
+        """
+        识别结果返回后处理推测评估
+
+        Args:
+            future: submit 返回的Future
+            hit: 识别结果是否与推测一致
+
+        Returns:
+            推测评估的结果；未命中或推测评估失败时返回None
+        """
+        if not hit:
+            if future.cancel():
+                with self._lock:
+                    self.misses += 1
+                    self.cancelled += 1
+            else:
+                # 已在进行的请求无法撤回，完成后把token计为浪费
+                future.add_done_callback(lambda f: self._account(f, wasted=True))
+                with self._lock:
+                    self.misses += 1
+            return None
+
+        try:
+            result = future.result()
+        except Exception as e:
+            # 推测评估失败（包括熔断）时由正常流程重新评估
+            logging.warning(f"[SpeculativeScreening] 推测评估失败: {e}")
+            result = None
+        self._account(future, wasted=False)
+        with self._lock:
+            if result is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result
+
+    def _account(self, future, wasted: bool):
+        tokens = future.usage.get("prompt_tokens", 0) + future.usage.get("completion_tokens", 0)
+        with self._lock:
+            self.spent_tokens += tokens
+            if wasted:
+                self.wasted_tokens += tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {"started": self.started, "hits": self.hits, "misses": self.misses,
+                    "cancelled": self.cancelled,
+                    "hit_rate": self.hits / resolved if resolved else 0.0,
+                    "wasted_tokens": self.wasted_tokens,
+                    "wasted_rate": self.wasted_tokens / self.spent_tokens if self.spent_tokens else 0.0}
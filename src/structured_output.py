@@ -0,0 +1,323 @@
+# structured_output.py
+"""
+结构化输出模块
+
+筛选结果原先靠手工去掉代码块再 json.loads，任何格式问题都会让整封邮件失败并在下个周期
+重新调用一次模型。本模块：
+1. 为各prompt定义JSON Schema，按 LLM_STRUCTURED_OUTPUT 生成 response_format 或 tools 请求参数
+2. 对不支持结构化输出的服务，用容错解析器修复常见格式问题（代码块、注释、尾逗号、中文引号、
+   字符串内换行、输出被截断等）
+3. 解析后按Schema一次完成校验和类型转换（"15分" -> 15、"true" -> True、列表 -> 字符串）
+"""
+
+import re
+import json
+import logging
+
+# 支持的结构化输出方式
+#   json_schema: response_format 指定JSON Schema（OpenAI 及兼容服务）
+#   tools:       强制调用一个函数，参数即输出结果（支持 function calling 的服务）
+#   json_object: 只保证输出为JSON对象
+#   none:        不传额外参数，只依赖容错解析
+STRUCTURED_OUTPUT_MODES = ("json_schema", "tools", "json_object", "none")
+
+_SCORE_FIELDS = ["education", "technical", "innovation", "growth", "startup", "teamwork"]
+
+PARSED_INFO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{name: {"type": "string"} for name in [
+            "name", "position", "experience", "latest_company", "first_education", "first_university",
+            "highest_education", "highest_university", "marital_status", "gender", "phone", "email",
+            "wechat", "expected_salary", "resume_source",
+        ]},
+        "age": {"type": "integer"},
+    },
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{f"{name}_score": {"type": "integer"} for name in _SCORE_FIELDS},
+        **{f"{name}_detail": {"type": "string"} for name in _SCORE_FIELDS},
+        "risk": {"type": "string"},
+        "questions": {"type": "string"},
+    },
+    "required": [f"{name}_{suffix}" for name in _SCORE_FIELDS for suffix in ("score", "detail")]
+                + ["risk", "questions"],
+}
+
+SCREEN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "parsed_info": PARSED_INFO_SCHEMA,
+        "analysis": ANALYSIS_SCHEMA,
+    },
+    "required": ["parsed_info", "analysis"],
+}
+
+# 两阶段评估（SCREENING_DETAIL_MODE=deferred）：第一阶段只输出评分，合格候选人再补充评价详情
+DETAIL_FIELDS = [f"{name}_detail" for name in _SCORE_FIELDS] + ["risk", "questions"]
+
+SCREEN_SCORES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "parsed_info": PARSED_INFO_SCHEMA,
+        "analysis": {
+            "type": "object",
+            "properties": {f"{name}_score": {"type": "integer"} for name in _SCORE_FIELDS},
+            "required": [f"{name}_score" for name in _SCORE_FIELDS],
+        },
+    },
+    "required": ["parsed_info", "analysis"],
+}
+
+SCREEN_DETAIL_SCHEMA = {
+    "type": "object",
+    "properties": {name: {"type": "string"} for name in DETAIL_FIELDS},
+    "required": DETAIL_FIELDS,
+}
+
+
+def identify_schema(positions=None, channels=None) -> dict:
+    """邮件类型识别的Schema，岗位和渠道限定为给定列表（允许为空字符串）"""
+    return {
+        "type": "object",
+        "properties": {
+            "is_resume": {"type": "boolean"},
+            "matched_position": _choice_schema(positions),
+            "matched_channel": _choice_schema(channels),
+        },
+        "required": ["is_resume", "matched_position", "matched_channel"],
+    }
+
+
+def identify_and_screen_schema(positions=None, channels=None) -> dict:
+    """单次调用模式的Schema：识别字段 + 评估字段（非简历时可省略评估字段）"""
+    schema = identify_schema(positions, channels)
+    schema["properties"].update(SCREEN_SCHEMA["properties"])
+    return schema
+
+
+def _choice_schema(choices) -> dict:
+    if not choices:
+        return {"type": "string"}
+    return {"type": "string", "enum": list(choices) + [""]}
+
+
+# ---------- 请求参数 ----------
+
+def request_kwargs(mode: str, name: str, schema: dict) -> dict:
+    """
+    按结构化输出方式生成 chat/completions 的额外请求参数
+
+    Args:
+        mode: STRUCTURED_OUTPUT_MODES 之一
+        name: Schema/函数名称
+        schema: JSON Schema
+    """
+    if mode == "json_schema":
+        return {"response_format": {"type": "json_schema",
+                                    "json_schema": {"name": name, "schema": schema}}}
+    if mode == "tools":
+        return {
+            "tools": [{"type": "function",
+                       "function": {"name": name, "description": "输出结果", "parameters": schema}}],
+            "tool_choice": {"type": "function", "function": {"name": name}},
+        }
+    if mode == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def response_text(response: dict) -> str:
+    """取出模型输出：函数调用时为参数，否则为消息内容"""
+    message = response["choices"][0]["message"]
+    tool_calls = message.get("tool_calls") or []
+    if tool_calls:
+        return tool_calls[0].get("function", {}).get("arguments") or ""
+    function_call = message.get("function_call")
+    if function_call:
+        return function_call.get("arguments") or ""
+    return (message.get("content") or "").strip()
+
+
+# ---------- 容错解析 ----------
+
+# 模型偶尔用中文引号代替JSON的引号，只在字符串外（作为分隔符时）替换，字符串内的中文引号原样保留
+_FANCY_QUOTES = "“”＂"
+_FANCY_CLOSE_QUOTES = "”＂"
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+
+def _strip_comments(txt: str) -> str:
+    """去掉字符串外的 # 和 // 注释，把用作分隔符的中文引号换成英文引号，并把字符串内的裸换行转义"""
+    out = []
+    quote = None            # 当前字符串的开引号，None 表示在字符串外
+    escaped = False
+    i = 0
+    while i < len(txt):
+        ch = txt[i]
+        if quote is not None:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"' or (quote != '"' and ch in _FANCY_CLOSE_QUOTES):
+                # 以中文引号开始的字符串也可以用中文引号结束；以英文引号开始的字符串中的中文引号是正文内容
+                quote = None
+                ch = '"'
+            elif ch == "\n":
+                out.append("\\n")
+                i += 1
+                continue
+            out.append(ch)
+        elif ch == '"' or ch in _FANCY_QUOTES:
+            quote = ch
+            out.append('"')
+        elif ch == "#" or txt.startswith("//", i):
+            while i < len(txt) and txt[i] != "\n":
+                i += 1
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _close_truncated(txt: str) -> str:
+    """输出被截断时补齐未闭合的字符串和括号"""
+    stack = []
+    in_string = escaped = False
+    for ch in txt:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        txt += '"'
+    txt = txt.rstrip().rstrip(",")
+    # 截断在键名之后时补一个空值
+    if txt.endswith(":"):
+        txt += ' ""'
+    return txt + "".join(reversed(stack))
+
+
+def repair_json(txt: str):
+    """
+    解析模型输出的JSON对象，尽量修复常见格式问题
+
+    Returns:
+        dict: 解析结果，无法修复时返回 None
+    """
+    if not txt:
+        return None
+    txt = txt.strip()
+    try:
+        result = json.loads(txt)
+        return result if isinstance(result, dict) else None
+    except ValueError:
+        pass
+
+    start = txt.find("{")
+    if start < 0:
+        return None
+    body = _strip_comments(txt[start:])
+    candidates = [body[:body.rfind("}") + 1], _close_truncated(body)]
+    for candidate in candidates:
+        try:
+            result = json.loads(_TRAILING_COMMA_RE.sub(r"\1", candidate))
+        except ValueError:
+            continue
+        if isinstance(result, dict):
+            logging.info("[StructuredOutput] 模型输出格式不规范，已修复")
+            return result
+    return None
+
+
+# ---------- 校验与类型转换 ----------
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def coerce(value, schema: dict, path: str = "", issues: list = None):
+    """
+    按Schema校验并转换类型，缺失的必填字段补默认值
+
+    Args:
+        value: 解析得到的值
+        schema: JSON Schema（支持 object/string/integer/boolean/enum）
+        path: 当前字段路径，用于记录问题
+        issues: 收集转换过程中发现的问题
+
+    Returns:
+        转换后的值
+    """
+    issues = issues if issues is not None else []
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            if value not in (None, ""):
+                issues.append(f"{path or '结果'} 不是对象")
+            value = {}
+        result = dict(value)
+        for key, sub_schema in schema.get("properties", {}).items():
+            sub_path = f"{path}.{key}" if path else key
+            if key in value:
+                result[key] = coerce(value[key], sub_schema, sub_path, issues)
+            elif key in schema.get("required", []):
+                issues.append(f"缺失字段 {sub_path}")
+                result[key] = coerce(None, sub_schema, sub_path, [])
+        return result
+    if kind == "integer":
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (int, float)):
+            return int(round(value))
+        match = _NUMBER_RE.search(str(value)) if value is not None else None
+        if match:
+            return int(round(float(match.group())))
+        if value not in (None, ""):
+            issues.append(f"{path} 无法转换为整数: {value}")
+        return 0
+    if kind == "boolean":
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "yes", "1", "是")
+        return bool(value)
+    # string
+    if value is None:
+        value = ""
+    elif isinstance(value, list):
+        value = "\n".join(str(item) for item in value)
+    elif isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = str(value)
+    choices = schema.get("enum")
+    if choices and value.strip() not in choices:
+        # 保留原值，由调用方做岗位/渠道的模糊匹配
+        issues.append(f"{path} 不在可选列表中: {value}")
+    return value.strip() if choices else value
+
+
+def parse_structured(txt: str, schema: dict):
+    """
+    解析模型输出并按Schema校验、转换
+
+    Returns:
+        tuple: (转换后的字典, 问题列表)，无法解析时字典为 None
+    """
+    result = repair_json(txt)
+    if result is None:
+        return None, ["无法解析为JSON对象"]
+    issues = []
+    return coerce(result, schema, issues=issues), issues
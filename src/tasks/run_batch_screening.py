@@ -0,0 +1,48 @@
+import os
+import sys
+import logging
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from db_manager import get_db, DBManager
+from config import Config
+from log_manager import LogManager
+from screening import load_job_info, load_company_info
+from batch_screening import BatchScreeningRunner
+
+def run_batch_screening():
+    """用批量接口处理所有 NEW 状态的邮件，并等待已提交的任务完成"""
+    parser = argparse.ArgumentParser(description="批量接口处理积压邮件")
+    parser.add_argument("--poll-interval", type=int, default=60, help="查询任务状态的间隔(秒)")
+    parser.add_argument("--poll-only", action="store_true", help="只查询已提交的任务，不提交新任务")
+    args = parser.parse_args()
+
+    # 岗位和公司信息使用相对项目目录的路径
+    os.chdir(os.path.join(project_root, ".."))
+    config = Config("config/.env")
+    LogManager.setup_logging(config)
+
+    try:
+        db_manager = DBManager(config)
+        db_manager.init_engine_and_session()
+        db = next(get_db())
+
+        runner = BatchScreeningRunner(config, load_job_info(config), load_company_info())
+        if runner.jobs:
+            logging.info(f"从检查点恢复 {len(runner.jobs)} 个未完成的批量任务")
+        runner.run(db, poll_interval=args.poll_interval, submit=not args.poll_only)
+        logging.info("批量筛选完成")
+
+    except Exception as e:
+        logging.error(f"批量筛选失败: {e}", exc_info=True)
+        if 'db' in locals():
+            db.rollback()
+    finally:
+        if 'db' in locals():
+            db.close()
+
+if __name__ == "__main__":
+    run_batch_screening()
@@ -0,0 +1,139 @@
+# token_budget.py
+"""
+Prompt token预算模块
+
+1. 进程内缓存tiktoken编码器，每个模型只解析一次
+2. 按token边界截断文本，避免按字符截断时中文简历超出预算、英文简历被过早截断
+3. 在固定部分（评估标准、说明等）、岗位描述和简历之间分配 MAX_TOKEN 预算
+
+tiktoken 首次使用需要下载编码文件，不可用时退化为按字符估算（中文约1字1token，其余约4字符1token）。
+"""
+
+import logging
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - 可选依赖
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def get_encoder(model_name: str = None):
+    """返回模型对应的编码器，结果按模型名缓存；tiktoken不可用时返回 None"""
+    key = model_name or DEFAULT_ENCODING
+    if key in _encoders:
+        return _encoders[key]
+    with _encoders_lock:
+        if key not in _encoders:
+            enc = None
+            if tiktoken is not None:
+                try:
+                    try:
+                        enc = tiktoken.encoding_for_model(model_name) if model_name else None
+                    except KeyError:
+                        enc = None
+                    enc = enc or tiktoken.get_encoding(DEFAULT_ENCODING)
+                except Exception as e:
+                    logging.warning(f"加载tiktoken编码器失败，改为按字符估算token: {e}")
+            _encoders[key] = enc
+    return _encoders[key]
+
+
+def _is_cjk(ch: str) -> bool:
+    return '\u4e00' <= ch <= '\u9fff'
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本token数（中文约1字1token，其余约4字符1token）"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str, model_name: str = None) -> int:
+    """统计文本token数"""
+    if not text:
+        return 0
+    enc = get_encoder(model_name)
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: str = None) -> str:
+    """按token边界截断文本，保证结果不超过 max_tokens"""
+    if not text or max_tokens <= 0:
+        return ""
+    enc = get_encoder(model_name)
+    if enc is None:
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # 按估算规则累计，中文字符计1，其余计1/4
+        budget = max_tokens * 4
+        for i, ch in enumerate(text):
+            budget -= 4 if _is_cjk(ch) else 1
+            if budget < 0:
+                return text[:i]
+        return text
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    # 多字节字符可能被拆到两个token中，去掉截断处残缺的字符
+    return enc.decode(tokens[:max_tokens]).rstrip('\ufffd')
+
+
+class PromptBudget:
+    def __init__(self, config):
+        """
+        Args:
+            config: 配置对象，读取 MAX_TOKEN（整个prompt的token上限）、MODEL_NAME 和
+                    PROMPT_JOB_TOKEN_SHARE（固定部分之外岗位描述最多占用的比例）
+        """
+        self.model_name = config.MODEL_NAME
+        self.max_tokens = config.MAX_TOKEN
+        self.job_share = config.PROMPT_JOB_TOKEN_SHARE
+        self.min_resume_tokens = config.PROMPT_MIN_RESUME_TOKENS
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def available(self, fixed_tokens: int) -> int:
+        """固定部分之外可用于岗位描述和简历的token数"""
+        return max(self.max_tokens - fixed_tokens, self.min_resume_tokens)
+
+    def fit_job_fields(self, fixed_tokens: int, job_fields: dict):
+        """
+        岗位描述最多占剩余预算的 job_share，超出时各字段按长度比例截断
+
+        Returns:
+            tuple: (截断后的岗位描述字段, 岗位描述token数)
+        """
+        job_tokens = {key: self.count(str(value)) for key, value in job_fields.items()}
+        job_total = sum(job_tokens.values())
+        job_cap = int(self.available(fixed_tokens) * self.job_share)
+        if job_total > job_cap:
+            job_fields = {
+                key: truncate_tokens(str(value), job_cap * job_tokens[key] // job_total, self.model_name)
+                for key, value in job_fields.items()
+            }
+            job_total = sum(self.count(value) for value in job_fields.values())
+        return job_fields, job_total
+
+    def fit_resume(self, used_tokens: int, resume_text: str):
+        """
+        简历使用扣除已占用部分后的全部预算，且不少于 min_resume_tokens
+
+        Returns:
+            tuple: (截断后的简历文本, 简历token数)
+        """
+        resume_budget = self.available(used_tokens)
+        truncated = truncate_tokens(resume_text, resume_budget, self.model_name)
+        if truncated != resume_text:
+            logging.info(f"[PromptBudget] 简历超出预算，已截断至 {resume_budget} tokens")
+        return truncated, self.count(truncated)
@@ -0,0 +1,130 @@
+"""
+文本规范化微基准
+
+对比原有多遍正则清理链与 utils.text_normalizer 单遍引擎的耗时，并校验两者输出一致
+（resume_hash 基于清理后的文本计算，结果必须完全相同）。
+
+语料来源（二选一）：
+    python tools/bench_text_normalizer.py --dir /path/to/resumes      # 目录下的 .txt/.html 文件
+    python tools/bench_text_normalizer.py --db 500                    # 从 emails 表读取最近500封邮件
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils.text_normalizer import normalize_lines, normalize_flat
+
+
+def legacy_clean_lines(text: str) -> str:
+    """原 extract_text_from_html 中的逐行清理"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            line = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', line)
+            line = re.sub(r'\s+', ' ', line)
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def legacy_clean_text(text: str) -> str:
+    """原 extract_clean_text"""
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', ' ', text)
+    text = re.sub(r'[\u00A0\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200A\u202F\u205F]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_chain(text: str) -> str:
+    return legacy_clean_text(legacy_clean_lines(text))
+
+
+def new_chain(text: str) -> str:
+    return normalize_flat(normalize_lines(text, dedupe_lines=False))
+
+
+def load_corpus_from_dir(path):
+    corpus = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.lower().endswith(('.txt', '.html', '.htm')):
+                with open(os.path.join(root, name), 'r', encoding='utf-8', errors='ignore') as f:
+                    corpus.append(f.read())
+    return corpus
+
+
+def load_corpus_from_db(limit):
+    from config import Config
+    from utils import create_db_session
+    from db_manager import Email
+
+    config = Config(os.path.join(project_root, "..", "config/.env"))
+    session = create_db_session(config)
+    try:
+        rows = session.query(Email.content_text, Email.content_html).order_by(
+            Email.id.desc()
+        ).limit(limit).all()
+        corpus = []
+        for content_text, content_html in rows:
+            if content_text:
+                corpus.append(content_text)
+            if content_html:
+                corpus.append(content_html)
+        return corpus
+    finally:
+        session.close()
+
+
+def bench(func, corpus, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本规范化微基准")
+    parser.add_argument("--dir", help="简历语料目录(.txt/.html)")
+    parser.add_argument("--db", type=int, default=0, help="从emails表读取的邮件数量")
+    parser.add_argument("--rounds", type=int, default=5, help="重复轮数")
+    args = parser.parse_args()
+
+    if args.dir:
+        corpus = load_corpus_from_dir(args.dir)
+    elif args.db:
+        corpus = load_corpus_from_db(args.db)
+    else:
+        parser.error("请指定 --dir 或 --db")
+
+    if not corpus:
+        print("语料为空")
+        return
+
+    total_bytes = sum(len(t.encode('utf-8')) for t in corpus)
+    print(f"语料: {len(corpus)} 篇, 共 {total_bytes / 1024 / 1024:.2f} MB")
+
+    mismatches = sum(1 for t in corpus if legacy_chain(t) != new_chain(t))
+    print(f"输出不一致: {mismatches} 篇")
+
+    for name, func in [("原多遍正则链", legacy_chain), ("单遍规范化", new_chain)]:
+        timings = bench(func, corpus, args.rounds)
+        best = min(timings)
+        print(f"{name}: 最佳 {best * 1000:.1f} ms, 中位 {statistics.median(timings) * 1000:.1f} ms, "
+              f"吞吐 {total_bytes / best / 1024 / 1024:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
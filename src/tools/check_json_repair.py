@@ -0,0 +1,50 @@
+"""
+模型输出JSON修复的回归检查
+
+逐条解析常见的不规范输出，校验 structured_output.repair_json 的修复结果，任一条不符时以非0状态退出：
+    python tools/check_json_repair.py
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from structured_output import repair_json
+
+# (模型输出, 期望结果)
+CASES = [
+    # 字符串值中的中文引号是正文内容，不能当作JSON引号
+    ('{"a": "他说“你好”",}', {"a": "他说“你好”"}),
+    ('{"a": "候选人“跳槽频繁”需关注",\n"b": 1,}', {"a": "候选人“跳槽频繁”需关注", "b": 1}),
+    ('{"a": "全角＂引号＂",}', {"a": "全角＂引号＂"}),
+    # 中文引号用作分隔符
+    ('{“a”: “值”, "b": 2,}', {"a": "值", "b": 2}),
+    # 注释、尾逗号、字符串内的裸换行
+    ('{"a": "第一行\n第二行", // 注释\n "b": [1, 2,],}', {"a": "第一行\n第二行", "b": [1, 2]}),
+    # 前后有说明文字
+    ('结果如下：\n{"a": 1}\n以上', {"a": 1}),
+    # 输出被截断
+    ('{"a": "他说“你好', {"a": "他说“你好"}),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": 1, "b":', {"a": 1, "b": ""}),
+    # 无法修复
+    ('没有JSON', None),
+]
+
+
+def main():
+    failed = 0
+    for text, expected in CASES:
+        result = repair_json(text)
+        if result != expected:
+            failed += 1
+            print(f"[FAIL] {text!r}\n       期望 {expected!r}\n       实际 {result!r}")
+    print(f"{len(CASES) - failed}/{len(CASES)} 通过")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+查找相似候选人
+
+从候选人向量索引（CANDIDATE_INDEX_DIR）检索与指定候选人简历最相似的候选人，
+索引快照不存在时从 candidate_embeddings 表重建。
+
+用法:
+    # 查找与候选人123最相似的10位候选人
+    python tools/find_similar_candidates.py --similar 123 --top 10
+
+    # 从表完整重建索引
+    python tools/find_similar_candidates.py --rebuild
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from config import Config
+from utils import create_db_session
+from db_manager import Candidate
+from candidate_index import get_candidate_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查找相似候选人")
+    parser.add_argument("--similar", type=int, default=0, help="候选人ID")
+    parser.add_argument("--top", type=int, default=10, help="返回数量")
+    parser.add_argument("--min-score", type=float, default=0.0, help="最低余弦相似度")
+    parser.add_argument("--rebuild", action="store_true", help="从 candidate_embeddings 表重建索引")
+    args = parser.parse_args()
+
+    config = Config(os.path.join(project_root, "..", "config/.env"))
+    session = create_db_session(config)
+    try:
+        index = get_candidate_index(config)
+        start = time.perf_counter()
+        if args.rebuild:
+            index.rebuild(session)
+        else:
+            index.load_or_rebuild(session)
+            if index.dirty:
+                index.save()
+        print(f"索引: {len(index)} 条, {'IVF' if index.centroids is not None else '精确'}检索, "
+              f"加载耗时 {time.perf_counter() - start:.2f}秒")
+
+        if not args.similar:
+            return
+        start = time.perf_counter()
+        similar = index.find_similar(args.similar, args.top, args.min_score)
+        elapsed = (time.perf_counter() - start) * 1000
+        if index.vector(args.similar) is None:
+            print(f"候选人 {args.similar} 不在索引中")
+            return
+        names = dict(session.query(Candidate.id, Candidate.name).filter(
+            Candidate.id.in_([cid for cid, _ in similar])
+        ).all()) if similar else {}
+        print(f"与候选人 {args.similar} 最相似的 {len(similar)} 位候选人(检索耗时 {elapsed:.1f}毫秒):")
+        for candidate_id, score in similar:
+            print(f"  {candidate_id:>8}  {score:.4f}  {names.get(candidate_id, '')}")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+LLM调用成本报表
+
+汇总 llm_call_log 表：按岗位、模型、prompt类型、日期（可组合）统计调用次数、邮件数、错误、重试、
+token用量、平均/最大耗时和按 LLM_PRICES 计算的成本。
+
+用法:
+    # 最近7天按日期和模型汇总
+    python tools/llm_cost_report.py --by day,model --days 7
+
+    # 按岗位汇总全部记录
+    python tools/llm_cost_report.py --by position --days 0
+"""
+
+import os
+import sys
+import argparse
+from datetime import timedelta
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from config import Config
+from utils import create_db_session
+from db_manager import beijing_now
+from llm_ledger import parse_prices, rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM调用成本报表")
+    parser.add_argument("--by", default="day", help="逗号分隔的分组字段: position/model/prompt_type/day")
+    parser.add_argument("--days", type=int, default=7, help="统计最近N天，0表示全部")
+    args = parser.parse_args()
+
+    config = Config(os.path.join(project_root, "..", "config/.env"))
+    session = create_db_session(config)
+    try:
+        by = [name.strip() for name in args.by.split(",") if name.strip()]
+        since = beijing_now() - timedelta(days=args.days) if args.days > 0 else None
+        rows = rollup(session, by, since=since, prices=parse_prices(config.LLM_PRICES))
+    finally:
+        session.close()
+
+    header = " ".join(f"{name:<20}" for name in by)
+    print(f"{header} {'调用':>7} {'邮件':>6} {'错误':>5} {'重试':>5} {'输入token':>11} {'输出token':>10} "
+          f"{'平均耗时ms':>10} {'最大耗时ms':>10} {'成本$':>9} {'每封成本$':>9}")
+    for row in rows:
+        keys = " ".join(f"{str(row[name] or '-'):<20}" for name in by)
+        per_email = f"{row['cost_per_email']:.4f}" if row["cost_per_email"] is not None else "-"
+        print(f"{keys} {row['calls']:>7} {row['emails']:>6} {row['errors']:>5} {row['retries']:>5} "
+              f"{row['prompt_tokens']:>11} {row['completion_tokens']:>10} {row['avg_latency_ms']:>10.0f} "
+              f"{row['max_latency_ms']:>10} {row['cost']:>9.4f} {per_email:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+简历筛选压测
+
+用合成的简历邮件驱动 AIScreener（与 screening.process_single_email 相同的调用顺序，不读写数据库），
+对接本地模拟服务 tools/mock_openai_server.py，按不同的 SCREENING_WORKERS 报告：
+吞吐（封/秒）、单封邮件的 p50/p95/p99 耗时、失败数、重试次数（服务端收到的请求数 - 成功数）
+以及各状态码次数和token用量。
+
+用法:
+    # 在进程内启动模拟服务，平均延迟1.5秒、5%返回429、2%返回502
+    python tools/load_test_screening.py --workers 1,5,10,20 --emails 200 \
+        --latency 1.5 --latency-dist lognormal --rate-429 0.05 --rate-502 0.02
+
+    # 3个后端(各自RPM限额600)，对比单个后端的吞吐
+    python tools/load_test_screening.py --workers 20 --emails 300 --latency 0.2 --rpm 600 --backends 3
+
+    # 开启请求对冲，对比长尾耗时
+    python tools/load_test_screening.py --workers 10 --emails 500 --latency 1 --latency-dist lognormal --hedging
+
+    # 使用已启动的模拟服务（模拟参数以服务端启动参数为准）
+    python tools/load_test_screening.py --api-base http://127.0.0.1:18080/v1 --workers 5,10
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from mock_openai_server import MockOpenAIServer, add_simulation_args, simulation_kwargs
+
+MOCK_JOB_INFO = {
+    "算法工程师": {"duties": "负责大模型训练与推理优化", "requirements": "熟悉PyTorch，有大模型训练经验",
+                  "education_req": "硕士及以上", "exp_req": "3年以上", "perf_goals": "模型效果达到业务指标"},
+    "后端工程师": {"duties": "负责推理服务和数据平台开发", "requirements": "熟悉Python/Go和分布式系统",
+                  "education_req": "本科及以上", "exp_req": "3年以上", "perf_goals": "服务稳定性99.9%"},
+}
+MOCK_COMPANY_INFO = "一家专注于大模型应用的AI创业公司。"
+
+_SURNAMES = "王李张刘陈杨赵黄周吴"
+_SCHOOLS = ["清华大学", "北京大学", "浙江大学", "复旦大学", "武汉大学", "四川大学"]
+_SKILLS = ["PyTorch", "TensorFlow", "CUDA", "Go", "Kubernetes", "Spark", "Redis", "MySQL"]
+
+
+def make_emails(count: int, seed: int = 0) -> list:
+    """生成合成简历邮件，每封内容不同"""
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        position = rng.choice(list(MOCK_JOB_INFO))
+        skills = "、".join(rng.sample(_SKILLS, 4))
+        content = "\n".join([
+            f"姓名：{rng.choice(_SURNAMES)}{i}",
+            f"电话：138{rng.randint(10000000, 99999999)}",
+            f"应聘岗位：{position}",
+            f"教育经历：{rng.choice(_SCHOOLS)} 计算机科学 硕士",
+            f"工作经历：{rng.randint(1, 10)}年，曾在某科技公司负责{position}相关工作",
+            f"技能：{skills}",
+            "项目经历：" + "参与推理服务性能优化，QPS提升一倍。" * rng.randint(1, 20),
+        ])
+        emails.append({"subject": f"应聘{position}-候选人{i}", "content_text": content,
+                       "attach_filenames": [f"简历{i}.pdf"], "from_domain": "example.com"})
+    return emails
+
+
+def start_mock_server(args) -> str:
+    """在后台线程启动模拟服务，返回接口地址"""
+    from aiohttp import web
+
+    server = MockOpenAIServer(**simulation_kwargs(args))
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    holder = {}
+
+    async def start():
+        runner = web.AppRunner(server.make_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        holder["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        loop.run_forever()
+
+    threading.Thread(target=run, name="mock-openai-server", daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{holder['port']}/v1"
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def screen_one(ai_screener, email: dict, mode: str):
+    """按 process_single_email 的顺序处理一封邮件，返回 (耗时, 是否成功)"""
+    start = time.perf_counter()
+    try:
+        if mode == "single_call":
+            is_resume, position_name, channel, parsed_info, analysis = ai_screener.identify_and_screen(
+                email["subject"], email["content_text"], email["attach_filenames"], email["from_domain"]
+            )
+            if is_resume is False:
+                return time.perf_counter() - start, True
+        else:
+            is_resume, position_name, channel = ai_screener.identify_mail_type(
+                email["subject"], email["content_text"], email["attach_filenames"], email["from_domain"]
+            )
+            if not is_resume:
+                return time.perf_counter() - start, True
+            parsed_info, analysis = ai_screener.screen_resume(email["content_text"], position_name, channel)
+        return time.perf_counter() - start, bool(parsed_info and analysis)
+    except Exception:
+        return time.perf_counter() - start, False
+
+
+def server_stats(stats_urls: list) -> dict:
+    """汇总各模拟服务的统计"""
+    total = {"requests": 0, "status": {}, "timeouts": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    for url in stats_urls:
+        stats = requests.get(url, timeout=10).json()
+        for key in ("requests", "timeouts", "prompt_tokens", "completion_tokens"):
+            total[key] += stats[key]
+        for code, count in stats["status"].items():
+            total["status"][code] = total["status"].get(code, 0) + count
+    return total
+
+
+def run_round(ai_screener, emails: list, workers: int, mode: str, stats_urls: list) -> dict:
+    for url in stats_urls:
+        requests.post(f"{url}/reset", timeout=10)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda email: screen_one(ai_screener, email, mode), emails))
+    elapsed = time.perf_counter() - start
+    server = server_stats(stats_urls)
+
+    latencies = [latency for latency, _ in results]
+    succeeded = server["status"].get("200", 0)
+    return {
+        "workers": workers,
+        "elapsed": elapsed,
+        "throughput": len(emails) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "failed": sum(1 for _, ok in results if not ok),
+        "requests": server["requests"],
+        "retries": server["requests"] - succeeded,
+        "status": server["status"],
+        "timeouts": server["timeouts"],
+        "tokens": server["prompt_tokens"] + server["completion_tokens"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="简历筛选压测")
+    parser.add_argument("--workers", default="1,5,10,20", help="逗号分隔的 SCREENING_WORKERS 取值")
+    parser.add_argument("--emails", type=int, default=100, help="每轮处理的合成邮件数")
+    parser.add_argument("--mode", default="two_step", choices=["two_step", "single_call"])
+    parser.add_argument("--client", default="async", choices=["async", "sync"], help="LLM_CLIENT")
+    parser.add_argument("--api-base", default="", help="已启动的模拟服务地址，为空时在进程内启动")
+    parser.add_argument("--ai-timeout", type=int, default=10, help="AI_TIMEOUT(秒)")
+    parser.add_argument("--retries", type=int, default=5, help="AI_RETRY_TIMES")
+    parser.add_argument("--hedging", action="store_true", help="开启 LLM_HEDGING(仅异步客户端)")
+    parser.add_argument("--backends", type=int, default=1,
+                        help="LLM后端数：在进程内启动多个模拟服务(各自按 --rpm/--tpm 限额)，通过 LLM_BACKENDS 分流")
+    add_simulation_args(parser)
+    args = parser.parse_args()
+
+    api_bases = [args.api_base] if args.api_base else [start_mock_server(args) for _ in range(args.backends)]
+    api_base = api_bases[0]
+    stats_urls = [base.rsplit("/v1", 1)[0] + "/stats" for base in api_bases]
+
+    config = Config(os.path.join(project_root, "..", "config/.env"))
+    overrides = {
+        "OPENAI_API_BASE": api_base, "OPENAI_API_KEY": "mock", "LLM_CLIENT": args.client,
+        "AI_TIMEOUT": args.ai_timeout, "AI_RETRY_TIMES": args.retries, "SCREENING_MODE": args.mode,
+        "LLM_RESULT_CACHE": False, "CACHE_EMBEDDINGS": False, "MAIL_PRECHECK": False,
+        "LLM_RATE_LIMIT_FILE": "", "LLM_LEDGER": False, "LLM_HEDGING": args.hedging,
+        # 客户端限流与模拟服务的限额一致，每个后端一份
+        "LLM_RPM_LIMIT": args.rpm, "LLM_TPM_LIMIT": args.tpm,
+        "LLM_BACKENDS": ([{"name": f"mock{i + 1}", "api_key": "mock", "api_base": base}
+                          for i, base in enumerate(api_bases)] if len(api_bases) > 1 else []),
+    }
+    for key, value in overrides.items():
+        setattr(config, key, value)
+
+    from ai_screener import AIScreener
+    ai_screener = AIScreener(config, MOCK_JOB_INFO, MOCK_COMPANY_INFO)
+    emails = make_emails(args.emails)
+
+    print(f"模拟服务: {', '.join(api_bases)}, 模式: {args.mode}, 客户端: {args.client}, 每轮 {len(emails)} 封")
+    print(f"{'workers':>7} {'耗时(s)':>8} {'吞吐(封/s)':>10} {'p50(s)':>7} {'p95(s)':>7} {'p99(s)':>7} "
+          f"{'失败':>5} {'请求':>6} {'重试':>5} {'tokens':>9}  状态码")
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        r = run_round(ai_screener, emails, workers, args.mode, stats_urls)
+        print(f"{r['workers']:>7} {r['elapsed']:>8.1f} {r['throughput']:>10.2f} {r['p50']:>7.2f} "
+              f"{r['p95']:>7.2f} {r['p99']:>7.2f} {r['failed']:>5} {r['requests']:>6} {r['retries']:>5} "
+              f"{r['tokens']:>9}  {r['status']} 超时{r['timeouts']}")
+
+    from llm_client import get_llm_client
+    hedging = get_llm_client(config).hedging if args.client == "async" else None
+    if hedging:
+        h = hedging.stats()
+        print(f"对冲: 发起 {h['hedged']}次, 对冲胜出 {h['hedge_wins']}次, 预算不足 {h['budget_denied']}次, "
+              f"节省 {h['saved_seconds']:.1f}秒, 额外token {h['extra_tokens']}, 触发阈值 "
+              + ", ".join(f"{name}={delay:.2f}s" for name, delay in h["delays"].items()))
+
+    from llm_client import close_llm_client
+    close_llm_client()
+
+
+if __name__ == "__main__":
+    main()
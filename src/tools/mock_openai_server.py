@@ -0,0 +1,384 @@
+"""
+本地 OpenAI 兼容模拟服务
+
+用于在不调用真实接口的情况下测试筛选流程和压测：
+- POST /v1/chat/completions  根据prompt类型返回符合Schema的识别/评估结果，请求带 tools 时以函数调用返回；
+  按参数模拟延迟分布、429/502/超时和服务端RPM/TPM限额，usage 和 x-ratelimit-* 头按估算的token数返回
+- POST /v1/embeddings  按字符二元组哈希生成的确定性向量，文本越相近余弦相似度越高
+- POST /v1/files、GET /v1/files/{id}/content  上传/下载批量任务文件
+- POST /v1/batches、GET /v1/batches/{id}  创建/查询批量任务，创建后 --batch-delay 秒完成
+- GET /stats  请求数、各状态码次数、token用量和服务端延迟统计；POST /stats/reset 清零
+
+用法:
+    python tools/mock_openai_server.py --port 18080 --latency 1.5 --latency-dist lognormal --rate-429 0.05
+    # .env 中设置 OPENAI_API_BASE=http://127.0.0.1:18080/v1
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from aiohttp import web
+
+_POSITION_RE = re.compile(r"岗位名称: ?(.+)")
+
+# 各评分项的满分
+SCORE_LIMITS = {"education": 20, "technical": 25, "innovation": 15, "growth": 15, "startup": 15, "teamwork": 10}
+
+PARSED_INFO = {
+    "name": "模拟候选人", "experience": "3年", "latest_company": "模拟公司",
+    "first_education": "本科", "first_university": "模拟大学",
+    "highest_education": "硕士", "highest_university": "模拟大学",
+    "marital_status": "", "age": 28, "gender": "男", "phone": "13800000000",
+    "email": "mock@example.com", "wechat": "", "expected_salary": "面议", "resume_source": "",
+}
+
+
+def first_position(prompt: str) -> str:
+    match = _POSITION_RE.search(prompt)
+    if match:
+        return match.group(1).strip()
+    start = prompt.find("[", prompt.find("公司岗位列表"))
+    if start >= 0:
+        try:
+            positions = json.loads(prompt[start:prompt.find("]", start) + 1])
+            return positions[0] if positions else ""
+        except ValueError:
+            pass
+    return ""
+
+
+def mock_analysis(seed: str) -> dict:
+    """按prompt内容生成确定的评分，同一份简历每次得分相同，不同简历的总分分布在 20-95 之间"""
+    rng = random.Random(hashlib.md5(seed.encode("utf-8")).hexdigest())
+    ratio = rng.uniform(0.2, 0.95)
+    analysis = {}
+    for name, limit in SCORE_LIMITS.items():
+        analysis[f"{name}_score"] = max(0, min(limit, round(limit * (ratio + rng.uniform(-0.1, 0.1)))))
+        analysis[f"{name}_detail"] = "模拟评估"
+    analysis.update({"risk": "", "questions": "模拟面试问题"})
+    return analysis
+
+
+def mock_reply(prompt: str, non_resume_rate: float = 0.0) -> str:
+    """按prompt类型生成模拟回复，non_resume_rate 为识别结果判为非简历的比例"""
+    position = first_position(prompt)
+    parsed_info = {**PARSED_INFO, "position": position}
+    is_resume = random.Random(prompt).random() >= non_resume_rate
+    if "【已有评分】" in prompt:
+        # 两阶段评估的评价详情
+        return json.dumps({key: value for key, value in mock_analysis(prompt).items()
+                           if not key.endswith("_score")}, ensure_ascii=False)
+    if "只输出评分" in prompt:
+        analysis = {key: value for key, value in mock_analysis(prompt).items() if key.endswith("_score")}
+        return json.dumps({"parsed_info": parsed_info, "analysis": analysis}, ensure_ascii=False)
+    if '"parsed_info"' in prompt and '"is_resume"' in prompt:
+        result = {"is_resume": is_resume, "matched_position": position, "matched_channel": ""}
+        if is_resume:
+            result.update({"parsed_info": parsed_info, "analysis": mock_analysis(prompt)})
+    elif '"parsed_info"' in prompt:
+        result = {"parsed_info": parsed_info, "analysis": mock_analysis(prompt)}
+    else:
+        result = {"is_resume": is_resume, "matched_position": position if is_resume else "",
+                  "matched_channel": ""}
+    return json.dumps(result, ensure_ascii=False)
+
+
+def count_tokens(text: str) -> int:
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def completion(body: dict, non_resume_rate: float = 0.0) -> dict:
+    prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+    content = mock_reply(prompt, non_resume_rate)
+    prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+    message = {"role": "assistant", "content": content}
+    if body.get("tools"):
+        # 函数调用方式的结构化输出：结果放在函数参数中
+        name = body["tools"][0]["function"]["name"]
+        message = {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": content}}]}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", ""),
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def mock_embedding(text: str, dim: int = 256) -> list:
+    """字符二元组哈希到固定维度并归一化"""
+    vector = [0.0] * dim
+    for i in range(len(text) - 1):
+        bucket = int(hashlib.md5(text[i:i + 2].encode("utf-8")).hexdigest()[:8], 16) % dim
+        vector[bucket] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class MockOpenAIServer:
+    def __init__(self, batch_delay: float = 5, latency: float = 0.0, latency_dist: str = "fixed",
+                 latency_sigma: float = 0.5, rate_429: float = 0.0, rate_502: float = 0.0,
+                 rate_timeout: float = 0.0, hang_seconds: float = 120, rpm: int = 0, tpm: int = 0,
+                 non_resume_rate: float = 0.0, seed: int = None):
+        """
+        Args:
+            batch_delay: 批量任务完成所需秒数
+            latency: chat请求的平均延迟(秒)
+            latency_dist: 延迟分布 fixed/uniform(0~2倍均值)/exponential/lognormal(sigma=latency_sigma)
+            rate_429/rate_502/rate_timeout: 随机返回429、502或挂起 hang_seconds 秒（模拟超时）的比例
+            rpm/tpm: 模拟服务端每分钟请求数/token数限额，超出时返回429和 retry-after，0表示不限制
+            non_resume_rate: 识别结果判为非简历的比例
+        """
+        self.batch_delay = batch_delay
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.rate_502 = rate_502
+        self.rate_timeout = rate_timeout
+        self.hang_seconds = hang_seconds
+        self.rpm = rpm
+        self.tpm = tpm
+        self.non_resume_rate = non_resume_rate
+        self.rng = random.Random(seed)
+        self.files = {}
+        self.batches = {}
+        self._window = []  # 最近一分钟内的 (时间, token数)
+        self.reset_stats()
+
+    # ---------- 模拟 ----------
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "status": {}, "timeouts": 0, "prompt_tokens": 0,
+                      "completion_tokens": 0, "latencies": []}
+
+    def sample_latency(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_dist == "uniform":
+            return self.rng.uniform(0, 2 * self.latency)
+        if self.latency_dist == "exponential":
+            return self.rng.expovariate(1 / self.latency)
+        if self.latency_dist == "lognormal":
+            # 均值保持为 latency
+            mu = math.log(self.latency) - self.latency_sigma ** 2 / 2
+            return self.rng.lognormvariate(mu, self.latency_sigma)
+        return self.latency
+
+    def _rate_limit(self, tokens: int):
+        """
+        按滑动窗口检查模拟的RPM/TPM限额
+
+        Returns:
+            tuple: (需要等待的秒数, 剩余请求数, 剩余token数)，等待秒数为0表示放行
+        """
+        now = time.time()
+        self._window = [(t, n) for t, n in self._window if now - t < 60]
+        used_tokens = sum(n for _, n in self._window)
+        wait = 0.0
+        if self.rpm and len(self._window) >= self.rpm:
+            wait = 60 - (now - self._window[0][0])
+        if self.tpm and used_tokens + tokens > self.tpm:
+            wait = max(wait, 60 - (now - self._window[0][0]) if self._window else 1.0)
+        if wait <= 0:
+            self._window.append((now, tokens))
+            used_tokens += tokens
+        remaining_requests = max(self.rpm - len(self._window), 0) if self.rpm else 10000
+        remaining_tokens = max(self.tpm - used_tokens, 0) if self.tpm else 10000000
+        return wait, remaining_requests, remaining_tokens
+
+    def _error(self, status: int, message: str, headers: dict = None):
+        self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+        return web.json_response({"error": {"message": message, "type": "mock_error"}},
+                                 status=status, headers=headers)
+
+    # ---------- chat ----------
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        self.stats["requests"] += 1
+        started = time.time()
+
+        roll = self.rng.random()
+        if roll < self.rate_timeout:
+            # 挂起直到客户端超时断开
+            self.stats["timeouts"] += 1
+            await asyncio.sleep(self.hang_seconds)
+            return self._error(504, "mock timeout")
+        roll -= self.rate_timeout
+        if roll < self.rate_429:
+            return self._error(429, "mock rate limit", {"retry-after": "1"})
+        roll -= self.rate_429
+        if roll < self.rate_502:
+            await asyncio.sleep(self.sample_latency() / 4)
+            return self._error(502, "mock bad gateway")
+
+        result = completion(body, self.non_resume_rate)
+        usage = result["usage"]
+        wait, remaining_requests, remaining_tokens = self._rate_limit(
+            usage["prompt_tokens"] + (body.get("max_tokens") or usage["completion_tokens"])
+        )
+        if wait > 0:
+            return self._error(429, "mock rpm/tpm exceeded", {
+                "retry-after": f"{wait:.2f}",
+                "x-ratelimit-remaining-requests": str(remaining_requests),
+                "x-ratelimit-remaining-tokens": str(remaining_tokens),
+            })
+
+        await asyncio.sleep(self.sample_latency())
+        self.stats["status"][200] = self.stats["status"].get(200, 0) + 1
+        self.stats["prompt_tokens"] += usage["prompt_tokens"]
+        self.stats["completion_tokens"] += usage["completion_tokens"]
+        self.stats["latencies"].append(time.time() - started)
+        return web.json_response(result, headers={
+            "x-ratelimit-remaining-requests": str(remaining_requests),
+            "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        })
+
+    async def embeddings(self, request):
+        body = await request.json()
+        inputs = body.get("input", "")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        await asyncio.sleep(self.sample_latency() / 4)
+        tokens = sum(count_tokens(text) for text in inputs)
+        return web.json_response({
+            "object": "list", "model": body.get("model", ""),
+            "data": [{"object": "embedding", "index": i, "embedding": mock_embedding(text)}
+                     for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    # ---------- stats ----------
+
+    def stats_summary(self) -> dict:
+        latencies = sorted(self.stats["latencies"])
+        summary = {k: v for k, v in self.stats.items() if k != "latencies"}
+        summary["status"] = {str(k): v for k, v in self.stats["status"].items()}
+        summary["latency_avg"] = sum(latencies) / len(latencies) if latencies else 0.0
+        summary["latency_p95"] = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+        return summary
+
+    async def get_stats(self, request):
+        return web.json_response(self.stats_summary())
+
+    async def post_reset_stats(self, request):
+        self.reset_stats()
+        return web.json_response({"ok": True})
+
+    # ---------- files ----------
+
+    async def upload_file(self, request):
+        form = await request.post()
+        content = form["file"].file.read().decode("utf-8")
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = content
+        return web.json_response({"id": file_id, "object": "file", "purpose": form.get("purpose", "")})
+
+    async def file_content(self, request):
+        file_id = request.match_info["file_id"]
+        if file_id not in self.files:
+            return web.json_response({"error": {"message": "file not found"}}, status=404)
+        return web.Response(text=self.files[file_id])
+
+    # ---------- batches ----------
+
+    async def create_batch(self, request):
+        body = await request.json()
+        if body.get("input_file_id") not in self.files:
+            return web.json_response({"error": {"message": "input file not found"}}, status=400)
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"], "status": "in_progress",
+            "created_at": int(time.time()), "metadata": body.get("metadata", {}),
+            "output_file_id": None, "error_file_id": None,
+        }
+        return web.json_response(self.batches[batch_id])
+
+    async def get_batch(self, request):
+        batch = self.batches.get(request.match_info["batch_id"])
+        if batch is None:
+            return web.json_response({"error": {"message": "batch not found"}}, status=404)
+        if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= self.batch_delay:
+            self._complete(batch)
+        return web.json_response(batch)
+
+    def _complete(self, batch):
+        outputs = []
+        for line in self.files[batch["input_file_id"]].splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            outputs.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": item["custom_id"],
+                "response": {"status_code": 200, "body": completion(item["body"], self.non_resume_rate)},
+                "error": None,
+            }, ensure_ascii=False))
+        output_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[output_id] = "\n".join(outputs) + "\n"
+        batch.update({"status": "completed", "output_file_id": output_id,
+                      "request_counts": {"total": len(outputs), "completed": len(outputs), "failed": 0}})
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=200 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        app.router.add_post("/v1/files", self.upload_file)
+        app.router.add_get("/v1/files/{file_id}/content", self.file_content)
+        app.router.add_post("/v1/batches", self.create_batch)
+        app.router.add_get("/v1/batches/{batch_id}", self.get_batch)
+        app.router.add_get("/stats", self.get_stats)
+        app.router.add_post("/stats/reset", self.post_reset_stats)
+        return app
+
+
+def add_simulation_args(parser):
+    """模拟参数，压测脚本共用"""
+    parser.add_argument("--latency", type=float, default=0.0, help="平均延迟(秒)")
+    parser.add_argument("--latency-dist", default="fixed", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal分布的sigma")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="随机返回429的比例")
+    parser.add_argument("--rate-502", type=float, default=0.0, help="随机返回502的比例")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="随机挂起(模拟超时)的比例")
+    parser.add_argument("--hang-seconds", type=float, default=120, help="模拟超时时挂起的秒数")
+    parser.add_argument("--rpm", type=int, default=0, help="模拟服务端每分钟请求数限额")
+    parser.add_argument("--tpm", type=int, default=0, help="模拟服务端每分钟token数限额")
+    parser.add_argument("--non-resume-rate", type=float, default=0.0, help="判为非简历的比例")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def simulation_kwargs(args) -> dict:
+    return {
+        "latency": args.latency, "latency_dist": args.latency_dist, "latency_sigma": args.latency_sigma,
+        "rate_429": args.rate_429, "rate_502": args.rate_502, "rate_timeout": args.rate_timeout,
+        "hang_seconds": args.hang_seconds, "rpm": args.rpm, "tpm": args.tpm,
+        "non_resume_rate": args.non_resume_rate, "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--batch-delay", type=float, default=5, help="批量任务完成所需秒数")
+    add_simulation_args(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(batch_delay=args.batch_delay, **simulation_kwargs(args))
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
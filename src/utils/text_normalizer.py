@@ -0,0 +1,75 @@
+"""
+文本规范化模块
+
+将原先分散在多处的文本清理逻辑合并为一个单遍处理引擎：
+1. 去除HTML标签（可选）
+2. 去除控制字符（可选）
+3. 折叠空白字符
+4. 去除空行和连续重复行
+
+所有正则在模块加载时编译一次，整段文本只做一次控制字符替换，逐行处理时只使用
+str.split / str.join 等C层实现，避免每个环节都生成一份新的大字符串。
+"""
+
+import re
+
+# HTML标签
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 控制字符（不含 \t \n \r），与 extract_text_from_html 中的规则一致。
+# \x0B \x0C \x1C-\x1E 同时是 str.splitlines() 的行分隔符，按行处理时它们只会作为换行出现，
+# 因此这里不删除，交给 splitlines/split 当作空白处理，结果与逐行删除完全相同。
+_CONTROL_RE = re.compile(r'[\x00-\x08\x0E-\x1B\x1F\x7F]+')
+
+
+def normalize_text(text: str, keep_lines: bool = True, strip_tags: bool = False,
+                   strip_control: bool = True, dedupe_lines: bool = True) -> str:
+    """
+    单遍规范化文本
+
+    Args:
+        text: 原始文本
+        keep_lines: 是否保留行结构；为False时所有空白（含换行）折叠为单个空格
+        strip_tags: 是否将HTML标签替换为空格
+        strip_control: 是否去除控制字符
+        dedupe_lines: 是否去除连续重复行（仅 keep_lines=True 时生效）
+
+    Returns:
+        str: 规范化后的文本
+    """
+    if not text:
+        return ""
+
+    if strip_tags and '<' in text:
+        text = _TAG_RE.sub(' ', text)
+
+    if strip_control:
+        text = _CONTROL_RE.sub('', text)
+
+    if not keep_lines:
+        # str.split() 的空白集合与正则 \s 相同，split+join 等价于 \s+ -> ' ' 再 strip
+        return ' '.join(text.split())
+
+    if not dedupe_lines:
+        return '\n'.join(filter(None, [' '.join(line.split()) for line in text.splitlines()]))
+
+    lines = []
+    prev_line = None
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        if line and line != prev_line:
+            lines.append(line)
+            prev_line = line
+    return '\n'.join(lines)
+
+
+def normalize_lines(text: str, dedupe_lines: bool = True, strip_control: bool = True) -> str:
+    """按行规范化：每行折叠空白，去除空行，可选去除连续重复行"""
+    return normalize_text(text, keep_lines=True, strip_control=strip_control,
+                          dedupe_lines=dedupe_lines)
+
+
+def normalize_flat(text: str, strip_tags: bool = True, strip_control: bool = False) -> str:
+    """整体规范化：去除标签后将所有空白折叠为单个空格"""
+    return normalize_text(text, keep_lines=False, strip_tags=strip_tags,
+                          strip_control=strip_control)
@@ -1,8 +1,10 @@
 import logging
 import re
 from bs4 import BeautifulSoup
+from lxml import etree
 from email.header import decode_header
 from utils.log_utils import setup_logger
+from utils.text_normalizer import normalize_lines, normalize_flat
 import warnings
  
 def decode_subject(subject):
@@ -19,49 +21,115 @@ def decode_subject(subject):
             out += t
     return out
 
-def extract_text_from_html(html_content: str) -> str:
-    """从HTML中提取清理后的文本内容"""
+# HTML正文提取时需要整体丢弃的元素
+_SKIP_TAGS = frozenset(['script', 'style', 'head', 'title', 'meta', 'iframe', 'noscript'])
+
+# 可选的HTML正文提取引擎
+HTML_TEXT_ENGINES = ('bs4', 'lxml')
+
+class _LxmlTextCollector:
+    """
+    lxml解析器的target回调，按文档顺序流式收集文本节点
+
+    不构建DOM树：跳过 _SKIP_TAGS 内的全部内容，其余每个文本节点去除首尾空白后作为一行，
+    与 BeautifulSoup 的 get_text(separator='\n', strip=True) 语义一致。
+    """
+
+    def __init__(self):
+        self.parts = []
+        self._buffer = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        if self._buffer:
+            text = ''.join(self._buffer).strip()
+            if text:
+                self.parts.append(text)
+            self._buffer = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self._skip_depth or tag in _SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        # 注释不计入正文，但要切断前后文本节点
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return '\n'.join(self.parts)
+
+def _html_to_text_lxml(html_content: str) -> str:
+    """基于lxml解析器回调的流式HTML转文本"""
+    parser = etree.HTMLParser(target=_LxmlTextCollector(), no_network=True)
+    parser.feed(html_content)
+    return parser.close()
+
+def _html_to_text_bs4(html_content: str) -> str:
+    """基于BeautifulSoup(html.parser)的HTML转文本"""
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=UserWarning)
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+    # 移除不需要的元素
+    for tag in soup(list(_SKIP_TAGS)):
+        tag.decompose()
+        
+    # 替换特殊标签为换行
+    for tag in soup.find_all(['br', 'p', 'div', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        tag.append('\n')
+        
+    # 提取文本
+    return soup.get_text(separator='\n', strip=True)
+
+def extract_text_from_html(html_content: str, engine: str = 'bs4') -> str:
+    """
+    从HTML中提取清理后的文本内容
+
+    Args:
+        html_content: HTML内容
+        engine: 解析引擎，'bs4'(BeautifulSoup) 或 'lxml'(流式解析，适合大HTML)，
+                lxml解析出错时回退到bs4
+
+    Returns:
+        str: 清理后的文本
+    """
     logger = setup_logger('TextUtils')
     try:
         if not html_content:
             logger.warning("输入HTML内容为空")
             return ""
             
-        logger.debug(f"处理HTML内容: {len(html_content)}字节")
+        logger.debug(f"处理HTML内容: {len(html_content)}字节, 引擎={engine}")
         
-        # 使用BeautifulSoup解析HTML
-        with warnings.catch_warnings():
-            warnings.filterwarnings('ignore', category=UserWarning)
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-        # 移除不需要的元素
-        for tag in soup(['script', 'style', 'head', 'title', 'meta', '[document]', 'iframe', 'noscript']):
-            tag.decompose()
-            
-        # 替换特殊标签为换行
-        for tag in soup.find_all(['br', 'p', 'div', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            tag.append('\n')
-            
-        # 提取文本
-        text = soup.get_text(separator='\n', strip=True)
+        if engine == 'lxml':
+            try:
+                text = _html_to_text_lxml(html_content)
+            except (etree.LxmlError, ValueError) as e:
+                # 仅在解析器出错时回退
+                logger.warning(f"lxml解析HTML失败，回退到BeautifulSoup: {e}")
+                text = _html_to_text_bs4(html_content)
+        else:
+            text = _html_to_text_bs4(html_content)
         
-        # 清理文本
-        lines = []
-        for line in text.splitlines():
-            line = line.strip()
-            if line:  # 只保留非空行
-                # 去除可能的控制字符
-                line = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', line)
-                # 规范化空白字符
-                line = re.sub(r'\s+', ' ', line)
-                lines.append(line)
-                
-        cleaned_text = '\n'.join(lines)
+        # 清理文本：单遍去除控制字符、规范化空白并去除空行
+        cleaned_text = normalize_lines(text, dedupe_lines=False)
         logger.debug(f"提取到文本: {len(cleaned_text)}字节")
         
         # 记录一些统计信息
         if cleaned_text:
-            logger.info(f"提取结果: {len(lines)}行, 平均每行{sum(len(l) for l in lines)/len(lines):.1f}字符")
+            line_count = cleaned_text.count('\n') + 1
+            logger.info(f"提取结果: {line_count}行, 平均每行{(len(cleaned_text) - line_count + 1)/line_count:.1f}字符")
         else:
             logger.warning("提取结果为空")
             
@@ -71,25 +139,17 @@ def extract_text_from_html(html_content: str) -> str:
         logger.error(f"HTML文本提取失败: {e}", exc_info=True)
         return ""
 
-def html_to_text(html_content: str) -> str:
-    return extract_text_from_html(html_content)
+def html_to_text(html_content: str, engine: str = 'bs4') -> str:
+    return extract_text_from_html(html_content, engine)
 
 def extract_clean_text(text: str) -> str:
     """清理文本内容，去除无用字符"""
     if not text:
         return ""
     
-    # 移除HTML标签
-    text = re.sub(r'<[^>]+>', ' ', text)
-    
-    # 替换特殊空白字符为普通空格
-    text = re.sub(r'[\u00A0\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200A\u202F\u205F]', ' ', text)
-    
-    # 替换多个空格为单个空格
-    text = re.sub(r'\s+', ' ', text)
-    
-    # 去除首尾空白
-    return text.strip()
+    # 移除HTML标签，并将所有空白（含特殊空白字符）折叠为单个空格
+    # 注意：输出用于计算 resume_hash，必须与原有多遍正则的结果保持一致
+    return normalize_flat(text)
 
 def decode_attachment_filename(raw_fname):
     """解码附件文件名"""